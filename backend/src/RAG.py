@@ -5,6 +5,12 @@ import traceback
 from flask import Flask, jsonify, request, Response, stream_with_context
 from flask_cors import CORS
 from main import query_vector_db, add_pdf_to_vector_db, summarize_with_llm  # Ensure these functions are imported
+from model_registry import get_model_registry
+from index_cache import get_index_cache
+from embedding_cache import embedding_cache_stats
+from query_batcher import query_batcher_stats
+from reranker import reranker_stats
+from answer_cache import answer_cache_stats
 from ollama import Client
 import docker
 import json
@@ -133,6 +139,17 @@ def delete_model_route():
     message = delete_model(model)
     return jsonify({'message': message})
 
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    return jsonify({
+        'embedding_models': get_model_registry().stats(),
+        'index_cache': get_index_cache().stats(),
+        'embedding_cache': embedding_cache_stats(),
+        'query_batchers': query_batcher_stats(),
+        'reranker': reranker_stats(),
+        'answer_cache': answer_cache_stats(),
+    })
+
 @app.route('/api/cancel-pull', methods=['POST'])
 def cancel_model_pull():
     data = request.get_json()
@@ -171,7 +188,14 @@ def query():
             provider=provider,
             embedding_provider=embedding_provider,
             embedding_model=embedding_model,
-            use_gpu=USE_GPU
+            use_gpu=USE_GPU,
+            search_params=data.get('search_params'),
+            search_mode=data.get('search_mode', 'dense'),
+            rerank=data.get('rerank'),
+            mmr_lambda=data.get('mmr_lambda'),
+            mmr_candidates=data.get('mmr_candidates'),
+            filters=data.get('filters'),
+            use_answer_cache=data.get('use_answer_cache')
         )
         return jsonify({"response": response_text})
     except Exception as e:
@@ -188,6 +212,8 @@ def add():
     embedding_model = request.form.get('embedding_model')
     parser = request.form.get('parser_type')
     db_type = request.form.get('db_type', 'faiss')  # Default to FAISS if not provided
+    embedding_workers = request.form.get('embedding_workers', type=int)
+    threads_per_worker = request.form.get('threads_per_worker', type=int)
 
     db_path = f"/app/data/vector_db_{os.path.splitext(pdf_file.filename)[0]}.index"
     pdf_path = os.path.join("/tmp", pdf_file.filename)
@@ -195,7 +221,7 @@ def add():
     print('USE GPU',USE_GPU)
     try:
         use_llama = True if parser == 'LlamaParser' else False
-        add_pdf_to_vector_db(
+        report = add_pdf_to_vector_db(
             pdf_path=pdf_path,
             db_path=db_path,
             db_type=db_type,
@@ -203,9 +229,11 @@ def add():
             use_llama=use_llama,
             embedding_provider=embedding_provider,
             embedding_model=embedding_model,
-            use_gpu=USE_GPU
+            use_gpu=USE_GPU,
+            embedding_workers=embedding_workers,
+            threads_per_worker=threads_per_worker
         )
-        return jsonify({"message": f"Document added to vector database at {db_path}."})
+        return jsonify({"message": f"Document added to vector database at {db_path}.", "throughput": report})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -224,7 +252,7 @@ def summarize():
 
     try:
         cli_model_name = map_model_name(model) if provider == 'ollama' else model
-        chunks = query_vector_db(
+        summary_text = query_vector_db(
             db_path=db_path,
             db_type=db_type,
 
@@ -236,7 +264,6 @@ def summarize():
             embedding_model=embedding_model,
             use_gpu=USE_GPU
         )
-        summary_text = summarize_with_llm(chunks, model, provider)
         return jsonify({"summary": summary_text})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
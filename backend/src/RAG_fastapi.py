@@ -1,12 +1,21 @@
 import os
 import time
 import traceback
+from typing import List, Optional
 from fastapi import FastAPI, HTTPException, UploadFile, Form, Depends, File
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import StreamingResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from main import query_vector_db, add_pdf_to_vector_db, summarize_with_llm  # Ensure these functions are imported
+from main import query_vector_db, query_corpus, search_vector_db_batch, add_pdf_to_vector_db, summarize_with_llm  # Ensure these functions are imported
+from model_registry import get_model_registry
+from index_cache import get_index_cache
+from embedding_cache import embedding_cache_stats
+from query_batcher import query_batcher_stats
+from reranker import reranker_stats
+from answer_cache import answer_cache_stats
+from adapters.faiss_adapter import preload_indexes
+from config import load_config
 from ollama import Client
 import nest_asyncio
 from pydantic import BaseModel
@@ -38,6 +47,11 @@ app.add_middleware(
 USE_GPU = os.getenv("USE_GPU", False).lower() == "true"
 print(USE_GPU)
 
+# With gunicorn --preload this runs once in the master, so forked workers share the loaded indexes
+faiss_settings = load_config()["vector_databases"].get("faiss", {})
+if faiss_settings.get("preload"):
+    preload_indexes(VECTOR_DBS_DIR, use_gpu=faiss_settings.get("use_gpu", False), mmap=faiss_settings.get("mmap", False))
+
 # Initialize Ollama Client
 ollama_client = Client(host='http://localhost:11434')
 
@@ -101,6 +115,36 @@ class QueryRequest(BaseModel):
     db_filename: str
     db_type:str = 'faiss',
     db_config: dict
+    search_params: Optional[dict] = None  # ANN query-time parameters, e.g. {"nprobe": 32, "efSearch": 128}
+    search_mode: str = "dense"  # "hybrid" fuses dense and BM25 keyword retrieval (FAISS)
+    rerank: Optional[bool] = None  # Cross-encoder reranking of retrieved chunks; None follows config.yaml
+    mmr_lambda: Optional[float] = None  # MMR diversification: 1 = relevance only, 0 = diversity only; None follows config.yaml
+    mmr_candidates: Optional[int] = None  # Dense matches MMR selects from
+    filters: Optional[dict] = None  # Metadata filter, e.g. {"chunk_type": "table", "page": {"gte": 3, "lte": 10}}
+    use_answer_cache: Optional[bool] = None  # True serves the cached answer of a semantically equivalent query; None follows config.yaml
+
+class CorpusQueryRequest(BaseModel):
+    provider: str
+    embedding_provider: str
+    embedding_model: str
+    query: str
+    model: str = "openai"
+    top_k: int = 3
+    db_filenames: Optional[List[str]] = None  # Documents to search; all indexes when omitted
+    search_params: Optional[dict] = None
+    rerank: Optional[bool] = None
+    filters: Optional[dict] = None
+
+class SearchBatchRequest(BaseModel):
+    embedding_provider: str
+    embedding_model: str
+    queries: List[str]
+    top_k: int = 3
+    db_filename: str
+    db_type: str = 'faiss'
+    db_config: dict
+    search_params: Optional[dict] = None
+    filters: Optional[dict] = None
 
 class SummarizeRequest(BaseModel):
     provider: str
@@ -128,12 +172,25 @@ async def delete_model_route(model: str):
     message = delete_model(model)
     return {"message": message}
 
+@app.get("/api/metrics")
+async def metrics():
+    return {
+        "embedding_models": get_model_registry().stats(),
+        "index_cache": get_index_cache().stats(),
+        "embedding_cache": embedding_cache_stats(),
+        "query_batchers": query_batcher_stats(),
+        "reranker": reranker_stats(),
+        "answer_cache": answer_cache_stats(),
+    }
+
 
 # Ensure the directory exists
 # Mount the static files directory
 app.mount("/static", StaticFiles(directory=CHARTS_DIR), name="static")
+# /query and /summarize are sync handlers so FastAPI runs them in its threadpool;
+# concurrent requests can then share embedding micro-batches instead of queueing.
 @app.post("/query")
-async def query(data: QueryRequest):
+def query(data: QueryRequest):
     try:
         # Log incoming data
         print("Received request:", data.dict())
@@ -153,6 +210,13 @@ async def query(data: QueryRequest):
             embedding_provider=data.embedding_provider,
             embedding_model=data.embedding_model,
             use_gpu=USE_GPU,
+            search_params=data.search_params,
+            search_mode=data.search_mode,
+            rerank=data.rerank,
+            mmr_lambda=data.mmr_lambda,
+            mmr_candidates=data.mmr_candidates,
+            filters=data.filters,
+            use_answer_cache=data.use_answer_cache,
         )
         return {"response": response_text}
     except Exception as e:
@@ -161,6 +225,58 @@ async def query(data: QueryRequest):
         raise HTTPException(status_code=500, detail=f"Error processing query: {str(e)}")
 
 
+@app.post("/query_corpus")
+def query_corpus_route(data: CorpusQueryRequest):
+    try:
+        cli_model_name = map_model_name(data.model) if data.provider == "ollama" else data.model
+        db_paths = None
+        if data.db_filenames:
+            db_paths = [
+                os.path.join(VECTOR_DBS_DIR, f"vector_db_{os.path.splitext(name.replace(' ', '_'))[0]}.index")
+                for name in data.db_filenames
+            ]
+        response_text = query_corpus(
+            VECTOR_DBS_DIR,
+            data.query,
+            db_paths=db_paths,
+            top_k=data.top_k,
+            model=cli_model_name,
+            provider=data.provider,
+            embedding_provider=data.embedding_provider,
+            embedding_model=data.embedding_model,
+            use_gpu=USE_GPU,
+            search_params=data.search_params,
+            rerank=data.rerank,
+            filters=data.filters,
+        )
+        return {"response": response_text}
+    except Exception as e:
+        print(f"Error processing corpus query: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error processing corpus query: {str(e)}")
+
+
+@app.post("/search_batch")
+def search_batch(data: SearchBatchRequest):
+    try:
+        db_path = os.path.join(VECTOR_DBS_DIR, f"vector_db_{os.path.splitext(data.db_filename.replace(' ', '_'))[0]}.index")
+        results = search_vector_db_batch(
+            db_path=db_path,
+            db_type=data.db_type,
+            db_config=data.db_config,
+            queries=data.queries,
+            top_k=data.top_k,
+            embedding_provider=data.embedding_provider,
+            embedding_model=data.embedding_model,
+            use_gpu=USE_GPU,
+            search_params=data.search_params,
+            filters=data.filters,
+        )
+        return {"results": results}
+    except Exception as e:
+        print(f"Error processing batch search: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error processing batch search: {str(e)}")
+
+
 @app.post("/add")
 async def add(
     pdf: UploadFile = File(...),
@@ -168,7 +284,9 @@ async def add(
     embedding_model: str = Form(...),
     parser_type: str = Form(...),
     db_type: str = Form(...),
-    db_config: str = Form(...)
+    db_config: str = Form(...),
+    embedding_workers: Optional[int] = Form(None),
+    threads_per_worker: Optional[int] = Form(None)
 ):
     try:
         # Save the uploaded PDF temporarily
@@ -184,7 +302,7 @@ async def add(
         use_llama = parser_type.lower() == "llamaparser"
 
         # Add the PDF to the vector database
-        add_pdf_to_vector_db(
+        report = add_pdf_to_vector_db(
             pdf_path=pdf_path,
             db_path=db_path,
             db_type=db_type,
@@ -194,13 +312,15 @@ async def add(
             embedding_provider=embedding_provider,
             embedding_model=embedding_model,
             use_gpu=USE_GPU,
+            embedding_workers=embedding_workers,
+            threads_per_worker=threads_per_worker,
         )
 
         # Verify database creation
         if not os.path.exists(db_path):
             raise HTTPException(status_code=500, detail="Failed to create vector database.")
         
-        return {"message": f"Document successfully added to vector database at {db_path}."}
+        return {"message": f"Document successfully added to vector database at {db_path}.", "throughput": report}
     except Exception as e:
         # Log the error and raise an HTTP exception
         print(f"Error in /add: {e}")
@@ -209,7 +329,7 @@ async def add(
 
 
 @app.post("/summarize")
-async def summarize(data: SummarizeRequest):
+def summarize(data: SummarizeRequest):
     try:
         # Map model name for Ollama, if needed
         cli_model_name = map_model_name(data.model) if data.provider.lower() == "ollama" else data.model
@@ -217,12 +337,12 @@ async def summarize(data: SummarizeRequest):
         # Construct the database path
         db_path = os.path.join(VECTOR_DBS_DIR, f"vector_db_{os.path.splitext(data.db_filename)[0]}.index")
 
-        # Query all data from the vector database
-        results = query_vector_db(
+        # Summarize all data in the vector database, streamed window by window
+        summary_text = query_vector_db(
             db_path=db_path,
             db_type=data.db_type,
             db_config=data.db_config,
-            query="*",  # Retrieve all content
+            query="*",  # Summarize all content
             top_k=1000,  # Not limiting the number of results
             model=cli_model_name,
             provider=data.provider,
@@ -230,14 +350,9 @@ async def summarize(data: SummarizeRequest):
             embedding_model=data.embedding_model,
             use_gpu=USE_GPU,
         )
-        if not results:
+        if not summary_text:
             raise HTTPException(status_code=404, detail="No content found for summarization.")
 
-        # Combine all chunks (consider tuples or text-only results)
-        #chunks_text = " ".join(results)
-
-        # Generate summary using LLM
-        summary_text = summarize_with_llm(results, cli_model_name, data.provider)
         return {"summary": summary_text}
 
     except Exception as e:
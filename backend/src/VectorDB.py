@@ -1,21 +1,22 @@
 import os
+import functools
 import numpy as np
 import faiss
 import pickle
 from sentence_transformers import SentenceTransformer
-from embedding_initializer import initialize_embedding_model
+from model_registry import get_model_registry, resolve_device
+from embedding_cache import get_embedding_cache
+from query_batcher import get_query_batcher
+from embedding_providers import encode_texts
+from mmr import maximal_marginal_relevance
 from adapters import FAISSVectorDB, MilvusVectorDB, PineconeVectorDB, QdrantVectorDB, WeaviateVectorDB
-import yaml
 import json
 import numpy as np
+from config import load_config
 from utils import extract_name_from_path, pad_embedding
+from chunk_store import chunk_ids, document_key
 
 
-def load_config():
-    """Load vector database configuration from YAML file."""
-    with open("config.yaml", "r") as f:
-        return yaml.safe_load(f)
-
 def initialize_vector_db(db_type, db_config, embedding_dimension, db_path=None):
     """
     Dynamically initialize a vector database based on configuration and type.
@@ -51,7 +52,20 @@ def initialize_vector_db(db_type, db_config, embedding_dimension, db_path=None):
 
     # Initialize the database adapter (unchanged)
     if db_type == "faiss":
-        return FAISSVectorDB(use_gpu=db_config.get("use_gpu", False), dimension=embedding_dimension)
+        return FAISSVectorDB(
+            use_gpu=db_config.get("use_gpu", False),
+            dimension=embedding_dimension,
+            index_spec=db_config.get("index_spec", "Flat"),
+            search_params=db_config.get("search_params"),
+            min_points_per_centroid=db_config.get("min_points_per_centroid", 39),
+            chunk_compression=db_config.get("chunk_compression"),
+            mmap=db_config.get("mmap", False),
+            storage=db_config.get("storage"),
+            rescore_factor=db_config.get("rescore_factor", 0),
+            sparse_index=db_config.get("sparse_index", False),
+            hybrid_candidates=db_config.get("hybrid_candidates", 50),
+            rrf_k=db_config.get("rrf_k", 60),
+        )
     elif db_type == "milvus":
         return MilvusVectorDB(
             host=db_config["host"],
@@ -104,8 +118,16 @@ class VectorDB:
             index_name = os.path.splitext(os.path.basename(db_path))[0]
             kwargs["index_name"] = index_name
 
-        # Initialize the embedding model
-        self.model, self.dimension, self.iscallable = initialize_embedding_model(provider, model_name, api_key)
+        # Fetch the embedding model from the process-wide registry (loaded once per process)
+        device = resolve_device(use_gpu)
+        self.model, self.dimension, self.iscallable = get_model_registry().get(
+            provider, model_name, device=device, api_key=api_key
+        )
+        self.model_key = (provider, model_name, device)
+        self.provider = provider
+        self.model_name = model_name
+        # Wrapped providers carry their own batch size; SentenceTransformers use the configured one
+        self.batch_size = getattr(self.model, "batch_size", None) or load_config().get("embedding_models", {}).get("batch_size", 32)
 
         # Ensure the dimension is passed correctly
         if self.dimension:
@@ -118,7 +140,21 @@ class VectorDB:
 
 
         self.use_gpu = use_gpu
-        
+        self._sequences = {}  # document key -> next chunk sequence on backends other than FAISS
+
+    def _chunk_ids(self, doc_id, start_id, count):
+        """
+        Returns the ids of `count` chunks inserted into a backend other than FAISS. With a
+        `doc_id` they combine a hash of the document with a per-document sequence number
+        (chunk_store.chunk_ids), so documents never overwrite each other's chunks and
+        delete_document can find them. Without one, `start_id` numbers them.
+        """
+        if doc_id is None:
+            return chunk_ids(0, start_id, count)
+        key = document_key(doc_id)
+        start = self._sequences.get(key, 0)
+        self._sequences[key] = start + count
+        return chunk_ids(key, start, count)
 
     def _generate_embeddings(self, texts):
         """
@@ -127,19 +163,48 @@ class VectorDB:
         try:
             if not isinstance(texts, list):
                 texts = [texts]  # Ensure input is a list
+            return encode_texts(self.model, self.iscallable, texts, batch_size=self.batch_size)
 
-            if self.iscallable:
-                # If the model is callable (e.g., HuggingFace pipeline or OpenAI embeddings)
-                embeddings = [self.model(text) for text in texts]
-            else:
-                # If the model uses an encoder method (e.g., SentenceTransformers)
-                embeddings = self.model.encode(texts)
-
-            # Ensure embeddings are in the correct numpy format
-            return np.array(embeddings, dtype='float32')
+        except Exception as e:
+            raise ValueError(f"Error generating embedding: {e}")
 
+    def _generate_query_embedding(self, query):
+        """
+        Generates the embedding of a single search query. When query batching is
+        enabled, concurrent queries for the same model are encoded together.
+        """
+        batcher = get_query_batcher(
+            self.model_key,
+            functools.partial(encode_texts, self.model, self.iscallable, batch_size=self.batch_size),
+        )
+        if batcher is None:
+            return self._generate_embeddings([query]).squeeze(0)
+        try:
+            future = batcher.submit(query)
+        except RuntimeError:
+            # The batcher was closed by a model eviction racing this query
+            return self._generate_embeddings([query]).squeeze(0)
+        try:
+            return np.asarray(future.result(), dtype='float32')
         except Exception as e:
             raise ValueError(f"Error generating embedding: {e}")
+
+    def _generate_chunk_embeddings(self, texts, encode_fn=None):
+        """
+        Generates embeddings for ingested chunks, reusing vectors from the
+        persistent embedding cache for chunks whose text was embedded before.
+        `encode_fn` replaces the in-process model (e.g. an EmbeddingPool).
+        """
+        encode_fn = encode_fn or self._generate_embeddings
+        cache = get_embedding_cache(self.provider, self.model_name, self.dimension)
+        if cache is None:
+            return encode_fn(texts)
+
+        embeddings = cache.encode(texts, encode_fn)
+        stats = cache.stats()
+        print(f"Embedding cache: {stats['hits']} hits, {stats['misses']} misses (hit rate {stats['hit_rate']:.2%})")
+        return embeddings
+
     def process_clip_embedding(self, clip_embedding, dimension):
         """
         Adapts a CLIP embedding to match the dimension of text embeddings.
@@ -160,13 +225,35 @@ class VectorDB:
             raise ValueError(f"Error adapting CLIP embedding: {e}")
 
 
-    def add_embeddings(self, texts, embeddings=None, clip_embeddings=None, batch_size=32, **kwargs):
+    def add_texts_streaming(self, texts, encode_fn=None, window_size=2048, metadata=None, **kwargs):
+        """
+        Embeds and inserts texts one window at a time, so the embeddings of the whole
+        document are never held in memory at once. Windows are inserted in order.
+
+        Args:
+            texts (list): Chunk texts to add.
+            encode_fn (callable, optional): Batch encoder to use instead of the in-process model.
+            window_size (int): Number of texts embedded and inserted per step.
+            metadata (list, optional): One chunk_metadata dict per text.
+        """
+        for start in range(0, len(texts), window_size):
+            window = texts[start:start + window_size]
+            embeddings = self._generate_chunk_embeddings(window, encode_fn=encode_fn)
+            window_metadata = metadata[start:start + window_size] if metadata is not None else None
+            self.add_embeddings(window, embeddings=embeddings, start_id=start, metadata=window_metadata, **kwargs)
+
+    def add_embeddings(self, texts, embeddings=None, clip_embeddings=None, batch_size=32, start_id=0, doc_id=None, metadata=None, **kwargs):
         """
         Adds embeddings to the vector database.
         If embeddings are not provided, they will be generated internally.
+        `doc_id` gives the chunks stable per-document ids that `delete_document` can remove;
+        `start_id` numbers the chunks of calls without a `doc_id`.
+        `metadata` holds one chunk_metadata dict (doc_id, page, chunk_type, offsets) per
+        text; it is stored with the vectors so searches can filter on it. The CLIP
+        embeddings of a figure share the metadata of its caption (the last entry).
         """
         if embeddings is None:
-            embeddings = self._generate_embeddings(texts)
+            embeddings = self._generate_chunk_embeddings(texts)
        
         if clip_embeddings is not None:
             # Ensure each CLIP embedding is adapted to match the expected dimension
@@ -174,7 +261,6 @@ class VectorDB:
                 self.process_clip_embedding(clip_embedding, self.dimension) for clip_embedding in clip_embeddings
             ]
             clip_embeddings = np.array(clip_embeddings, dtype='float32')
-            print(clip_embeddings.shape)
             if len(clip_embeddings.shape) == 3:
                 clip_embeddings = clip_embeddings.squeeze(axis=1)  # Remove singleton dimension
 
@@ -184,11 +270,13 @@ class VectorDB:
             else:
                 embeddings = np.vstack((embeddings, clip_embeddings))  # Combine embeddings
                 texts += [f"clip_embedding_{i}" for i in range(len(clip_embeddings))]  # Placeholder metadata for CLIP
+                if metadata:
+                    metadata = list(metadata) + [metadata[-1]] * len(clip_embeddings)
     
 
         # Check backend type and handle accordingly
         if isinstance(self.db, FAISSVectorDB):
-            self.db.add_embeddings(embeddings, texts)  # FAISS generates embeddings internally
+            self.db.add_embeddings(embeddings, texts, doc_id=doc_id, metadata=metadata)  # FAISS generates embeddings internally
         elif isinstance(self.db, PineconeVectorDB):
             namespace = kwargs.get("namespace", "default-namespace")  # Default namespace
             metadata_key = kwargs.get("metadata_key", "text")  # Metadata key for storing text
@@ -196,45 +284,122 @@ class VectorDB:
                 embeddings=embeddings,
                 texts=texts,
                 namespace=namespace,
-                metadata_key=metadata_key
+                metadata_key=metadata_key,
+                ids=self._chunk_ids(doc_id, start_id, len(texts)),
+                metadata=metadata
             )
         elif isinstance(self.db, MilvusVectorDB):
-            ids = [f"text-{i}" for i in range(len(texts))]
-            self.db.add_embeddings(ids, embeddings)
+            ids = self._chunk_ids(doc_id, start_id, len(texts)).tolist()
+            fields = metadata or [{}] * len(texts)
+            fields = [{**entry, "text": text} for text, entry in zip(texts, fields)]  # Texts and chunk metadata as dynamic fields
+            self.db.add_embeddings(ids, embeddings, metadata=fields)
         elif isinstance(self.db, QdrantVectorDB):
-            ids = list(range(len(texts)))  # Generate integer IDs
+            ids = self._chunk_ids(doc_id, start_id, len(texts)).tolist()
             embeddings = embeddings.tolist()  # Ensure embeddings are in list format
-            metadata = [{"text": text} for text in texts]  # Use texts as metadata
-            self.db.add_embeddings(ids, embeddings, metadata)
+            payloads = metadata or [{}] * len(texts)
+            payloads = [{**entry, "text": text} for text, entry in zip(texts, payloads)]  # Texts and chunk metadata as payload
+            self.db.add_embeddings(ids, embeddings, payloads)
         elif isinstance(self.db, WeaviateVectorDB):
-            ids = [f"text-{i}" for i in range(len(texts))]
-            self.db.add_embeddings(ids, embeddings)
+            ids = self._chunk_ids(doc_id, start_id, len(texts)).tolist()
+            properties = metadata or [{}] * len(texts)
+            properties = [{**entry, "text": text} for text, entry in zip(texts, properties)]  # Texts and chunk metadata as properties
+            self.db.add_embeddings(ids, embeddings, metadata=properties)
         else:
             raise ValueError(f"Unsupported backend type: {type(self.db)}")
 
-    def search(self, query, top_k=5):
+    def search(self, query, top_k=5, search_params=None, mode="dense", filters=None, query_embedding=None):
         """
         Searches for the closest matches in the vector database.
         If the database supports searching, the method generates query embeddings
         and passes them to the adapter's search method.
+        `search_params` sets ANN query-time parameters (nprobe, efSearch) for this
+        request on backends that support them (FAISS, Milvus).
+        `mode="hybrid"` fuses dense and BM25 keyword rankings (FAISS only).
+        `filters` restricts the search to chunks matching a metadata filter expression,
+        e.g. {"doc_id": "tsla.pdf", "chunk_type": "table", "page": {"gte": 3}} (see
+        chunk_metadata.normalize_filter). FAISS pre-filters with an id selector; the
+        other backends apply it as a native payload filter.
+        `query_embedding` reuses an embedding of `query` the caller already computed.
         """
+        if mode not in ("dense", "hybrid"):
+            raise ValueError(f"Unsupported search mode: {mode}. Use 'dense' or 'hybrid'.")
+        if mode == "hybrid" and not isinstance(self.db, FAISSVectorDB):
+            raise ValueError(f"Hybrid search is not supported for {type(self.db)}.")
         # Generate query embedding using VectorDB's embedding model
-        query_embedding = self._generate_embeddings([query]).squeeze(0)
-        print(query_embedding.shape)
+        if query_embedding is None:
+            query_embedding = self._generate_query_embedding(query)
         # Check backend type and delegate search operation
+        if mode == "hybrid":
+            return self.db.hybrid_search(query_embedding, query, top_k, search_params=search_params, filters=filters)
         if isinstance(self.db, FAISSVectorDB):
-            return self.db.search(query_embedding, top_k)  # FAISS supports direct search with embeddings
+            return self.db.search(query_embedding, top_k, search_params=search_params, filters=filters)  # FAISS supports direct search with embeddings
         elif isinstance(self.db, PineconeVectorDB):
-            return self.db.search(query_embedding, top_k)
+            return self.db.search(query_embedding, top_k, filters=filters)
         elif isinstance(self.db, MilvusVectorDB):
-            return self.db.search(query_embedding, top_k)
+            return self.db.search(query_embedding, top_k, search_params=search_params, filters=filters)
         elif isinstance(self.db, QdrantVectorDB):
-            return self.db.search(query_embedding, top_k)
+            return self.db.search(query_embedding, top_k, filters=filters)
         elif isinstance(self.db, WeaviateVectorDB):
-            return self.db.search(query_embedding, top_k)
+            return self.db.search(query_embedding, top_k, filters=filters)
         else:
             raise ValueError(f"Unsupported backend type: {type(self.db)}")
 
+    def search_batch(self, queries, top_k=5, search_params=None, include_vectors=False, filters=None):
+        """
+        Searches for the closest matches of many queries at once.
+        All queries are embedded in one call and sent to the backend as a single batch.
+
+        Args:
+            queries (list): Query strings.
+            top_k (int): Matches per query.
+            search_params (dict, optional): ANN query-time parameters (FAISS, Milvus).
+            include_vectors (bool): Add each match's stored vector as "vector".
+            filters (dict, optional): Metadata filter expression applied to every query.
+        Returns:
+            list: One list per query of {"id", "text", "score"} dicts, closest first.
+            Scores are the backend's native distance or similarity.
+        """
+        if not queries:
+            return []
+        query_embeddings = self._generate_embeddings(list(queries))
+        return self._search_embeddings(query_embeddings, top_k, search_params, include_vectors, filters)
+
+    def _search_embeddings(self, query_embeddings, top_k, search_params=None, include_vectors=False, filters=None):
+        if isinstance(self.db, (FAISSVectorDB, MilvusVectorDB)):
+            return self.db.search_batch(query_embeddings, top_k, search_params=search_params,
+                                        include_vectors=include_vectors, filters=filters)
+        elif isinstance(self.db, (PineconeVectorDB, QdrantVectorDB, WeaviateVectorDB)):
+            return self.db.search_batch(query_embeddings, top_k, include_vectors=include_vectors, filters=filters)
+        else:
+            raise ValueError(f"Unsupported backend type: {type(self.db)}")
+
+    def search_mmr(self, query, top_k=5, candidates=20, lambda_mult=0.5, search_params=None, filters=None,
+                   query_embedding=None):
+        """
+        Retrieves `candidates` matches with their vectors and keeps the top_k chosen by
+        maximal marginal relevance, so near-duplicate chunks do not crowd out the results.
+
+        Args:
+            query (str): Query string.
+            top_k (int): Matches to keep.
+            candidates (int): Size of the candidate pool MMR selects from.
+            lambda_mult (float): 1 ranks by relevance only, 0 by diversity only.
+            search_params (dict, optional): ANN query-time parameters (FAISS, Milvus).
+            filters (dict, optional): Metadata filter expression.
+            query_embedding (array, optional): Precomputed embedding of `query`.
+        Returns:
+            list: (text, score) tuples in selection order, with the backend's native scores.
+        """
+        if query_embedding is None:
+            query_embedding = self._generate_query_embedding(query)
+        hits = self._search_embeddings(np.asarray(query_embedding)[None, :], max(candidates, top_k),
+                                       search_params, include_vectors=True, filters=filters)[0]
+        if not hits:
+            return []
+        vectors = np.array([hit["vector"] for hit in hits], dtype='float32')
+        selected = maximal_marginal_relevance(query_embedding, vectors, top_k=top_k, lambda_mult=lambda_mult)
+        return [(hits[i]["text"], hits[i]["score"]) for i in selected]
+
     def save_index(self, path):
         """
         Saves the index to disk (if supported by the backend).
@@ -244,22 +409,58 @@ class VectorDB:
         else:
             print("Save index not supported for this backend.")
 
-    def load_index(self, path):
+    def load_index(self, path, use_cache=True):
         """
         Loads the index from disk (if supported by the backend).
+        FAISS indexes that will be modified must be loaded with use_cache=False.
         """
         if isinstance(self.db, PineconeVectorDB):
             print("Pinecone backend detected. Skipping load_index as it is managed.")
             return
 
-        if hasattr(self.db, 'load_index'):
+        if isinstance(self.db, FAISSVectorDB):
+            self.db.load_index(path, use_cache=use_cache)
+        elif hasattr(self.db, 'load_index'):
             self.db.load_index(path)
         else:
             print("Load index not supported for this backend.")
+
+    def delete_document(self, doc_id):
+        """
+        Removes every chunk that was added with `doc_id`. Returns the number of chunks removed.
+        """
+        if not hasattr(self.db, "delete_document"):
+            raise NotImplementedError(f"'delete_document' is not implemented for {type(self.db)}.")
+        self._sequences.pop(document_key(doc_id), None)
+        return self.db.delete_document(doc_id)
+
+    def delete_chunks(self, ids):
+        """
+        Removes chunks by id. Returns the number of chunks removed.
+        """
+        if not hasattr(self.db, "delete_chunks"):
+            raise NotImplementedError(f"'delete_chunks' is not implemented for {type(self.db)}.")
+        return self.db.delete_chunks(ids)
             
+    def iter_chunks(self, batch_size=1000, include_vectors=False):
+        """
+        Streams every stored chunk without loading the whole store into memory.
+
+        Args:
+            batch_size (int): Chunks per yielded batch.
+            include_vectors (bool): Also return each chunk's embedding.
+        Yields:
+            list: Batches of {"id", "text"} dicts, with a "vector" when include_vectors is set.
+            "text" is None on backends that do not store it.
+        """
+        if not hasattr(self.db, "iter_chunks"):
+            raise NotImplementedError(f"'iter_chunks' is not implemented for {type(self.db)}.")
+        return self.db.iter_chunks(batch_size=batch_size, include_vectors=include_vectors)
+
     def get_all(self):
             """
-            Retrieves all embeddings and metadata from the vector database.
+            Retrieves all texts from the vector database.
+            Prefer iter_chunks, which streams, for large stores.
             """
             if hasattr(self.db, "get_all"):
                 return self.db.get_all()
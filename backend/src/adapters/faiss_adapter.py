@@ -1,94 +1,710 @@
 import numpy as np
 import faiss
-import pickle
 import os
+import re
+import json
+import glob
+import threading
+from index_cache import get_index_cache
+from chunk_store import ChunkStore, load_chunk_store, store_paths, document_key, chunk_ids, document_keys_of, SEQUENCE_MASK
+from vector_store import VectorStore, vector_store_paths
+from sparse_index import SparseIndex, load_sparse_index, reciprocal_rank_fusion, sparse_index_path, DEFAULT_RRF_K
+from chunk_metadata import MetadataStore, metadata_store_path, normalize_filter
+
+DEFAULT_INDEX_SPEC = "Flat"
+# FAISS k-means wants at least this many training points per centroid
+DEFAULT_MIN_POINTS_PER_CENTROID = 39
+SEARCH_PARAM_NAMES = ("nprobe", "efSearch")
+DEFAULT_SCAN_BATCH_SIZE = 1024
+# Scalar quantizer codes for the `storage` setting (None keeps float32 vectors)
+STORAGE_CODES = {"float32": None, "fp16": "SQfp16", "sq8": "SQ8"}
+
+# Guards adding a direct map to IVF indexes that may be shared through the index cache
+_direct_map_lock = threading.Lock()
+# Index paths already warned about rescoring without full-precision vectors
+_rescore_warnings = set()
+
+
+def required_training_points(index_spec, min_points_per_centroid=DEFAULT_MIN_POINTS_PER_CENTROID):
+    """
+    Returns the number of vectors needed to train an index built from `index_spec`
+    (0 for specs that need no training, such as Flat and HNSW).
+    """
+    centroids = 0
+    ivf = re.search(r"IVF(\d+)", index_spec)
+    if ivf:
+        centroids = int(ivf.group(1))
+    pq = re.search(r"PQ\d+(?:x(\d+))?", index_spec)
+    if pq:
+        centroids = max(centroids, 2 ** int(pq.group(1) or 8))
+    return centroids * min_points_per_centroid
+
+
+def quantized_spec(index_spec, storage=None):
+    """
+    Returns `index_spec` with its float32 vector storage replaced by the scalar quantizer
+    of `storage` ("fp16" halves and "sq8" quarters the bytes per vector):
+    Flat -> SQ8, IVF1024,Flat -> IVF1024,SQ8, HNSW32 -> HNSW32_SQ8.
+    """
+    if (storage or "float32") not in STORAGE_CODES:
+        raise ValueError(f"Unsupported FAISS storage: {storage}. Choose from {list(STORAGE_CODES)}.")
+    code = STORAGE_CODES[storage or "float32"]
+    if code is None:
+        return index_spec
+    if index_spec == DEFAULT_INDEX_SPEC:
+        return code
+    ivf = re.fullmatch(r"(IVF\d+),Flat", index_spec)
+    if ivf:
+        return f"{ivf.group(1)},{code}"
+    hnsw = re.fullmatch(r"HNSW\d+", index_spec)
+    if hnsw:
+        return f"{index_spec}_{code}"
+    raise ValueError(f"storage '{storage}' applies to Flat, IVF<n>,Flat and HNSW<m> specs, not '{index_spec}'. "
+                     f"Write the quantized spec in index_spec instead.")
+
+
+def is_lossy(index_spec):
+    """True when an index spec stores compressed vectors (scalar or product quantization)."""
+    return re.search(r"SQ|PQ", index_spec) is not None
+
+
+def meta_path_for(path):
+    return os.path.splitext(path)[0] + ".meta.json"
+
+
+def is_id_mapped(index):
+    """True when the index stores explicit 64-bit ids (IDMap wrappers and IVF indexes)."""
+    return isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)) or faiss.try_extract_index_ivf(index) is not None
+
+
+def base_index(index):
+    """Returns the index under an IDMap wrapper."""
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        return faiss.downcast_index(index.index)
+    return index
+
+
+def vectors_and_ids(index):
+    """Returns all (vectors, ids) of an IDMap-wrapped or legacy sequential-id index."""
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        return base_index(index).reconstruct_n(0, index.ntotal), faiss.vector_to_array(index.id_map).astype(np.int64)
+    return index.reconstruct_n(0, index.ntotal), np.arange(index.ntotal, dtype=np.int64)
+
+
+def read_index_mmap(path):
+    """
+    Opens a FAISS index read-only on top of a memory map of the file, so processes
+    serving the same index share its pages through the OS page cache.
+
+    Returns (index, mapped). IO_FLAG_MMAP_IFC (FAISS >= 1.10) maps Flat, HNSW and IVF
+    storage in place; older releases only map IVF inverted lists and copy the rest.
+    Index types that cannot be mapped are read normally and mapped is False.
+    """
+    mmap_flag = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+    try:
+        return faiss.read_index(path, mmap_flag | faiss.IO_FLAG_READ_ONLY), True
+    except RuntimeError as e:
+        print(f"Memory-mapped load not supported for {path}, reading into memory: {e}")
+        return faiss.read_index(path), False
+
+
+def write_index_atomic(index, path):
+    """Writes an index through a temporary file so readers that mapped the old file are never torn."""
+    tmp_path = path + ".tmp"
+    faiss.write_index(index, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def preload_indexes(directory, use_gpu=False, mmap=True):
+    """
+    Loads every *.index file in `directory` into the shared index cache.
+
+    Call this in the server process before workers are forked (e.g. gunicorn --preload):
+    memory-mapped indexes are then already in the page cache, and indexes that could not
+    be mapped are inherited copy-on-write instead of being read again by every worker.
+    Returns the number of indexes loaded.
+    """
+    loaded = 0
+    for path in sorted(glob.glob(os.path.join(directory, "*.index"))):
+        try:
+            FAISSVectorDB(use_gpu=use_gpu, dimension=1, mmap=mmap).load_index(path)
+            loaded += 1
+        except RuntimeError as e:
+            print(f"Skipping preload of {path}: {e}")
+    print(f"Preloaded {loaded} FAISS indexes from {directory}")
+    return loaded
+
 
 class FAISSVectorDB:
-    def __init__(self, use_gpu=True, dimension=768):
+    def __init__(self, use_gpu=True, dimension=768, index_spec=DEFAULT_INDEX_SPEC, search_params=None,
+                 min_points_per_centroid=DEFAULT_MIN_POINTS_PER_CENTROID, chunk_compression=None, mmap=False,
+                 storage=None, rescore_factor=0, sparse_index=False, hybrid_candidates=50, rrf_k=DEFAULT_RRF_K):
+        """
+        Args:
+            use_gpu (bool): Keep the index on the GPU.
+            dimension (int): Embedding dimension.
+            index_spec (str): faiss.index_factory string, e.g. "Flat", "IVF1024,Flat", "HNSW32", "IVF1024,PQ32".
+            storage (str, optional): Vector storage of index_spec: "float32", "fp16" or "sq8".
+            search_params (dict, optional): Default query-time parameters (nprobe, efSearch).
+            min_points_per_centroid (int): Training points required per IVF/PQ centroid.
+            chunk_compression (str, optional): Per-chunk compression of the chunk store (None or "zstd").
+            mmap (bool): Serve cached CPU indexes read-only from memory maps shared between processes.
+            rescore_factor (int): For quantized indexes, fetch rescore_factor * top_k candidates and
+                re-rank them against full-precision vectors kept in a memory-mapped file (0 disables).
+            sparse_index (bool): Build a BM25 index of the chunks on save, for hybrid search.
+            hybrid_candidates (int): Dense and sparse candidates fused per hybrid query.
+            rrf_k (int): Reciprocal rank fusion constant.
+        """
         self.use_gpu = use_gpu
-        self.id_map = {}
+        self.mmap = mmap and not use_gpu
+        self.chunk_compression = chunk_compression
         self.dimension = dimension  # Default dimension (adjust based on your embeddings)
-
-        # Initialize FAISS index
+        self.index_spec = quantized_spec(index_spec or DEFAULT_INDEX_SPEC, storage)
+        self.rescore_factor = rescore_factor or 0
+        self.sparse_index = sparse_index
+        self.hybrid_candidates = hybrid_candidates
+        self.rrf_k = rrf_k
+        self.path = None  # File the index was last loaded from or saved to
+        self.search_params = search_params or {}
+        self.min_points_per_centroid = min_points_per_centroid
         if use_gpu:
             self.res = faiss.StandardGpuResources()
-            self.index = faiss.GpuIndexFlatL2(self.res, self.dimension)
+        self.clear()
+
+    def clear(self):
+        """Drops every chunk, leaving an empty Flat ingestion index."""
+        # Chunk texts keyed by vector id, memory-mapped once the index is saved or loaded
+        self.chunks = ChunkStore(compression=self.chunk_compression)
+        # Spec the current index was actually built with (Flat until an ANN index is trained)
+        self.effective_spec = DEFAULT_INDEX_SPEC
+        self._sequences = {}  # document key -> next chunk sequence number
+        # Full-precision copies of quantized vectors, used for rescoring (None when not kept)
+        self.vectors = None
+        # Page, chunk type and offsets of each chunk, for filtered search
+        self.metadata = MetadataStore()
+        self._reset_summary()
+        # Chunks appended and ids removed since the sparse index saved at _sparse_base
+        self._sparse_base = None
+        self._sparse_added = []
+        self._sparse_removed = []
+
+        # Vectors are added to a Flat index during ingestion; ANN specs are built from it
+        # in save_index once all vectors (and therefore the training set) are known.
+        # The IDMap2 wrapper keeps stable 64-bit chunk ids (see chunk_store.chunk_ids).
+        if self.use_gpu:
+            self.index = faiss.IndexIDMap2(faiss.GpuIndexFlatL2(self.res, self.dimension))
+        else:
+            self.index = faiss.IndexIDMap2(faiss.IndexFlatL2(self.dimension))
+
+    def add_embeddings(self, embeddings, texts, doc_id=None, metadata=None):
+        """
+        Appends chunks to the index. Chunks of a document get ids that combine a hash of
+        `doc_id` with a per-document sequence number, so they can later be deleted or
+        replaced without touching the rest of the index. Returns the assigned ids.
+        `metadata` holds one chunk_metadata dict per chunk, used by filtered search.
+        """
+        self._ensure_id_mapped()
+        key = document_key(doc_id) if doc_id is not None else 0
+        start = self._next_sequence(key)
+        ids = chunk_ids(key, start, len(texts))
+        self.index.add_with_ids(np.asarray(embeddings, dtype='float32'), ids)
+        self._update_summary(embeddings)
+        self.chunks.append(ids, texts)
+        if self.sparse_index:
+            self._sparse_added.append((ids, list(texts)))
+        if self.vectors is not None:
+            self.vectors.append(ids, embeddings)
+        if metadata is not None:
+            self.metadata.append(ids, metadata)
+        self._sequences[key] = start + len(texts)
+        return ids
+
+    def _next_sequence(self, key):
+        if key not in self._sequences:
+            ids = self.chunks.ids()
+            ids = ids[document_keys_of(ids) == key]
+            self._sequences[key] = int((ids & SEQUENCE_MASK).max()) + 1 if len(ids) else 0
+        return self._sequences[key]
+
+    def has_document_ids(self):
+        """False for indexes written before chunk ids, whose chunks belong to no document."""
+        ids = self.chunks.ids()
+        return bool(len(ids)) and bool(document_keys_of(ids).any())
+
+    def document_chunk_ids(self, doc_id):
+        """Returns the ids of every chunk of a document."""
+        ids = self.chunks.ids()
+        return ids[document_keys_of(ids) == document_key(doc_id)]
+
+    def delete_document(self, doc_id):
+        """Removes every chunk of a document. Returns the number of chunks removed."""
+        return self.delete_chunks(self.document_chunk_ids(doc_id))
+
+    def delete_chunks(self, ids):
+        """Removes chunks by id from the index and the chunk store. Returns the number removed."""
+        ids = np.asarray(ids, dtype=np.int64)
+        if not len(ids):
+            return 0
+        self._ensure_id_mapped()
+        try:
+            self.index.remove_ids(faiss.IDSelectorBatch(ids))
+        except RuntimeError:
+            # HNSW (and GPU) indexes cannot remove vectors in place
+            self._rebuild_without(ids)
+        self._sequences.clear()
+        if self.index.ntotal == 0:
+            self._reset_summary()
+        if self.vectors is not None:
+            self.vectors.remove(ids)
+        self.metadata.remove(ids)
+        if self.sparse_index:
+            self._sparse_removed.append(ids)
+            # Chunks appended and removed again before a save never reach the sparse index
+            remaining = []
+            for added_ids, texts in self._sparse_added:
+                keep = ~np.isin(added_ids, ids)
+                remaining.append((added_ids[keep], [text for text, kept in zip(texts, keep) if kept]))
+            self._sparse_added = remaining
+        return self.chunks.remove(ids)
+
+    def _rebuild_without(self, ids):
+        """Rebuilds the index from its stored vectors, leaving out `ids`."""
+        print(f"Rebuilding FAISS index without {len(ids)} removed chunks...")
+        vectors, all_ids = vectors_and_ids(self.index)
+        keep = ~np.isin(all_ids, ids)
+        spec = self.effective_spec if faiss.try_extract_index_ivf(self.index) is None else DEFAULT_INDEX_SPEC
+        index = faiss.index_factory(self.dimension, "IDMap2," + spec)
+        if not index.is_trained:
+            index.train(vectors[keep])
+        index.add_with_ids(vectors[keep], all_ids[keep])
+        self.index = self._to_device(index)
+
+    def _ensure_id_mapped(self):
+        """
+        Converts an index saved before chunk ids (implicit ids 0..n-1, no IDMap) into an
+        IDMap2 Flat index with the same ids. The configured spec is rebuilt on save.
+        """
+        if is_id_mapped(self.index):
+            return
+        print(f"Converting FAISS index with {self.index.ntotal} sequential ids to an ID-mapped index...")
+        vectors, ids = vectors_and_ids(self.index)
+        index = faiss.IndexIDMap2(faiss.IndexFlatL2(self.dimension))
+        index.add_with_ids(vectors, ids)
+        self.index = self._to_device(index)
+        self.effective_spec = DEFAULT_INDEX_SPEC
+
+    def _to_device(self, cpu_index):
+        if not self.use_gpu:
+            return cpu_index
+        try:
+            return faiss.index_cpu_to_gpu(self.res, 0, cpu_index)
+        except RuntimeError as e:
+            # Not every index type has a GPU implementation (e.g. HNSW)
+            print(f"Keeping FAISS index on CPU: {e}")
+            return cpu_index
+
+    def _search_parameters(self, search_params=None, selector=None):
+        """
+        Builds per-call faiss SearchParameters from the configured defaults and request
+        overrides. Per-call parameters leave the shared (cached) index untouched.
+        `selector` restricts the search to the ids it accepts.
+        """
+        params = {**self.search_params, **(search_params or {})}
+        unknown = set(params) - set(SEARCH_PARAM_NAMES)
+        if unknown:
+            raise ValueError(f"Unsupported FAISS search parameters: {sorted(unknown)}. Use {SEARCH_PARAM_NAMES}.")
+
+        ivf = faiss.try_extract_index_ivf(self.index)
+        if ivf is not None and (params.get("nprobe") or selector is not None):
+            return faiss.SearchParametersIVF(nprobe=int(params.get("nprobe") or ivf.nprobe), sel=selector)
+        hnsw = base_index(self.index)
+        if isinstance(hnsw, faiss.IndexHNSW) and (params.get("efSearch") or selector is not None):
+            return faiss.SearchParametersHNSW(efSearch=int(params.get("efSearch") or hnsw.hnsw.efSearch), sel=selector)
+        if selector is not None:
+            return faiss.SearchParameters(sel=selector)
+        return None
+
+    def filter_ids(self, filters):
+        """Returns the ids of the chunks matching a filter expression (see chunk_metadata.normalize_filter)."""
+        return self.metadata.select(normalize_filter(filters), self.chunks.ids())
+
+    def _search(self, queries, top_k, search_params=None, filters=None):
+        """
+        Runs the index search for a (n, d) query matrix. On quantized indexes with
+        rescoring enabled, rescore_factor * top_k candidates are fetched and re-ranked
+        by their exact distance to the full-precision vectors.
+        `filters` pre-filters the search: the index only visits chunks whose ids pass an
+        IDSelectorBatch built from the matching chunk ids.
+        """
+        selector = None
+        if filters:
+            if self.use_gpu:
+                raise ValueError("Filtered search needs a CPU FAISS index; GPU indexes do not support id selectors.")
+            allowed = self.filter_ids(filters)
+            if not len(allowed):
+                return (np.full((len(queries), top_k), np.inf, dtype='float32'),
+                        np.full((len(queries), top_k), -1, dtype=np.int64))
+            selector = faiss.IDSelectorBatch(allowed)
+        params = self._search_parameters(search_params, selector)
+        rescore = self.rescore_factor > 1 and self.vectors is not None and is_lossy(self.effective_spec)
+        k = top_k * self.rescore_factor if rescore else top_k
+        if params is not None:
+            distances, indices = self.index.search(queries, k, params=params)
         else:
-            self.index = faiss.IndexFlatL2(self.dimension)
+            distances, indices = self.index.search(queries, k)
+        if rescore:
+            distances, indices = self._rescore(queries, distances, indices, top_k)
+        return distances, indices
 
-    def add_embeddings(self, embeddings, texts):
-        self.index.add(embeddings)
-        self.update_id_map(texts)
+    def _check_rescoring(self):
+        """
+        Warns (once per index file) when rescoring is enabled on a quantized index that has
+        no full-precision vectors. They are only written when a Flat ingestion index is first
+        built as the quantized spec, so the index must be rebuilt from float32 vectors.
+        """
+        if self.rescore_factor <= 1 or self.vectors is not None or not is_lossy(self.effective_spec):
+            return
+        if self.path in _rescore_warnings:
+            return
+        _rescore_warnings.add(self.path)
+        print(f"Warning: rescore_factor is {self.rescore_factor} but {self.path} ('{self.effective_spec}') has no "
+              f"float32 vectors, so results are not rescored. Delete the index and re-ingest its documents to enable rescoring.")
 
-    def search(self, query_embedding, top_k=5):
+    def _rescore(self, queries, distances, indices, top_k):
+        """Re-ranks candidates by exact squared L2 distance, reading only their rows from disk."""
+        vectors, found = self.vectors.get_many(indices.ravel())
+        vectors = vectors.reshape(indices.shape + (self.dimension,))
+        exact = ((vectors - queries[:, None, :]) ** 2).sum(axis=2)
+        # Candidates without a stored vector keep their approximate distance
+        distances = np.where(found.reshape(indices.shape), exact, distances)
+        distances[indices < 0] = np.inf
+        order = np.argsort(distances, axis=1, kind="stable")[:, :top_k]
+        return np.take_along_axis(distances, order, axis=1), np.take_along_axis(indices, order, axis=1)
+
+    def search(self, query_embedding, top_k=5, search_params=None, filters=None):
         """
         Searches the FAISS index for the closest embeddings.
         Returns a list of (text, score) tuples.
+        `search_params` overrides the configured nprobe / efSearch for this call.
+        `filters` restricts the search to chunks matching a metadata filter expression.
         """
-        print('faiss')
-        distances, indices = self.index.search(np.array([query_embedding]), top_k)
-        results = [(self.id_map[idx], distances[0][i]) for i, idx in enumerate(indices[0]) if idx in self.id_map]
+        distances, indices = self._search(np.array([query_embedding], dtype='float32'), top_k, search_params, filters)
+        # Only the top-k records are read from the chunk store
+        texts = self.chunks.get_many(indices[0])
+        results = [(text, distances[0][i]) for i, text in enumerate(texts) if indices[0][i] != -1 and text is not None]
         return results
 
+    def search_batch(self, query_embeddings, top_k=5, search_params=None, include_vectors=False, filters=None):
+        """
+        Searches many queries with a single matrix search.
+        Returns one list per query of {"id", "text", "score"} dicts, closest first,
+        with each hit's float32 "vector" added when `include_vectors` is set.
+        `filters` applies one metadata filter expression to every query.
+        """
+        queries = np.ascontiguousarray(query_embeddings, dtype='float32')
+        distances, indices = self._search(queries, top_k, search_params, filters)
+        texts = self.chunks.get_many(indices.ravel())
+        valid = indices.ravel() != -1
+        vectors = None
+        if include_vectors and valid.any():
+            vectors = np.zeros((indices.size, self.dimension), dtype='float32')
+            vectors[valid] = self.get_vectors(indices.ravel()[valid])
+        results = []
+        for q in range(len(queries)):
+            row = []
+            for i in range(top_k):
+                text = texts[q * top_k + i]
+                if indices[q, i] != -1 and text is not None:
+                    hit = {"id": int(indices[q, i]), "text": text, "score": float(distances[q, i])}
+                    if vectors is not None:
+                        hit["vector"] = vectors[q * top_k + i]
+                    row.append(hit)
+            results.append(row)
+        return results
+
+    def get_vectors(self, ids):
+        """
+        Returns the vectors of the given chunk ids, shape (len(ids), d). Full-precision
+        copies are used when the index keeps them; otherwise vectors are reconstructed
+        from the index (decoded approximations on quantized indexes).
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        if self.vectors is not None:
+            vectors, found = self.vectors.get_many(ids)
+            if found.all():
+                return vectors
+        if faiss.try_extract_index_ivf(self.index) is not None:
+            return self._reconstruct_ids(ids)
+        return self.index.reconstruct_batch(ids)
+
+    def sparse_search(self, query_text, top_k=5, filters=None):
+        """
+        Ranks chunks by BM25 score against the query text. Returns (ids, scores), best first.
+        Indexes saved without a sparse index get one built in memory on first use.
+        """
+        if self.path is None:
+            raise ValueError("Sparse search needs an index that was loaded from or saved to disk.")
+        sparse = load_sparse_index(self.path, store_paths(self.path).values(),
+                                   lambda: SparseIndex.build(self.chunks.iter_texts()))
+        return sparse.search(query_text, top_k, allowed_ids=self.filter_ids(filters) if filters else None)
+
+    def hybrid_search(self, query_embedding, query_text, top_k=5, search_params=None, filters=None):
+        """
+        Fuses the dense and BM25 rankings of `hybrid_candidates` chunks each with
+        reciprocal rank fusion. Returns a list of (text, fused score) tuples.
+        """
+        candidates = max(self.hybrid_candidates, top_k)
+        _, dense_ids = self._search(np.array([query_embedding], dtype='float32'), candidates, search_params, filters)
+        dense_ids = dense_ids[0][dense_ids[0] != -1]
+        sparse_ids, _ = self.sparse_search(query_text, candidates, filters)
+        ids, scores = reciprocal_rank_fusion([dense_ids, sparse_ids], top_k=top_k, k=self.rrf_k)
+        texts = self.chunks.get_many(ids)
+        return [(text, score) for text, score in zip(texts, scores) if text is not None]
+
+    def _build_index(self, cpu_index):
+        """
+        Rebuilds a Flat ingestion index as the configured ANN index, training it on the
+        ingested vectors. Falls back to Flat when there are too few vectors to train.
+        IVF indexes store the chunk ids natively; other specs are wrapped in IDMap2.
+        """
+        if self.index_spec == self.effective_spec or self.effective_spec != DEFAULT_INDEX_SPEC:
+            return cpu_index
+
+        ntotal = cpu_index.ntotal
+        required = required_training_points(self.index_spec, self.min_points_per_centroid)
+        if ntotal < max(required, 1):
+            print(f"Keeping Flat index: {ntotal} vectors is below the {required} needed to train '{self.index_spec}'.")
+            return cpu_index
+
+        vectors, ids = vectors_and_ids(cpu_index)
+        index = faiss.index_factory(self.dimension, self.index_spec)
+        if faiss.try_extract_index_ivf(index) is None:
+            index = faiss.index_factory(self.dimension, "IDMap2," + self.index_spec)
+        if not index.is_trained:
+            print(f"Training FAISS index '{self.index_spec}' on {ntotal} vectors...")
+            index.train(vectors)
+        index.add_with_ids(vectors, ids)
+        self.effective_spec = self.index_spec
+        return index
+
+    def _reset_summary(self):
+        """Starts the running centroid and radius of an empty index."""
+        self._vector_sum = np.zeros(self.dimension, dtype=np.float64)
+        self._vector_count = 0
+        self._radius = 0.0
+
+    def _load_summary(self, summary):
+        """Restores the running centroid and radius saved in .meta.json (unknown for older indexes)."""
+        if summary and "count" in summary:
+            self._vector_count = int(summary["count"])
+            self._vector_sum = np.asarray(summary["centroid"], dtype=np.float64) * self._vector_count
+            self._radius = float(summary["radius"])
+        elif self.index.ntotal == 0:
+            self._reset_summary()
+        else:
+            self._vector_count = None  # Recomputed with a full scan on the next save
+
+    def _update_summary(self, vectors):
+        """
+        Folds appended vectors into the running centroid. Old vectors are at most the old
+        radius plus the centroid shift away from the new centroid, so only the new vectors
+        are measured.
+        """
+        vectors = np.asarray(vectors, dtype=np.float64)
+        if self._vector_count is None or not len(vectors):
+            return
+        previous = self._vector_sum / self._vector_count if self._vector_count else None
+        self._vector_sum += vectors.sum(axis=0)
+        self._vector_count += len(vectors)
+        centroid = self._vector_sum / self._vector_count
+        radius = self._radius + float(np.linalg.norm(centroid - previous)) if previous is not None else 0.0
+        self._radius = max(radius, float(np.sqrt(((vectors - centroid) ** 2).sum(axis=1).max())))
+
+    def vector_summary(self, batch_size=DEFAULT_SCAN_BATCH_SIZE):
+        """
+        Returns {"centroid", "radius", "count"}: the mean of the vectors added to the index,
+        an upper bound on the L2 distance of any stored vector from it, and the number of
+        vectors the mean was taken over. None for an empty index. Used to bound the
+        distance of a query to anything in the index (see federated_search).
+
+        The summary is maintained as vectors are appended. Deletes leave it unchanged, which
+        over-estimates the radius but still bounds the remaining vectors. Indexes saved
+        without a running summary are scanned once.
+        """
+        if self.index.ntotal == 0:
+            return None
+        if not self._vector_count:
+            self._reset_summary()
+            for _, vectors in self._iter_vectors(batch_size):
+                self._vector_sum += vectors.sum(axis=0, dtype=np.float64)
+                self._vector_count += len(vectors)
+            centroid = self._vector_sum / self._vector_count
+            for _, vectors in self._iter_vectors(batch_size):
+                self._radius = max(self._radius, float(np.sqrt(((vectors - centroid) ** 2).sum(axis=1).max())))
+        centroid = self._vector_sum / self._vector_count
+        return {"centroid": centroid.tolist(), "radius": self._radius, "count": self._vector_count}
 
-    def save_index(self, path):
+    def _write_meta(self, path, index, summary=None):
+        meta = {
+            "index_spec": self.index_spec,
+            "effective_spec": self.effective_spec,
+            "dimension": self.dimension,
+            "ntotal": int(index.ntotal),
+            "summary": summary,
+        }
+        with open(meta_path_for(path) + ".tmp", "w") as f:
+            json.dump(meta, f, indent=2)
+        os.replace(meta_path_for(path) + ".tmp", meta_path_for(path))
+
+    def _save_sparse_index(self, path, rebuild=False):
+        """
+        Writes the BM25 index. When this index was loaded from `path` with a sparse index,
+        only the chunks appended since are tokenized and merged into the saved postings;
+        otherwise (or with `rebuild`) it is built from every chunk.
+        """
+        if not rebuild and self._sparse_base == path and SparseIndex.exists(path):
+            removed = np.concatenate(self._sparse_removed) if self._sparse_removed else None
+            sparse = SparseIndex.load(path).merge(SparseIndex.build(self._sparse_added), removed)
+        else:
+            sparse = SparseIndex.build(self.chunks.iter_texts())
+        sparse.save(path)
+        self._sparse_base, self._sparse_added, self._sparse_removed = path, [], []
+
+    def save_index(self, path, rebuild_sparse=False):
             """
             Saves the FAISS index to disk. Converts GPU index to CPU index if necessary.
+            Chunk texts go to the memory-mapped chunk store and the index spec to a
+            .meta.json file next to the index.
+            `rebuild_sparse` rebuilds the BM25 index from every chunk instead of merging
+            the appended chunks into the saved one.
             """
             try:
-                id_map_path = os.path.splitext(path)[0] + ".pkl"
-
-                if self.use_gpu:
-                    # Convert GPU index to CPU index before saving
-                    cpu_index = faiss.index_gpu_to_cpu(self.index)
-                    faiss.write_index(cpu_index, path)
-                    with open(id_map_path, 'wb') as f:
-                     pickle.dump(self.id_map, f)
-#             print(f"Index saved to {path}, ID map saved to {id_map_path}")
-                else:
-                    faiss.write_index(self.index, path)
-                    with open(id_map_path, 'wb') as f:
-                     pickle.dump(self.id_map, f)
-#             print(f"Index saved to {path}, ID map saved to {id_map_path}")
-                print(f"FAISS index saved to {path}.")
+                # Scans only legacy indexes; before an ANN build, while the vectors are still exact
+                summary = self.vector_summary()
+                # Convert GPU index to CPU index before saving
+                flat_index = faiss.index_gpu_to_cpu(self.index) if self.use_gpu else self.index
+                exact = self.effective_spec == DEFAULT_INDEX_SPEC
+                cpu_index = self._build_index(flat_index)
+                self.index = self._to_device(cpu_index) if self.use_gpu else cpu_index
+                if self.rescore_factor and exact and is_lossy(self.effective_spec):
+                    # Keep the float32 vectors the quantized index was just built from
+                    vectors, ids = vectors_and_ids(flat_index)
+                    self.vectors = VectorStore.from_arrays(ids, vectors)
+                # Chunks first: ids the index does not return yet, or no longer returns, are harmless
+                self.chunks.save(path)
+                if self.vectors is not None:
+                    self.vectors.save(path)
+                self.metadata.save(path)
+                if self.sparse_index:
+                    self._save_sparse_index(path, rebuild=rebuild_sparse)
+                elif SparseIndex.exists(path):
+                    # A sparse index that is no longer maintained would go stale
+                    os.remove(sparse_index_path(path))
+                write_index_atomic(cpu_index, path)
+                self._write_meta(path, cpu_index, summary)
+                self.path = path
+                self._check_rescoring()
+                print(f"FAISS index saved to {path} ({self.effective_spec}).")
             except Exception as e:
                 raise RuntimeError(f"Error saving FAISS index: {e}")
 
-    def load_index(self, path):
+    def load_index(self, path, use_cache=True):
             """
             Loads the FAISS index from disk. Converts it to GPU index if necessary.
+            Indexes are kept resident in the shared index cache, so repeat loads of an
+            unchanged file skip disk I/O. Pass use_cache=False to get a private copy
+            that is safe to modify.
+            With mmap enabled, cached indexes are opened read-only on a memory map.
+            """
+            paths = ([path, meta_path_for(path), metadata_store_path(path)] + list(store_paths(path).values())
+                     + list(vector_store_paths(path).values()))
+            if use_cache:
+                self.index, self.chunks, self.vectors, self.metadata, meta = get_index_cache().get(
+                    (path, self.use_gpu), paths, lambda: self._read_index(path, mmap=self.mmap)
+                )
+            else:
+                self.index, self.chunks, self.vectors, self.metadata, meta = self._read_index(path)
+            # Indexes written before the spec was recorded are Flat
+            self.index_spec = meta.get("index_spec", DEFAULT_INDEX_SPEC)
+            self.effective_spec = meta.get("effective_spec", DEFAULT_INDEX_SPEC)
+            self.dimension = self.index.d
+            self._load_summary(meta.get("summary"))
+            self._sequences = {}
+            self._sparse_base, self._sparse_added, self._sparse_removed = path, [], []
+            self.path = path
+            self._check_rescoring()
+
+    def _read_index(self, path, mmap=False):
+            """
+            Reads the FAISS index, chunk store, full-precision vector store (None when the
+            index has none), chunk metadata store and index metadata from disk.
+            Indexes saved with a pickled id_map are migrated to a chunk store.
             """
             try:
-                id_map_path = os.path.splitext(path)[0] + ".pkl"
-
-                cpu_index = faiss.read_index(path)
-                if self.use_gpu:
-                    self.index = faiss.index_cpu_to_gpu(self.res, 0, cpu_index)
-                    with open(id_map_path, 'rb') as f:
-                        self.id_map = pickle.load(f)
-                    print(f"Index loaded from {path}, ID map loaded from {id_map_path}")
+                if mmap:
+                    cpu_index, _ = read_index_mmap(path)
                 else:
-                    self.index = cpu_index
-                    with open(id_map_path, 'rb') as f:
-                        self.id_map = pickle.load(f)
-                    print(f"Index loaded from {path}, ID map loaded from {id_map_path}")
-                print(f"FAISS index loaded from {path}.")
+                    cpu_index = faiss.read_index(path)
+                index = self._to_device(cpu_index)
+                chunks = load_chunk_store(path, compression=self.chunk_compression)
+                meta = {}
+                if os.path.exists(meta_path_for(path)):
+                    with open(meta_path_for(path)) as f:
+                        meta = json.load(f)
+                vectors = VectorStore.open(path) if VectorStore.exists(path) else None
+                metadata = MetadataStore.load(path)
+                print(f"Index loaded from {path} with {len(chunks)} chunks")
+                return index, chunks, vectors, metadata, meta
             except Exception as e:
                 raise RuntimeError(f"Error loading FAISS index: {e}")
 
-    def update_id_map(self, texts):
-        start_id = self.index.ntotal - len(texts)
-        for i, text in enumerate(texts):
-            self.id_map[start_id + i] = text
-    
+    def iter_chunks(self, batch_size=DEFAULT_SCAN_BATCH_SIZE, include_vectors=False):
+        """
+        Yields every chunk in batches of {"id", "text"} dicts, adding a float32 "vector"
+        when `include_vectors` is set. Only one batch is held in memory at a time.
+        Vectors are reconstructed a batch at a time with reconstruct_n over contiguous
+        index positions; IVF indexes, whose ids are not positional, look them up by id.
+        """
+        if not include_vectors:
+            for ids, texts in self.chunks.iter_texts(batch_size):
+                yield [{"id": int(i), "text": text} for i, text in zip(ids, texts)]
+            return
+
+        for ids, vectors in self._iter_vectors(batch_size):
+            texts = self.chunks.get_many(ids)
+            batch = [{"id": int(i), "text": text, "vector": vector}
+                     for i, text, vector in zip(ids, texts, vectors) if text is not None]
+            if batch:
+                yield batch
+
+    def _iter_vectors(self, batch_size):
+        """Yields (ids, vectors) batches covering every vector in the index."""
+        if faiss.try_extract_index_ivf(self.index) is not None:
+            ids = self.chunks.ids()
+            for start in range(0, len(ids), batch_size):
+                yield ids[start:start + batch_size], self._reconstruct_ids(ids[start:start + batch_size])
+            return
+
+        index, ntotal = base_index(self.index), self.index.ntotal
+        if isinstance(self.index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+            id_map = faiss.rev_swig_ptr(self.index.id_map.data(), ntotal)
+        else:
+            id_map = np.arange(ntotal, dtype=np.int64)
+        for start in range(0, ntotal, batch_size):
+            count = min(batch_size, ntotal - start)
+            yield np.array(id_map[start:start + count], dtype=np.int64), index.reconstruct_n(start, count)
+
+    def _reconstruct_ids(self, ids):
+        """Reconstructs IVF vectors by id, adding a hash table direct map on first use."""
+        ivf = faiss.extract_index_ivf(self.index)
+        with _direct_map_lock:
+            if ivf.direct_map.type == faiss.DirectMap.NoMap:
+                ivf.set_direct_map_type(faiss.DirectMap.Hashtable)
+        return self.index.reconstruct_batch(np.asarray(ids, dtype=np.int64))
+
     def get_all(self):
         """
-        Retrieve all embeddings and their associated texts from the FAISS index.
+        Retrieve all texts from the FAISS index. Prefer iter_chunks for large indexes.
         """
-        total_vectors = self.index.ntotal
-        if total_vectors == 0:
-            return []
-        embeddings = [self.index.reconstruct(i) for i in range(total_vectors)]
-        results = [self.id_map[idx] for idx in total_vectors if idx in self.id_map]
-        return results
+        return [chunk["text"] for batch in self.iter_chunks() for chunk in batch]
 
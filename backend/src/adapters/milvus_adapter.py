@@ -1,5 +1,9 @@
 import os
+import json
 from pymilvus import connections, FieldSchema, CollectionSchema, DataType, Collection
+from chunk_metadata import normalize_filter
+
+RANGE_OPERATORS = {"gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
 
 class MilvusVectorDB:
     def __init__(self, collection_name, dimension=768, host="localhost", port="19530"):
@@ -15,32 +19,90 @@ class MilvusVectorDB:
     def _initialize_or_load_collection(self):
         """
         Initialize or load the collection in Milvus.
+        Chunk text, chunk id and metadata (doc_id, page, chunk_type, offsets) are stored in dynamic fields.
         """
         fields = [
             FieldSchema(name="id", dtype=DataType.INT64, is_primary=True, auto_id=True),
             FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=self.dimension),
         ]
-        schema = CollectionSchema(fields)
+        schema = CollectionSchema(fields, enable_dynamic_field=True)
         return Collection(name=self.collection_name, schema=schema)
 
-    def add_embeddings(self, ids, embeddings):
+    def add_embeddings(self, ids, embeddings, metadata=None):
         """
-        Add embeddings and IDs to the collection.
+        Add embeddings to the collection. The primary key is generated by Milvus; each
+        64-bit chunk id in `ids` is stored in the "chunk_id" dynamic field, which
+        delete_chunks matches on. `metadata` dicts are inserted as dynamic fields too,
+        so searches can filter on them and delete_document can match on doc_id. Their
+        "text" field is returned by search_batch and iter_chunks.
         """
-        self.collection.insert([ids, embeddings])
+        metadata = metadata or [{}] * len(ids)
+        self.collection.insert([
+            {"embedding": list(map(float, embedding)), "chunk_id": int(chunk_id), **entry}
+            for chunk_id, embedding, entry in zip(ids, embeddings, metadata)
+        ])
+
+    @staticmethod
+    def _filter_expr(filters):
+        """Translates a metadata filter expression into a Milvus boolean expression (None when empty)."""
+        clauses = []
+        for field, op, value in normalize_filter(filters):
+            if op == "range":
+                clauses.extend(f"{field} {RANGE_OPERATORS[operator]} {bound}" for operator, bound in value.items())
+            else:
+                clauses.append(f"{field} in {json.dumps(value)}")
+        return " and ".join(clauses) or None
 
-    def search(self, query_embedding, top_k=5):
+    def search(self, query_embedding, top_k=5, search_params=None, filters=None):
         """
         Search for nearest neighbors to the given query embedding.
+        `search_params` may set nprobe (IVF indexes) and efSearch (HNSW indexes).
+        `filters` is a metadata filter expression, applied as a Milvus boolean expression.
         """
+        search_params = search_params or {}
+        params = {"nprobe": search_params.get("nprobe", 10)}
+        if "efSearch" in search_params:
+            params["ef"] = search_params["efSearch"]
         results = self.collection.search(
             data=[query_embedding],
             anns_field="embedding",
-            param={"metric_type": "L2", "params": {"nprobe": 10}},
+            param={"metric_type": "L2", "params": params},
             limit=top_k,
+            expr=self._filter_expr(filters),
+            output_fields=["chunk_id", "text"],
         )
         return results
 
+    def search_batch(self, query_embeddings, top_k=5, search_params=None, include_vectors=False, filters=None):
+        """
+        Searches many queries in a single Milvus search call.
+        Returns one list per query of {"id", "text", "score"} dicts, closest first,
+        with each hit's "vector" added when `include_vectors` is set. "id" is the
+        chunk id. `filters` applies one metadata filter expression to every query.
+        """
+        search_params = search_params or {}
+        params = {"nprobe": search_params.get("nprobe", 10)}
+        if "efSearch" in search_params:
+            params["ef"] = search_params["efSearch"]
+        results = self.collection.search(
+            data=[list(map(float, embedding)) for embedding in query_embeddings],
+            anns_field="embedding",
+            param={"metric_type": "L2", "params": params},
+            limit=top_k,
+            expr=self._filter_expr(filters),
+            output_fields=["chunk_id", "text", "embedding"] if include_vectors else ["chunk_id", "text"],
+        )
+        batches = []
+        for hits in results:
+            batch = []
+            for hit in hits:
+                chunk = {"id": hit.entity.get("chunk_id", hit.id), "text": hit.entity.get("text"), "score": hit.distance}
+                if include_vectors:
+                    chunk["vector"] = hit.entity.get("embedding")
+                batch.append(chunk)
+            batches.append(batch)
+        return batches
+
     def drop_collection(self):
         """
         Drop the current collection.
@@ -56,12 +118,50 @@ class MilvusVectorDB:
         self.collection.flush()
         print(f"Collection {self.collection_name} has been flushed to disk.")
 
-    def get_all(self):
+    def iter_chunks(self, batch_size=1000, include_vectors=False):
         """
-        Retrieve all embeddings and associated metadata from the Milvus collection.
+        Yields every entity of the collection in batches of {"id", "text"} dicts, adding a
+        "vector" when `include_vectors` is set. Pages are read with a query iterator.
         """
+        output_fields = ["id", "chunk_id", "text", "embedding"] if include_vectors else ["id", "chunk_id", "text"]
         try:
-            results = self.collection.query(expr="*", output_fields=["id", "embedding"])
-            return [item["text"] for item in results]
+            iterator = self.collection.query_iterator(batch_size=batch_size, expr="id >= 0", output_fields=output_fields)
+            try:
+                while True:
+                    entities = iterator.next()
+                    if not entities:
+                        break
+                    batch = []
+                    for entity in entities:
+                        chunk = {"id": entity.get("chunk_id", entity["id"]), "text": entity.get("text")}
+                        if include_vectors:
+                            chunk["vector"] = entity["embedding"]
+                        batch.append(chunk)
+                    yield batch
+            finally:
+                iterator.close()
         except Exception as e:
-            raise RuntimeError(f"Error retrieving all records from Milvus: {e}")
+            raise RuntimeError(f"Error scanning records from Milvus: {e}")
+
+    def delete_document(self, doc_id):
+        """Removes every entity whose doc_id field matches. Returns the number of entities removed."""
+        try:
+            return self.collection.delete(expr=f"doc_id in {json.dumps([doc_id])}").delete_count
+        except Exception as e:
+            raise RuntimeError(f"Error deleting document from Milvus: {e}")
+
+    def delete_chunks(self, ids):
+        """Removes entities by chunk id. Returns the number of entities removed."""
+        ids = [int(chunk_id) for chunk_id in ids]
+        if not ids:
+            return 0
+        try:
+            return self.collection.delete(expr=f"chunk_id in {json.dumps(ids)}").delete_count
+        except Exception as e:
+            raise RuntimeError(f"Error deleting chunks from Milvus: {e}")
+
+    def get_all(self):
+        """
+        Retrieve all texts from the Milvus collection. Prefer iter_chunks for large collections.
+        """
+        return [chunk["text"] for batch in self.iter_chunks() for chunk in batch if chunk["text"] is not None]
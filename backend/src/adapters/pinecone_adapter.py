@@ -1,7 +1,10 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
 from pinecone import Pinecone, ServerlessSpec
 import numpy as np
 import re
+from chunk_metadata import normalize_filter
+from chunk_store import SEQUENCE_BITS, document_key
 
 def sanitize_index_name(name):
     """
@@ -14,12 +17,26 @@ def sanitize_index_name(name):
     return sanitized
 
 
+def vector_id(chunk_id):
+    """
+    Formats a 64-bit chunk id as a fixed-width hex Pinecone vector id. The document key
+    fills the leading digits, so a document's vectors can be listed by prefix.
+    """
+    return f"{int(chunk_id):016x}"
+
+
+def document_prefix(doc_id):
+    """Returns the vector id prefix shared by every chunk of `doc_id`."""
+    return vector_id(document_key(doc_id) << SEQUENCE_BITS)[:-SEQUENCE_BITS // 4]
+
+
 class PineconeVectorDB:
     def __init__(self, api_key=None, environment="us-east-1", index_name="vector_index",dimension=768):
         if not api_key:
             api_key = os.getenv("PINECONE_API_KEY")
             if not api_key:
                 raise ValueError("Pinecone API key not found. Set it in the environment or pass it explicitly.")
+        self.dimension = dimension
         index_name = sanitize_index_name(index_name)
         print(f"Initializing Pinecone index '{index_name}' with dimension: {dimension}")
 
@@ -42,7 +59,8 @@ class PineconeVectorDB:
         # Connect to the index
         self.index = self.pinecone.Index(index_name)
 
-    def add_embeddings(self, embeddings, texts, namespace="default-namespace", metadata_key="text"):
+    def add_embeddings(self, embeddings, texts, namespace="default-namespace", metadata_key="text", start_id=0, metadata=None,
+                       ids=None):
         """
         Adds embeddings to the Pinecone index, including metadata.
 
@@ -51,14 +69,21 @@ class PineconeVectorDB:
             texts (list): A list of corresponding texts.
             namespace (str): Namespace for grouping vectors in Pinecone.
             metadata_key (str): Key under which text will be stored as metadata.
+            start_id (int): Offset of the first vector ID when `ids` is not given.
+            metadata (list, optional): Chunk metadata dicts (doc_id, page, chunk_type, offsets) stored
+                next to the text for filtered search.
+            ids (list, optional): 64-bit chunk ids (chunk_store.chunk_ids), stored as hex vector ids.
         """
+        metadata = metadata or [{}] * len(texts)
+        if ids is None:
+            ids = range(start_id, start_id + len(texts))
         vectors = [
             {
-                "id": f"vec-{i}",
+                "id": vector_id(ids[i]),
                 "values": embedding.tolist(),  # Convert numpy array to list
-                "metadata": {metadata_key: text}  # Store the text as metadata
+                "metadata": {**entry, metadata_key: text}  # Store the text as metadata
             }
-            for i, (embedding, text) in enumerate(zip(embeddings, texts))
+            for i, (embedding, text, entry) in enumerate(zip(embeddings, texts, metadata))
         ]
 
         # Use Pinecone's upsert API to insert the vectors
@@ -71,13 +96,25 @@ class PineconeVectorDB:
 
 
 
-    def search(self, query_embedding, top_k=5,namespace="default-namespace"):
+    @staticmethod
+    def _metadata_filter(filters):
+        """Translates a metadata filter expression into a Pinecone metadata filter (None when empty)."""
+        native = {}
+        for field, op, value in normalize_filter(filters):
+            if op == "range":
+                native[field] = {f"${operator}": bound for operator, bound in value.items()}
+            else:
+                native[field] = {"$in": value}
+        return native or None
+
+    def search(self, query_embedding, top_k=5,namespace="default-namespace", filters=None):
         """
         Searches for nearest neighbors in the Pinecone index.
         
         Args:
             query_embedding (list or np.ndarray): The query vector for the search.
             top_k (int): The number of nearest neighbors to retrieve.
+            filters (dict, optional): Metadata filter expression, applied as a Pinecone metadata filter.
 
         Returns:
             list of tuples: Each tuple contains (text or id, score) from the search results.
@@ -88,7 +125,8 @@ class PineconeVectorDB:
                 query_embedding = query_embedding.tolist()
 
             # Perform the search
-            response = self.index.query(namespace=namespace,vector=query_embedding, top_k=top_k, include_values=True, include_metadata=True)
+            response = self.index.query(namespace=namespace,vector=query_embedding, top_k=top_k, include_values=True, include_metadata=True,
+                                        filter=self._metadata_filter(filters))
 
             # Extract matches and process results
             matches = response.get('matches', [])
@@ -100,27 +138,93 @@ class PineconeVectorDB:
                 for match in matches
             ]
 
-            # Debugging: Print raw response and processed results
-            print(f"Processed results: {results}")
-
             return results
 
         except Exception as e:
             raise RuntimeError(f"Error during Pinecone search: {e}")
 
-    def get_all(self, namespace="default-namespace"):
+    def search_batch(self, query_embeddings, top_k=5, namespace="default-namespace", max_concurrency=8, include_vectors=False,
+                     filters=None):
         """
-        Retrieve all vectors and metadata from the Pinecone index.
+        Searches many queries. Pinecone's query API takes one vector per request, so the
+        requests are issued concurrently over the client's connection pool.
+        Returns one list per query of {"id", "text", "score"} dicts, closest first,
+        with each match's "vector" added when `include_vectors` is set.
+        `filters` applies one metadata filter expression to every query.
         """
+        metadata_filter = self._metadata_filter(filters)
+
+        def query(embedding):
+            response = self.index.query(namespace=namespace, vector=np.asarray(embedding).tolist(), top_k=top_k,
+                                        include_metadata=True, include_values=include_vectors, filter=metadata_filter)
+            hits = []
+            for match in response.get('matches', []):
+                hit = {"id": match['id'], "text": (match.get('metadata') or {}).get('text'), "score": match['score']}
+                if include_vectors:
+                    hit["vector"] = np.asarray(match['values'], dtype='float32')
+                hits.append(hit)
+            return hits
+
         try:
-            query_response = self.index.query(
-                vector=[0] * self.dimension,  # Dummy vector to trigger retrieval
-                top_k=10000,  # Adjust as needed based on index size
-                include_metadata=True,
-                namespace=namespace
-            )
-            return [item["metadata"]["text"] for item in query_response["matches"] if "text" in item["metadata"]]
+            with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(query_embeddings)))) as executor:
+                return list(executor.map(query, query_embeddings))
+        except Exception as e:
+            raise RuntimeError(f"Error during Pinecone batch search: {e}")
 
+    def iter_chunks(self, batch_size=100, include_vectors=False, namespace="default-namespace"):
+        """
+        Yields every vector of a namespace in batches of {"id", "text"} dicts, adding a
+        "vector" when `include_vectors` is set. Ids are paged with the list endpoint's
+        pagination token and each page is fetched by id, so memory stays bounded.
+        """
+        try:
+            for page_ids in self.index.list(namespace=namespace, limit=batch_size):
+                if not page_ids:
+                    continue
+                vectors = self.index.fetch(ids=list(page_ids), namespace=namespace).vectors
+                batch = []
+                for vector_id in page_ids:
+                    vector = vectors.get(vector_id)
+                    if vector is None:
+                        continue  # Deleted between list and fetch
+                    chunk = {"id": vector_id, "text": (vector.metadata or {}).get("text")}
+                    if include_vectors:
+                        chunk["vector"] = np.asarray(vector.values, dtype='float32')
+                    batch.append(chunk)
+                if batch:
+                    yield batch
         except Exception as e:
-            raise RuntimeError(f"Error retrieving all records from Pinecone: {e}")
+            raise RuntimeError(f"Error scanning records from Pinecone: {e}")
+
+    def delete_document(self, doc_id, namespace="default-namespace"):
+        """
+        Removes every vector of `doc_id`. Its ids are listed by their document prefix.
+        Returns the number of vectors removed.
+        """
+        removed = 0
+        try:
+            for page_ids in self.index.list(prefix=document_prefix(doc_id), namespace=namespace):
+                if page_ids:
+                    self.index.delete(ids=list(page_ids), namespace=namespace)
+                    removed += len(page_ids)
+        except Exception as e:
+            raise RuntimeError(f"Error deleting document from Pinecone: {e}")
+        return removed
+
+    def delete_chunks(self, ids, namespace="default-namespace"):
+        """Removes vectors by chunk id. Returns the number of ids deleted."""
+        ids = [vector_id(chunk_id) for chunk_id in ids]
+        try:
+            if ids:
+                self.index.delete(ids=ids, namespace=namespace)
+        except Exception as e:
+            raise RuntimeError(f"Error deleting chunks from Pinecone: {e}")
+        return len(ids)
+
+    def get_all(self, namespace="default-namespace"):
+        """
+        Retrieve all texts from the Pinecone index. Prefer iter_chunks for large indexes.
+        """
+        return [chunk["text"] for batch in self.iter_chunks(namespace=namespace) for chunk in batch
+                if chunk["text"] is not None]
 
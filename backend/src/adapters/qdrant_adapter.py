@@ -1,6 +1,10 @@
 from qdrant_client import QdrantClient
-from qdrant_client.models import VectorParams, Distance, PointStruct
+from qdrant_client.models import (
+    VectorParams, Distance, PointStruct, SearchRequest, Filter, FieldCondition, MatchAny, MatchValue, Range,
+    PayloadSchemaType, FilterSelector, PointIdsList
+)
 import os
+from chunk_metadata import FILTER_FIELDS, normalize_filter
 
 class QdrantVectorDB:
     def __init__(self, collection_name="vector_collection", dimension=768, mode="local", host="localhost", port=6333, path=None, api_key=None):
@@ -46,6 +50,13 @@ class QdrantVectorDB:
                         collection_name=self.collection_name,
                         vectors_config=VectorParams(size=self.dimension, distance=Distance.COSINE),
                     )
+                    # Payload indexes let filtered searches skip non-matching points inside the HNSW traversal
+                    for field, kind in FILTER_FIELDS.items():
+                        self.client.create_payload_index(
+                            collection_name=self.collection_name,
+                            field_name=field,
+                            field_schema=PayloadSchemaType.INTEGER if kind is int else PayloadSchemaType.KEYWORD,
+                        )
                     print(f"Collection '{self.collection_name}' created.")
                 else:
                     print(f"Collection '{self.collection_name}' already exists. Connected to the collection.")
@@ -73,49 +84,121 @@ class QdrantVectorDB:
         ]
         self.client.upsert(collection_name=self.collection_name, points=points)
 
-    def search(self, query_embedding, top_k=5):
+    @staticmethod
+    def _payload_filter(filters):
+        """Translates a metadata filter expression into a Qdrant payload Filter (None when empty)."""
+        conditions = []
+        for field, op, value in normalize_filter(filters):
+            if op == "range":
+                conditions.append(FieldCondition(key=field, range=Range(**value)))
+            else:
+                conditions.append(FieldCondition(key=field, match=MatchAny(any=value)))
+        return Filter(must=conditions) if conditions else None
+
+    def search(self, query_embedding, top_k=5, filters=None):
         """
         Search for the nearest neighbors in the Qdrant collection.
         Args:
             query_embedding (list): The query vector for searching.
             top_k (int): Number of nearest neighbors to return.
+            filters (dict, optional): Metadata filter expression, applied as a payload filter.
         Returns:
             list: List of search results with ID, score, and payload.
         """
         results = self.client.search(
             collection_name=self.collection_name,
             query_vector=query_embedding,
+            query_filter=self._payload_filter(filters),
             limit=top_k,
             with_payload=True,
         )
-        print(results)
         return [
                 {"id": point.id, "score": point.score, "payload": point.payload}
                 for point in results
             ]
         
-    def get_all(self):
+    def search_batch(self, query_embeddings, top_k=5, include_vectors=False, filters=None):
+        """
+        Searches many queries in one request with Qdrant's batch search API.
+        Returns one list per query of {"id", "text", "score"} dicts, closest first,
+        with each point's "vector" added when `include_vectors` is set.
+        `filters` applies one metadata filter expression to every query.
         """
-        Retrieve all embeddings and metadata from the Qdrant collection.
+        query_filter = self._payload_filter(filters)
+        requests = [
+            SearchRequest(vector=list(map(float, embedding)), filter=query_filter, limit=top_k, with_payload=True,
+                          with_vector=include_vectors)
+            for embedding in query_embeddings
+        ]
+        responses = self.client.search_batch(collection_name=self.collection_name, requests=requests)
+        results = []
+        for points in responses:
+            hits = []
+            for point in points:
+                hit = {"id": point.id, "text": (point.payload or {}).get("text"), "score": point.score}
+                if include_vectors:
+                    hit["vector"] = point.vector
+                hits.append(hit)
+            results.append(hits)
+        return results
+
+    def iter_chunks(self, batch_size=1000, include_vectors=False):
+        """
+        Yields every point of the collection in batches of {"id", "text"} dicts, adding a
+        "vector" when `include_vectors` is set. Pages are read with the scroll cursor.
         """
         try:
-            results = []
-            scroll_id = None
+            offset = None
             while True:
-                response = self.client.scroll(
+                points, offset = self.client.scroll(
                     collection_name=self.collection_name,
                     scroll_filter=None,
-                    limit=1000,
+                    limit=batch_size,
                     with_payload=True,
-                    offset=scroll_id
+                    with_vectors=include_vectors,
+                    offset=offset
                 )
-                # Extract only the 'text' field from payloads
-                results.extend([
-                    point.payload.get("text", "") for point in response.points if "text" in point.payload
-                ])
-                scroll_id = response.offset
-                if not scroll_id:
+                batch = []
+                for point in points:
+                    chunk = {"id": point.id, "text": (point.payload or {}).get("text")}
+                    if include_vectors:
+                        chunk["vector"] = point.vector
+                    batch.append(chunk)
+                if batch:
+                    yield batch
+                if offset is None:
                     break
-            return results
         except Exception as e:
-            raise RuntimeError(f"Error retrieving all records from Qdrant: {e}")
+            raise RuntimeError(f"Error scanning records from Qdrant: {e}")
+
+    def delete_document(self, doc_id):
+        """
+        Removes every point whose payload has `doc_id` (an indexed field).
+        Returns the number of points removed.
+        """
+        document_filter = Filter(must=[FieldCondition(key="doc_id", match=MatchValue(value=doc_id))])
+        try:
+            removed = self.client.count(collection_name=self.collection_name, count_filter=document_filter,
+                                        exact=True).count
+            if removed:
+                self.client.delete(collection_name=self.collection_name,
+                                   points_selector=FilterSelector(filter=document_filter))
+        except Exception as e:
+            raise RuntimeError(f"Error deleting document from Qdrant: {e}")
+        return removed
+
+    def delete_chunks(self, ids):
+        """Removes points by id. Returns the number of ids deleted."""
+        ids = [int(chunk_id) for chunk_id in ids]
+        try:
+            if ids:
+                self.client.delete(collection_name=self.collection_name, points_selector=PointIdsList(points=ids))
+        except Exception as e:
+            raise RuntimeError(f"Error deleting chunks from Qdrant: {e}")
+        return len(ids)
+
+    def get_all(self):
+        """
+        Retrieve all texts from the Qdrant collection. Prefer iter_chunks for large collections.
+        """
+        return [chunk["text"] for batch in self.iter_chunks() for chunk in batch if chunk["text"] is not None]
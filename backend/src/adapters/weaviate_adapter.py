@@ -1,6 +1,10 @@
 import weaviate
 import os
 import weaviate.classes as wvc
+from weaviate.util import generate_uuid5
+from chunk_metadata import FILTER_FIELDS, normalize_filter
+
+RANGE_OPERATORS = {"gt": "GreaterThan", "gte": "GreaterThanEqual", "lt": "LessThan", "lte": "LessThanEqual"}
 
 def connect_to_weaviate_cloud(cluster_url, api_key):
     """
@@ -55,34 +59,95 @@ class WeaviateVectorDB:
             self.client.schema.create_class({
                 "class": self.class_name,
                 "vectorizer": "none",  # Using custom vectors
-                "properties": [],
+                "properties": [
+                    {"name": "text", "dataType": ["text"]},  # Chunk text returned with search results
+                    {"name": "chunk_id", "dataType": ["text"]},  # 64-bit ids do not survive JSON numbers
+                ],
             })
         else:
             print(f"Class {self.class_name} already exists.")
 
-    def add_embeddings(self, ids, embeddings):
+    def add_embeddings(self, ids, embeddings, metadata=None):
+        """
+        Adds one object per embedding. `metadata` dicts (chunk text, doc_id, page,
+        chunk_type, offsets) become object properties; searches return the "text"
+        property and can filter on the others. Each 64-bit chunk id is stored as the
+        "chunk_id" text property and, hashed, as the object UUID, so re-adding a chunk
+        replaces it.
+        """
+        metadata = metadata or [{}] * len(ids)
         try:
-            for id_, embedding in zip(ids, embeddings):
+            for id_, embedding, entry in zip(ids, embeddings, metadata):
                 if len(embedding) != self.dimension:
                     raise ValueError(f"Embedding dimension mismatch. Expected {self.dimension}, got {len(embedding)}")
                 self.client.data_object.create(
-                    data_object={"id": id_},
+                    data_object={"chunk_id": str(id_), **entry},
                     class_name=self.class_name,
                     vector=embedding,
+                    uuid=generate_uuid5(str(id_)),
                 )
             print(f"Successfully added {len(ids)} embeddings to {self.class_name}.")
         except Exception as e:
             print(f"Error adding embeddings: {e}")
 
-    def search(self, query_embedding, top_k=5):
+    @staticmethod
+    def _where_filter(filters):
+        """Translates a metadata filter expression into a Weaviate `where` filter (None when empty)."""
+        operands = []
+        for field, op, value in normalize_filter(filters):
+            value_key = "valueInt" if FILTER_FIELDS[field] is int else "valueText"
+            if op == "range":
+                operands.extend({"path": [field], "operator": RANGE_OPERATORS[operator], value_key: bound}
+                                for operator, bound in value.items())
+            else:
+                matches = [{"path": [field], "operator": "Equal", value_key: item} for item in value]
+                operands.append(matches[0] if len(matches) == 1 else {"operator": "Or", "operands": matches})
+        if not operands:
+            return None
+        return operands[0] if len(operands) == 1 else {"operator": "And", "operands": operands}
+
+    def search(self, query_embedding, top_k=5, filters=None):
+        """
+        Searches the class for the closest objects. Returns a list of (text, distance)
+        tuples, closest first. `filters` is applied as a `where` filter.
+        """
+        hits = self.search_batch([query_embedding], top_k, filters=filters)[0]
+        return [(hit["text"], hit["score"]) for hit in hits if hit["text"] is not None]
+
+    def search_batch(self, query_embeddings, top_k=5, include_vectors=False, filters=None):
+        """
+        Searches many queries in one GraphQL request, one aliased Get per query.
+        Returns one list per query of {"id", "text", "score"} dicts, closest first,
+        with each object's "vector" added when `include_vectors` is set.
+        `filters` applies one metadata filter expression to every query.
+        """
+        additional = ["distance", "vector"] if include_vectors else ["distance"]
+        where = self._where_filter(filters)
         try:
-            response = self.client.query.get(self.class_name, ["id"]).with_near_vector({"vector": query_embedding}).with_limit(top_k).do()
-            matches = response.get("data", {}).get("Get", {}).get(self.class_name, [])
-            results = [(match["id"], match["_additional"]["distance"]) for match in matches]
+            queries = []
+            for i, embedding in enumerate(query_embeddings):
+                query = (self.client.query.get(self.class_name, ["chunk_id", "text"])
+                         .with_near_vector({"vector": list(map(float, embedding))})
+                         .with_limit(top_k)
+                         .with_additional(additional)
+                         .with_alias(f"q{i}"))
+                if where is not None:
+                    query = query.with_where(where)
+                queries.append(query)
+            response = self.client.query.multi_get(queries).do()
+            data = response.get("data", {}).get("Get", {})
+            results = []
+            for i in range(len(query_embeddings)):
+                hits = []
+                for match in data.get(f"q{i}") or []:
+                    hit = {"id": int(match["chunk_id"]), "text": match.get("text"), "score": match["_additional"]["distance"]}
+                    if include_vectors:
+                        hit["vector"] = match["_additional"]["vector"]
+                    hits.append(hit)
+                results.append(hits)
             return results
         except Exception as e:
-            print(f"Error during search: {e}")
-            return []
+            raise RuntimeError(f"Error during Weaviate batch search: {e}")
 
     def test_connection(self):
         try:
@@ -91,18 +156,61 @@ class WeaviateVectorDB:
         except Exception as e:
             print(f"Connection failed: {e}")
 
-    def get_all(self):
+    def iter_chunks(self, batch_size=1000, include_vectors=False):
         """
-        Retrieve all objects and vectors from the Weaviate class.
+        Yields every object of the class in batches of {"id", "text"} dicts, adding a
+        "vector" when `include_vectors` is set. Pages are read with the cursor API
+        (`after` the last object's UUID), which is not capped by the query limit.
         """
+        additional = ["id", "vector"] if include_vectors else ["id"]
+        after = None
         try:
-            results = []
-            response = self.client.query.get(self.class_name, ["id"]).with_limit(10000).with_additional(["vector"]).do()
-            objects = response.get("data", {}).get("Get", {}).get(self.class_name, [])
-            for obj in objects:
-                 # Extract only the 'text' field if available
-                if "text" in obj:
-                    results.append(obj["text"])
-            return results
+            while True:
+                query = self.client.query.get(self.class_name, ["chunk_id", "text"]).with_additional(additional).with_limit(batch_size)
+                if after is not None:
+                    query = query.with_after(after)
+                response = query.do()
+                objects = response.get("data", {}).get("Get", {}).get(self.class_name) or []
+                if not objects:
+                    break
+                batch = []
+                for obj in objects:
+                    chunk_id = obj.get("chunk_id")
+                    chunk = {"id": int(chunk_id) if chunk_id else obj["_additional"]["id"], "text": obj.get("text")}
+                    if include_vectors:
+                        chunk["vector"] = obj["_additional"]["vector"]
+                    batch.append(chunk)
+                yield batch
+                after = objects[-1]["_additional"]["id"]
+        except Exception as e:
+            raise RuntimeError(f"Error scanning records from Weaviate: {e}")
+
+    def delete_document(self, doc_id):
+        """Removes every object whose `doc_id` property matches. Returns the number of objects removed."""
+        try:
+            result = self.client.batch.delete_objects(
+                class_name=self.class_name,
+                where={"path": ["doc_id"], "operator": "Equal", "valueText": doc_id},
+            )
+        except Exception as e:
+            raise RuntimeError(f"Error deleting document from Weaviate: {e}")
+        return result["results"]["successful"]
+
+    def delete_chunks(self, ids):
+        """Removes objects by chunk id. Returns the number of objects removed."""
+        removed = 0
+        try:
+            for chunk_id in ids:
+                uuid = generate_uuid5(str(int(chunk_id)))
+                if self.client.data_object.exists(uuid, class_name=self.class_name):
+                    self.client.data_object.delete(uuid, class_name=self.class_name)
+                    removed += 1
         except Exception as e:
-            raise RuntimeError(f"Error retrieving all records from Weaviate: {e}")
+            raise RuntimeError(f"Error deleting chunks from Weaviate: {e}")
+        return removed
+
+    def get_all(self):
+        """
+        Retrieve all texts from the Weaviate class. Prefer iter_chunks for large classes.
+        """
+        return [chunk["text"] for batch in self.iter_chunks() for chunk in batch if chunk["text"] is not None]
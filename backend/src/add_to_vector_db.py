@@ -1,9 +1,15 @@
 import os
+import time
+from contextlib import nullcontext
 from VectorDB import VectorDB
-from pdf2image import convert_from_path
+from embedding_pool import EmbeddingPool, get_pool_settings
+from ingest_pipeline import IngestPipeline, get_pipeline_settings, DEFAULT_QUEUE_SIZE, DEFAULT_BATCH_SIZE
 from dotenv import load_dotenv
+from chunk_metadata import chunk_metadata
+from answer_cache import invalidate_answer_cache
 from pdf_extractor import (
-    extract_text_with_fitz,
+    extract_pages_with_fitz,
+    chunk_pages,
     extract_tables,
     extract_figures,
     process_figure_with_clip,
@@ -42,7 +48,57 @@ def extract_pdf_with_llama(pdf_path):
 
     return parsed_texts  # Return the fully combined text
 
-    
+
+def open_vector_db(db_path, db_type, db_config, embedding_provider, embedding_model, use_gpu, api_key, doc_id):
+    """
+    Initializes the vector database a document is added to. An existing FAISS index
+    is loaded; on every backend the chunks of an earlier upload of the document are removed.
+    """
+    db = VectorDB(
+        db_path=db_path,
+        db_type=db_type,
+        db_config=db_config,
+        provider=embedding_provider,
+        model_name=embedding_model,
+        use_gpu=use_gpu,
+        api_key=api_key,
+        collection_name=os.path.splitext(os.path.basename(db_path))[0],  # Milvus-specific
+        index_name=os.path.splitext(os.path.basename(db_path))[0]  # Pinecone-specific
+    )
+    # Append to an existing FAISS index, replacing any earlier version of this document
+    if db_type == "faiss" and os.path.exists(db_path):
+        db.load_index(db_path, use_cache=False)
+        if db.db.has_document_ids():
+            removed = db.delete_document(doc_id)
+            print(f"Appending {doc_id} to {db_path}" + (f", replacing {removed} existing chunks." if removed else "."))
+        else:
+            # Indexes written before chunk ids cannot tell documents apart; keep overwriting them
+            print(f"{db_path} predates per-document chunk ids; rebuilding it from {doc_id}.")
+            db.db.clear()
+    elif db_type != "faiss":
+        removed = db.delete_document(doc_id)
+        if removed:
+            print(f"Replacing {removed} existing chunks of {doc_id} in the {db_type} database.")
+    return db
+
+
+def open_embedding_pool(embedding_provider, embedding_model, workers, threads_per_worker, api_key, shard_size):
+    """
+    Returns a context manager for the embedding worker pool. It yields an EmbeddingPool
+    when `workers` > 1 and None otherwise, in which case chunks are encoded in-process.
+    """
+    if workers <= 1:
+        return nullcontext()
+    return EmbeddingPool(
+        embedding_provider,
+        embedding_model,
+        workers,
+        threads_per_worker=threads_per_worker,
+        api_key=api_key,
+        shard_size=shard_size,
+    )
+
+
 def add_pdf_to_vector_db(
     pdf_path,
     db_path='vector_db.index',
@@ -52,62 +108,118 @@ def add_pdf_to_vector_db(
     embedding_model='all-mpnet-base-v2',
     use_gpu=True,
     use_llama=False,
-    api_key=None
+    api_key=None,
+    embedding_workers=None,
+    threads_per_worker=None,
+    streaming=None
 ):
     """
     Processes a PDF, extracts text and tables, and adds them to a vector database.
+    With `embedding_workers` > 1 the chunks are encoded by a pool of worker processes
+    (each limited to `threads_per_worker` threads) and inserted window by window.
+    Returns a throughput report for the embedding and insert step.
+    An existing FAISS index at `db_path` is appended to, and chunks of an earlier
+    upload of the same PDF (matched by file name) are replaced.
+    Every chunk is stored with its document, page, chunk type (text, table or figure)
+    and character offsets, which searches can filter on.
+    With `streaming` (None follows config.yaml) pages flow through an IngestPipeline:
+    extraction, chunking, embedding and batched inserts overlap and memory stays flat
+    in the page count.
+    A PDF without extractable content still replaces an earlier upload: its old chunks
+    are deleted and the index is saved, and the report counts 0 chunks.
     """
     try:
-        # Extract content from PDF
-        if use_llama and llama_available:
-            print("Using LlamaParse for document extraction...")
-            parsed_texts = extract_pdf_with_llama(pdf_path)
+        doc_id = os.path.basename(pdf_path)
+        workers, threads_per_worker, shard_size = get_pool_settings(embedding_workers, threads_per_worker)
+        settings = get_pipeline_settings()
+        streaming = settings.get("enabled", False) if streaming is None else streaming
+        if streaming and not (use_llama and llama_available):
+            print("Streaming pages through the ingest pipeline...")
+            db = open_vector_db(db_path, db_type, db_config, embedding_provider, embedding_model, use_gpu, api_key, doc_id)
+            queue_size = settings.get("queue_size", DEFAULT_QUEUE_SIZE)
+            batch_size = settings.get("batch_size", DEFAULT_BATCH_SIZE)
+            with open_embedding_pool(embedding_provider, embedding_model, workers, threads_per_worker, api_key,
+                                     shard_size) as pool:
+                if pool is not None:
+                    # Batches large enough to keep every worker busy
+                    batch_size = max(batch_size, shard_size * workers)
+                pipeline = IngestPipeline(db, doc_id, queue_size=queue_size, batch_size=batch_size,
+                                          encode_fn=pool.encode if pool is not None else None)
+                report = pipeline.run(pdf_path)
+                report["pool"] = pool.report() if pool is not None else None
+            for name, stage in report["stages"].items():
+                print(f"  {name}: {stage['items']} items in {stage['busy_seconds']:.2f}s busy ({stage['items_per_second']:.1f}/s)")
+            if report["chunks"]:
+                print(f"Embedded and inserted {report['chunks']} chunks in {report['seconds']:.2f}s ({report['chunks_per_second']:.1f} chunks/s).")
+            else:
+                print("No content extracted from the PDF.")
         else:
-            print("Using regular extraction methods...")
-            print("Extracting content...")
-            full_text = extract_text_with_fitz(pdf_path)
-            tables = extract_tables(pdf_path)
-            figures = extract_figures(pdf_path)
-
-            parsed_texts = chunk_text_by_semantics(preprocess_text(full_text))
-            parsed_texts += tables
-            # Save figures (Optional: Store as metadata)
-            
-        if not parsed_texts:
-            print("No content extracted from the PDF.")
-            return
-
-        print(f"Extracted {len(parsed_texts)} items from the PDF.")
-
-        # Initialize the vector database
-        db = VectorDB(
-            db_path=db_path,
-            db_type=db_type,
-            db_config=db_config,
-            provider=embedding_provider,
-            model_name=embedding_model,
-            use_gpu=use_gpu,
-            api_key=api_key,
-            collection_name=os.path.splitext(os.path.basename(db_path))[0],  # Milvus-specific
-            index_name=os.path.splitext(os.path.basename(db_path))[0]  # Pinecone-specific
-        )
-            # Process figures using CLIP
-        if figures:
-            print(f"Extracted {len(figures)} figures from the PDF.")
-            for i, figure in enumerate(figures):
-                caption, clip_embedding = process_figure_with_clip(figure, i)
+            figures, figure_pages = [], []
+            # Extract content from PDF
+            if use_llama and llama_available:
+                print("Using LlamaParse for document extraction...")
+                parsed_texts = extract_pdf_with_llama(pdf_path)
+                metadata = [chunk_metadata(doc_id, chunk_type="text") for _ in parsed_texts]
+            else:
+                print("Using regular extraction methods...")
+                print("Extracting content...")
+                pages = extract_pages_with_fitz(pdf_path)
+                tables, table_pages = extract_tables(pdf_path, with_pages=True)
+                figures, figure_pages = extract_figures(pdf_path, with_pages=True)
+
+                parsed_texts, spans = chunk_pages(pages)
+                metadata = [chunk_metadata(doc_id, page, "text", start, end) for page, start, end in spans]
+                parsed_texts += tables
+                metadata += [chunk_metadata(doc_id, page, "table") for page in table_pages]
+
+            print(f"Extracted {len(parsed_texts)} items from the PDF.")
+
+            # Initialize the vector database
+            db = open_vector_db(db_path, db_type, db_config, embedding_provider, embedding_model, use_gpu, api_key, doc_id)
 
-                # Append caption to parsed_texts
-                parsed_texts.append(caption)
-
-                # Add figure embedding directly to the vector database
-                if clip_embedding is not None:
-                    print(clip_embedding.shape)
-                    db.add_embeddings(clip_embeddings=clip_embedding, texts=[caption])
-
-
-        # Add embeddings to the vector database
-        db.add_embeddings(parsed_texts)
+            # Process figures using CLIP
+            if figures:
+                print(f"Extracted {len(figures)} figures from the PDF.")
+                for i, (figure, page) in enumerate(zip(figures, figure_pages)):
+                    caption, clip_embedding = process_figure_with_clip(figure, i)
+                    figure_metadata = chunk_metadata(doc_id, page, "figure")
+
+                    # Append caption to parsed_texts
+                    parsed_texts.append(caption)
+                    metadata.append(figure_metadata)
+
+                    # Add figure embedding directly to the vector database
+                    if clip_embedding is not None:
+                        db.add_embeddings(clip_embeddings=clip_embedding, texts=[caption], doc_id=doc_id,
+                                          metadata=[figure_metadata])
+
+
+            # Add embeddings to the vector database
+            start_time = time.perf_counter()
+            pool_report = None
+            if not parsed_texts:
+                print("No content extracted from the PDF.")
+            else:
+                with open_embedding_pool(embedding_provider, embedding_model, workers, threads_per_worker, api_key,
+                                         shard_size) as pool:
+                    if pool is not None:
+                        db.add_texts_streaming(parsed_texts, encode_fn=pool.encode, window_size=shard_size * workers * 2,
+                                               doc_id=doc_id, metadata=metadata)
+                        pool_report = pool.report()
+                    else:
+                        db.add_embeddings(parsed_texts, doc_id=doc_id, metadata=metadata)
+                if pool_report is not None:
+                    print(f"Embedding pool: {pool_report['chunks_per_second']:.1f} chunks/s encoded, "
+                          f"worker utilization {pool_report['worker_utilization']:.0%}")
+            elapsed = time.perf_counter() - start_time
+            report = {
+                "chunks": len(parsed_texts),
+                "seconds": elapsed,
+                "chunks_per_second": len(parsed_texts) / elapsed if elapsed else 0.0,
+                "pool": pool_report,
+            }
+            if parsed_texts:
+                print(f"Embedded and inserted {report['chunks']} chunks in {elapsed:.2f}s ({report['chunks_per_second']:.1f} chunks/s).")
 
         # Save the FAISS index if applicable
         if db_type == "faiss":
@@ -115,6 +227,8 @@ def add_pdf_to_vector_db(
             print(f"FAISS index saved at {db_path}.")
         else:
             print(f"Data added to {db_type} vector database.")
+        invalidate_answer_cache(db_path)
+        return report
 
     except Exception as e:
         print(f"Error adding PDF to vector database: {e}")
@@ -0,0 +1,200 @@
+import json
+import time
+import threading
+from collections import OrderedDict
+import numpy as np
+import faiss
+from config import load_config
+from index_cache import file_signature
+from chunk_store import store_paths
+
+DEFAULT_THRESHOLD = 0.95
+DEFAULT_NEAR_MISS_MARGIN = 0.05
+DEFAULT_MAX_ENTRIES = 1000
+DEFAULT_TTL_SECONDS = 3600
+DEFAULT_MAX_SCOPES = 64
+
+
+def normalize(embedding):
+    vector = np.asarray(embedding, dtype='float32').reshape(1, -1)
+    return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+
+class SemanticAnswerCache:
+    """
+    LLM answers of one (db_path, model, provider) scope, looked up by query similarity.
+
+    Normalized query embeddings are kept in an in-memory inner-product index, so a
+    lookup is one nearest-neighbour search and a query whose cosine similarity to a
+    cached query reaches `threshold` gets the cached answer. Entries are dropped when
+    the files of the vector index change (re-ingestion), when they outlive the TTL,
+    and least recently used first above `max_entries`.
+    """
+
+    def __init__(self, dimension, paths, threshold=DEFAULT_THRESHOLD, near_miss_margin=DEFAULT_NEAR_MISS_MARGIN,
+                 max_entries=DEFAULT_MAX_ENTRIES, ttl_seconds=DEFAULT_TTL_SECONDS):
+        """
+        Args:
+            dimension (int): Query embedding dimension.
+            paths (list): Files of the vector index; a change to any of them clears the cache.
+            threshold (float): Minimum cosine similarity for a hit.
+            near_miss_margin (float): Misses within this margin below the threshold count as near misses.
+            max_entries (int): Answers kept before the least recently used are evicted.
+            ttl_seconds (float, optional): Age after which an answer is no longer served (None keeps it).
+        """
+        self.dimension = dimension
+        self.paths = list(paths)
+        self.threshold = threshold
+        self.near_miss_margin = near_miss_margin
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(dimension))
+        self.entries = OrderedDict()  # entry id -> (query, response, created)
+        self.signature = file_signature(self.paths)
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.near_misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def _remove(self, entry_ids):
+        self.index.remove_ids(faiss.IDSelectorBatch(np.asarray(entry_ids, dtype=np.int64)))
+        for entry_id in entry_ids:
+            del self.entries[entry_id]
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+    def _clear(self):
+        if self.entries:
+            self.invalidations += 1
+        self.index.reset()
+        self.entries.clear()
+
+    def _validate(self):
+        """Clears the cache when the index files changed. Returns the current signature."""
+        signature = file_signature(self.paths)
+        if signature != self.signature:
+            self._clear()
+            self.signature = signature
+        return signature
+
+    def lookup(self, embedding):
+        """
+        Returns (response, signature): the cached answer of the most similar query when
+        it is similar enough (otherwise None), and the index signature to pass to `store`.
+        """
+        query = normalize(embedding)
+        with self._lock:
+            signature = self._validate()
+            if self.entries:
+                similarities, ids = self.index.search(query, 1)
+                similarity, entry_id = float(similarities[0, 0]), int(ids[0, 0])
+                if entry_id >= 0 and similarity >= self.threshold:
+                    _, response, created = self.entries[entry_id]
+                    if self.ttl_seconds is None or time.time() - created <= self.ttl_seconds:
+                        self.entries.move_to_end(entry_id)
+                        self.hits += 1
+                        return response, signature
+                    self._remove([entry_id])
+                elif entry_id >= 0 and similarity >= self.threshold - self.near_miss_margin:
+                    self.near_misses += 1
+            self.misses += 1
+            return None, signature
+
+    def store(self, query, embedding, response, signature):
+        """
+        Caches the answer to a query. Answers computed against an index that has
+        changed since `signature` was taken (by `lookup`) are not stored.
+        """
+        with self._lock:
+            if self._validate() != signature:
+                return
+            entry_id = self._next_id
+            self._next_id += 1
+            self.index.add_with_ids(normalize(embedding), np.array([entry_id], dtype=np.int64))
+            self.entries[entry_id] = (query, response, time.time())
+            if len(self.entries) > self.max_entries:
+                oldest = list(self.entries)[:len(self.entries) - self.max_entries]
+                self._remove(oldest)
+                self.evictions += len(oldest)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "near_misses": self.near_misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions,
+        }
+
+
+_caches = OrderedDict()  # scope key -> SemanticAnswerCache, least recently used first
+_caches_lock = threading.Lock()
+_scope_evictions = 0
+
+
+def get_answer_cache(db_path, model, provider, dimension, options=None, enabled=None):
+    """
+    Returns the answer cache of a (db_path, model, provider) scope, or None when the
+    cache is off. `enabled` opts a request in or out; None follows config.yaml.
+    `options` are the retrieval settings of the request (top_k, filters, search mode...);
+    answers are only shared between requests with equal options. At most
+    `max_scopes` scopes are kept, least recently used first.
+    """
+    global _scope_evictions
+    settings = load_config().get("answer_cache", {})
+    if enabled is None:
+        enabled = settings.get("enabled", False)
+    if not enabled:
+        return None
+
+    key = (db_path, model, provider, json.dumps(options or {}, sort_keys=True, default=str))
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is not None:
+            _caches.move_to_end(key)
+        if cache is None or cache.dimension != dimension:
+            cache = SemanticAnswerCache(
+                dimension,
+                [db_path] + list(store_paths(db_path).values()),
+                threshold=settings.get("threshold", DEFAULT_THRESHOLD),
+                near_miss_margin=settings.get("near_miss_margin", DEFAULT_NEAR_MISS_MARGIN),
+                max_entries=settings.get("max_entries", DEFAULT_MAX_ENTRIES),
+                ttl_seconds=settings.get("ttl_seconds", DEFAULT_TTL_SECONDS),
+            )
+            _caches[key] = cache
+            max_scopes = settings.get("max_scopes", DEFAULT_MAX_SCOPES)
+            while len(_caches) > max_scopes:
+                _caches.popitem(last=False)
+                _scope_evictions += 1
+        return cache
+
+
+def invalidate_answer_cache(db_path):
+    """
+    Drops the cached answers of every scope of `db_path`. Ingestion calls this so that
+    backends without local index files (Pinecone, Qdrant, ...) are invalidated too.
+    """
+    with _caches_lock:
+        caches = [cache for key, cache in _caches.items() if key[0] == db_path]
+    for cache in caches:
+        cache.clear()
+
+
+def answer_cache_stats():
+    """Returns statistics for every answer cache scope of this process."""
+    with _caches_lock:
+        return {
+            "scopes": [
+                {"db_path": key[0], "model": key[1], "provider": key[2], **cache.stats()}
+                for key, cache in _caches.items()
+            ],
+            "scope_evictions": _scope_evictions,
+        }
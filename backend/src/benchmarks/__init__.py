@@ -0,0 +1 @@
+# Benchmark runners. Run from backend/src, e.g. `python -m benchmarks.embedding_benchmark --help`.
@@ -0,0 +1,73 @@
+import os
+import glob
+import hashlib
+import resource
+import numpy as np
+from config import BASE_DIR
+from utils import load_chunks_from_file
+
+PARSED_CHUNKS_DIR = os.path.join(BASE_DIR, "..", "..", "parsed_chunks")
+
+
+class FakeEncoder:
+    """
+    Deterministic stand-in embedding model for offline benchmarks.
+    Each text maps to a unit vector seeded by the sha256 of its contents.
+    """
+
+    def __init__(self, dimension=384):
+        self.dimension = dimension
+
+    def encode(self, texts, batch_size=None):
+        if isinstance(texts, str):
+            texts = [texts]
+        vectors = np.empty((len(texts), self.dimension), dtype="float32")
+        for i, text in enumerate(texts):
+            seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+            vectors[i] = np.random.default_rng(seed).standard_normal(self.dimension)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors
+
+
+def load_corpus(chunks_file=None, pdf_path=None, min_chunks=0):
+    """
+    Loads benchmark chunks from a chunk file, from a PDF run through pdf_extractor,
+    or from every file in parsed_chunks/. The corpus is repeated up to `min_chunks`.
+    """
+    if pdf_path:
+        from pdf_extractor import extract_text_with_fitz, preprocess_text, chunk_text_by_semantics
+        chunks = chunk_text_by_semantics(preprocess_text(extract_text_with_fitz(pdf_path)))
+    elif chunks_file:
+        chunks = load_chunks_from_file(chunks_file)
+    else:
+        chunks = []
+        for path in sorted(glob.glob(os.path.join(PARSED_CHUNKS_DIR, "*_chunks.txt"))):
+            chunks.extend(load_chunks_from_file(path))
+
+    chunks = [chunk for chunk in chunks if chunk.strip()]
+    if not chunks:
+        raise ValueError("Benchmark corpus is empty.")
+    while len(chunks) < min_chunks:
+        chunks = chunks + chunks
+    return chunks
+
+
+def percentiles(samples_ms):
+    """Returns p50/p95/p99 of latency samples in milliseconds."""
+    samples = np.asarray(samples_ms, dtype="float64")
+    return {f"p{p}": float(np.percentile(samples, p)) for p in (50, 95, 99)}
+
+
+def peak_rss_mb():
+    """Returns this process's peak resident set size in MB (Linux reports KB)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def format_table(rows, columns):
+    """Formats a list of dicts as a fixed-width text table."""
+    widths = [max(len(title), *(len(str(row.get(key, ""))) for row in rows)) for key, title in columns]
+    lines = ["  ".join(title.ljust(width) for (_, title), width in zip(columns, widths))]
+    lines.append("  ".join("-" * width for width in widths))
+    for row in rows:
+        lines.append("  ".join(str(row.get(key, "")).ljust(width) for (key, _), width in zip(columns, widths)))
+    return "\n".join(lines)
@@ -0,0 +1,179 @@
+import os
+import json
+import time
+import argparse
+import multiprocessing
+from embedding_config import embedding_configs
+from embedding_providers import encode_texts
+from benchmarks.common import FakeEncoder, load_corpus, percentiles, peak_rss_mb, format_table
+
+DEFAULT_BATCH_SIZES = [1, 8, 32, 128]
+QUERY_LENGTH = 200
+
+
+def parse_targets(specs):
+    """
+    Expands "provider:model" specs into (provider, model_name) pairs.
+    "all" selects every model in embedding_configs and "fake:<dimension>" the offline fake encoder.
+    """
+    targets = []
+    for spec in specs:
+        if spec == "all":
+            targets.extend((provider, name) for provider, models in embedding_configs.items() for name in models)
+            continue
+        provider, _, model_name = spec.partition(":")
+        if provider == "fake":
+            targets.append(("fake", model_name or "384"))
+        elif provider in embedding_configs and model_name in embedding_configs[provider]:
+            targets.append((provider, model_name))
+        elif provider in embedding_configs and not model_name:
+            targets.extend((provider, name) for name in embedding_configs[provider])
+        else:
+            raise ValueError(f"Unknown provider/model '{spec}'. Use provider:model from embedding_config.py.")
+    return targets
+
+
+def benchmark_model(provider, model_name, texts, queries, batch_sizes, device="cpu", api_key=None):
+    """
+    Benchmarks one embedding model in the current process.
+
+    Args:
+        provider (str): Provider from embedding_configs, or "fake".
+        model_name (str): Model name (the dimension for the fake encoder).
+        texts (list): Chunks encoded for the throughput measurements.
+        queries (list): Short texts encoded one at a time for the latency measurements.
+        batch_sizes (list): Batch sizes to measure throughput at.
+        device (str): Device to load the model on.
+        api_key (str, optional): API key for hosted providers.
+    Returns:
+        dict: Load time, latency percentiles, throughput per batch size, peak RSS and dimension.
+    """
+    rss_before = peak_rss_mb()
+    start = time.perf_counter()
+    if provider == "fake":
+        model, is_callable = FakeEncoder(int(model_name)), False
+    else:
+        from embedding_initializer import initialize_embedding_model
+        model, _, is_callable = initialize_embedding_model(provider, model_name, api_key, device=device)
+    load_seconds = time.perf_counter() - start
+
+    # Warm up lazy initialization (kernels, tokenizer caches) before timing
+    encode_texts(model, is_callable, queries[:2])
+
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        embedding = encode_texts(model, is_callable, [query])
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    throughput = {}
+    for batch_size in batch_sizes:
+        start = time.perf_counter()
+        for i in range(0, len(texts), batch_size):
+            encode_texts(model, is_callable, texts[i:i + batch_size], batch_size=batch_size)
+        seconds = time.perf_counter() - start
+        throughput[str(batch_size)] = len(texts) / seconds if seconds else 0.0
+
+    return {
+        "provider": provider,
+        "model_name": model_name,
+        "dimension": int(embedding.shape[-1]),
+        "load_seconds": load_seconds,
+        "latency_ms": percentiles(latencies),
+        "throughput_chunks_per_second": throughput,
+        "peak_rss_mb": peak_rss_mb(),
+        "model_rss_mb": peak_rss_mb() - rss_before,
+    }
+
+
+def _run_isolated(provider, model_name, *args, **kwargs):
+    """Runs benchmark_model in a fresh process so load time and peak RSS are not shared between models."""
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(processes=1, maxtasksperchild=1) as pool:
+        return pool.apply(benchmark_model, (provider, model_name) + args, kwargs)
+
+
+def run_benchmarks(targets, texts, queries, batch_sizes, device="cpu", isolate=True):
+    """Benchmarks every (provider, model_name) target. Failures are recorded instead of aborting the run."""
+    results = []
+    for provider, model_name in targets:
+        print(f"Benchmarking {provider}:{model_name}...")
+        runner = _run_isolated if isolate else benchmark_model
+        try:
+            results.append(runner(provider, model_name, texts, queries, batch_sizes, device=device))
+        except Exception as e:
+            print(f"Benchmark failed for {provider}:{model_name}: {e}")
+            results.append({"provider": provider, "model_name": model_name, "error": str(e)})
+    return results
+
+
+def summary_rows(results, batch_sizes):
+    rows = []
+    for result in results:
+        row = {"model": f"{result['provider']}:{result['model_name']}"}
+        if "error" in result:
+            row["dimension"] = "error"
+            rows.append(row)
+            continue
+        row.update({
+            "dimension": result["dimension"],
+            "load": f"{result['load_seconds']:.2f}s",
+            "p50": f"{result['latency_ms']['p50']:.1f}",
+            "p95": f"{result['latency_ms']['p95']:.1f}",
+            "p99": f"{result['latency_ms']['p99']:.1f}",
+            "rss": f"{result['peak_rss_mb']:.0f}",
+        })
+        for batch_size in batch_sizes:
+            row[f"bs{batch_size}"] = f"{result['throughput_chunks_per_second'][str(batch_size)]:.1f}"
+        rows.append(row)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark embedding providers from embedding_config.py.")
+    parser.add_argument("--models", nargs="+", default=["fake:384"],
+                        help='provider:model pairs, a bare provider, "all", or "fake:<dimension>"')
+    parser.add_argument("--chunks", help="Chunk file written by pdf_extractor.save_chunks_to_file (default: all of parsed_chunks/)")
+    parser.add_argument("--pdf", help="Build the corpus from a PDF with pdf_extractor instead")
+    parser.add_argument("--max_chunks", type=int, default=512, help="Chunks encoded per throughput measurement")
+    parser.add_argument("--queries", type=int, default=100, help="Single-query latency samples")
+    parser.add_argument("--batch_sizes", type=int, nargs="+", default=DEFAULT_BATCH_SIZES)
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--offline", action="store_true", help="Only use locally cached Hugging Face models")
+    parser.add_argument("--no_isolation", action="store_true", help="Run every model in this process (peak RSS becomes cumulative)")
+    parser.add_argument("--output", help="Write the JSON results to this file")
+    args = parser.parse_args()
+
+    if args.offline:
+        # Inherited by the spawned benchmark processes
+        os.environ["HF_HUB_OFFLINE"] = "1"
+        os.environ["TRANSFORMERS_OFFLINE"] = "1"
+
+    chunks = load_corpus(args.chunks, args.pdf, min_chunks=max(args.max_chunks, args.queries))
+    texts = chunks[:args.max_chunks]
+    queries = [chunk[:QUERY_LENGTH] for chunk in chunks[:args.queries]]
+    targets = parse_targets(args.models)
+
+    results = run_benchmarks(targets, texts, queries, args.batch_sizes, device=args.device, isolate=not args.no_isolation)
+    report = {
+        "corpus": {"chunks": len(texts), "queries": len(queries), "source": args.pdf or args.chunks or "parsed_chunks"},
+        "batch_sizes": args.batch_sizes,
+        "device": args.device,
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+    else:
+        print(json.dumps(report, indent=2))
+
+    columns = [("model", "model"), ("dimension", "dim"), ("load", "load"), ("p50", "p50 ms"),
+               ("p95", "p95 ms"), ("p99", "p99 ms"), ("rss", "peak MB")]
+    columns += [(f"bs{batch_size}", f"bs={batch_size} chunks/s") for batch_size in args.batch_sizes]
+    print(format_table(summary_rows(results, args.batch_sizes), columns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import os
+import json
+import time
+import random
+import argparse
+import tempfile
+import multiprocessing
+import fitz
+# Imported like the API and CLI entry points do: spawned extraction workers re-import the
+# parent's __main__, so they pay for this module chain exactly as ingestion workers do.
+import add_to_vector_db  # noqa: F401
+from pdf_extractor import iter_pdf_pages
+from benchmarks.common import format_table
+
+DEFAULT_WORKERS = [1, 2, 4, 8]
+WORDS = ("revenue", "growth", "margin", "vehicle", "energy", "storage", "deliveries", "quarter",
+         "capital", "expenditure", "operating", "cash", "flow", "guidance", "liquidity", "segment")
+
+
+def synthetic_pdf(path, pages, seed=0):
+    """Writes a filing-like PDF of `pages` text-dense pages for offline benchmarks."""
+    rng = random.Random(seed)
+    document = fitz.open()
+    for _ in range(pages):
+        page = document.new_page()
+        sentences = (" ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 24))).capitalize() + "."
+                     for _ in range(60))
+        page.insert_textbox(fitz.Rect(36, 36, 560, 800), " ".join(sentences), fontsize=7)
+    document.save(path)
+    document.close()
+
+
+def worker_startup_seconds(workers):
+    """
+    Times starting `workers` spawned processes and running one empty task on each,
+    which is the import cost every extraction pool pays before its first page.
+    """
+    context = multiprocessing.get_context("spawn")
+    start = time.perf_counter()
+    processes = [context.Process(target=time.sleep, args=(0,)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    return time.perf_counter() - start
+
+
+def benchmark_workers(pdf_path, workers, repeats=3):
+    """
+    Times iter_pdf_pages, the page source of add_pdf_to_vector_db's ingest pipeline, with
+    a given worker count. Returns the best of `repeats` runs (pool startup included) and
+    the extracted pages.
+    """
+    best, pages = None, None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        pages = list(iter_pdf_pages(pdf_path, workers=workers))
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best, pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parallel page extraction through the ingest pipeline's page source.")
+    parser.add_argument("--pdf", help="PDF to extract (default: a synthetic text-dense filing)")
+    parser.add_argument("--pages", type=int, default=400, help="Pages of the synthetic PDF")
+    parser.add_argument("--workers", type=int, nargs="+", default=DEFAULT_WORKERS, help="Worker counts to compare")
+    parser.add_argument("--repeats", type=int, default=3, help="Runs per worker count; the fastest is reported")
+    parser.add_argument("--output", help="Write the JSON results to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pdf_path = args.pdf
+        if not pdf_path:
+            pdf_path = os.path.join(tmp_dir, "synthetic.pdf")
+            synthetic_pdf(pdf_path, args.pages)
+        with fitz.open(pdf_path) as document:
+            page_count = document.page_count
+
+        results, baseline, reference = [], None, None
+        for workers in args.workers:
+            print(f"Extracting {page_count} pages with {workers} worker(s)...")
+            seconds, pages = benchmark_workers(pdf_path, workers, repeats=args.repeats)
+            if reference is None:
+                baseline, reference = seconds, pages
+            elif pages != reference:
+                raise RuntimeError(f"Extraction with {workers} workers differs from the {args.workers[0]}-worker run.")
+            results.append({
+                "workers": workers,
+                "seconds": seconds,
+                "worker_startup_seconds": worker_startup_seconds(workers) if workers > 1 else 0.0,
+                "pages_per_second": page_count / seconds if seconds else 0.0,
+                "speedup": baseline / seconds if seconds else 0.0,
+            })
+
+    for result in results:
+        result["efficiency"] = result["speedup"] * args.workers[0] / result["workers"]
+    report = {"pdf": args.pdf or f"synthetic ({args.pages} pages)", "pages": page_count,
+              "cpus": os.cpu_count(), "results": results}
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+    else:
+        print(json.dumps(report, indent=2))
+
+    rows = [{
+        "workers": result["workers"],
+        "seconds": f"{result['seconds']:.2f}",
+        "startup": f"{result['worker_startup_seconds']:.2f}",
+        "pages_per_second": f"{result['pages_per_second']:.0f}",
+        "speedup": f"{result['speedup']:.2f}x",
+        "efficiency": f"{result['efficiency']:.0%}",
+    } for result in results]
+    columns = [("workers", "workers"), ("seconds", "seconds"), ("startup", "worker startup s"), ("pages_per_second", "pages/s"),
+               ("speedup", "speedup"), ("efficiency", "efficiency")]
+    print(format_table(rows, columns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import os
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import numpy as np
+from adapters.faiss_adapter import FAISSVectorDB
+from sparse_index import SparseIndex
+from benchmarks.common import FakeEncoder, load_corpus, percentiles, format_table
+
+QUERY_WORDS = 6
+
+
+def sample_queries(texts, count, seed=0):
+    """Builds keyword queries from runs of words taken out of random chunks."""
+    rng = np.random.default_rng(seed)
+    queries = []
+    for i in rng.integers(len(texts), size=count):
+        words = texts[i].split()
+        start = int(rng.integers(max(len(words) - QUERY_WORDS, 0) + 1))
+        queries.append(" ".join(words[start:start + QUERY_WORDS]))
+    return queries
+
+
+def time_calls(function, queries):
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        function(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return percentiles(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the latency BM25 and hybrid (RRF) retrieval add to dense FAISS search.")
+    parser.add_argument("--index", help="Saved FAISS index to benchmark (default: build one from the chunk corpus)")
+    parser.add_argument("--chunks", help="Chunk file for the corpus (default: all of parsed_chunks/)")
+    parser.add_argument("--pdf", help="Build the corpus from a PDF with pdf_extractor instead")
+    parser.add_argument("--min_chunks", type=int, default=20000, help="Repeat the corpus up to this many chunks")
+    parser.add_argument("--dimension", type=int, default=768, help="Embedding dimension of the built index")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top_k", type=int, default=5)
+    parser.add_argument("--candidates", type=int, default=50, help="Dense and sparse candidates fused per query")
+    parser.add_argument("--output", help="Write the JSON results to this file")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="hybrid_benchmark_")
+    try:
+        if args.index:
+            path = args.index
+            db = FAISSVectorDB(use_gpu=False, dimension=1, hybrid_candidates=args.candidates)
+            db.load_index(path)
+            texts = [text for _, batch in db.chunks.iter_texts() for text in batch]
+        else:
+            texts = load_corpus(args.chunks, args.pdf, min_chunks=args.min_chunks)
+            path = os.path.join(directory, "corpus.index")
+            db = FAISSVectorDB(use_gpu=False, dimension=args.dimension, hybrid_candidates=args.candidates)
+            db.add_embeddings(FakeEncoder(args.dimension).encode(texts), texts)
+            db.save_index(path)
+            db.load_index(path)
+
+        start = time.perf_counter()
+        sparse = SparseIndex.build(db.chunks.iter_texts())
+        build_seconds = time.perf_counter() - start
+
+        queries = sample_queries(texts, args.queries)
+        # Latency does not depend on what the vectors mean, so queries are embedded with the fake encoder
+        encoder = FakeEncoder(db.dimension)
+        embeddings = {query: vector for query, vector in zip(queries, encoder.encode(queries))}
+        db.sparse_search(queries[0], args.top_k)  # Load the sparse index into the cache before timing
+
+        results = {
+            "dense": time_calls(lambda q: db.search_batch(embeddings[q][None, :], args.top_k), queries),
+            "sparse": time_calls(lambda q: db.sparse_search(q, args.candidates), queries),
+            "hybrid": time_calls(lambda q: db.hybrid_search(embeddings[q], q, args.top_k), queries),
+        }
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    report = {
+        "corpus": {"chunks": len(texts), "vocabulary": len(sparse.vocabulary), "queries": len(queries),
+                   "source": args.index or args.pdf or args.chunks or "parsed_chunks"},
+        "sparse_build_seconds": build_seconds,
+        "sparse_index_mb": sparse.memory_bytes() / 2 ** 20,
+        "candidates": args.candidates,
+        "latency_ms": results,
+        "added_p50_ms": results["hybrid"]["p50"] - results["dense"]["p50"],
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+    else:
+        print(json.dumps(report, indent=2))
+
+    rows = [{"mode": mode, **{p: f"{latency[p]:.3f}" for p in ("p50", "p95", "p99")}} for mode, latency in results.items()]
+    print(format_table(rows, [("mode", "mode"), ("p50", "p50 ms"), ("p95", "p95 ms"), ("p99", "p99 ms")]))
+    print(f"Sparse index: {len(sparse.vocabulary)} terms, {report['sparse_index_mb']:.1f} MB, built in {build_seconds:.2f}s; "
+          f"hybrid adds {report['added_p50_ms']:.3f} ms at p50")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+import os
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import numpy as np
+import faiss
+from adapters.faiss_adapter import FAISSVectorDB
+from benchmarks.common import percentiles, format_table
+
+DEFAULT_STORAGES = ["float32", "fp16", "sq8"]
+
+
+def load_vectors(index_path=None, count=20000, dimension=768, seed=0):
+    """
+    Returns the vectors of a saved FAISS index, or `count` synthetic clustered unit
+    vectors that roughly mimic sentence embeddings when no index is given.
+    """
+    if index_path:
+        db = FAISSVectorDB(use_gpu=False, dimension=1)
+        db.load_index(index_path, use_cache=False)
+        return np.array([chunk["vector"] for batch in db.iter_chunks(4096, include_vectors=True) for chunk in batch],
+                        dtype="float32")
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(count // 100, 1), dimension))
+    vectors = centers[rng.integers(len(centers), size=count)] + 0.6 * rng.standard_normal((count, dimension))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype("float32")
+
+
+def recall_at_k(found, truth):
+    """Mean fraction of the exact top-k neighbours that were returned."""
+    return float(np.mean([len(set(f[f >= 0]) & set(t)) / len(t) for f, t in zip(found, truth)]))
+
+
+def benchmark_storage(vectors, queries, truth, index_spec, storage, rescore_factor, top_k, directory, search_params=None):
+    """
+    Builds, saves and reloads (memory-mapped) one index configuration, then measures its
+    on-disk size, recall@k against exact search and single-query latency.
+    """
+    dimension = vectors.shape[1]
+    db = FAISSVectorDB(use_gpu=False, dimension=dimension, index_spec=index_spec, storage=storage,
+                       rescore_factor=rescore_factor, mmap=True)
+    ids = db.add_embeddings(vectors, [""] * len(vectors))
+    path = os.path.join(directory, f"{storage}_{rescore_factor}.index")
+    db.save_index(path)
+
+    db = FAISSVectorDB(use_gpu=False, dimension=dimension, index_spec=index_spec, storage=storage,
+                       rescore_factor=rescore_factor, mmap=True)
+    db.load_index(path, use_cache=False)
+
+    # Map returned chunk ids back to row numbers of `vectors`
+    position = {int(vector_id): row for row, vector_id in enumerate(ids)}
+    found, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        hits = db.search_batch(query[None, :], top_k, search_params=search_params)[0]
+        latencies.append((time.perf_counter() - start) * 1000)
+        found.append(np.array([position.get(hit["id"], -1) for hit in hits]))
+
+    vector_files = [name for name in os.listdir(directory) if name.startswith(f"{storage}_{rescore_factor}.vectors.")]
+    return {
+        "storage": storage,
+        "effective_spec": db.effective_spec,
+        "rescore_factor": rescore_factor,
+        "index_bytes_per_vector": os.path.getsize(path) / len(vectors),
+        "rescore_disk_bytes_per_vector": sum(os.path.getsize(os.path.join(directory, name)) for name in vector_files) / len(vectors),
+        f"recall_at_{top_k}": recall_at_k(found, truth),
+        "latency_ms": percentiles(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure memory, recall and latency of quantized FAISS vector storage.")
+    parser.add_argument("--index", help="Benchmark the vectors of a saved FAISS index (default: synthetic vectors)")
+    parser.add_argument("--vectors", type=int, default=20000, help="Synthetic vectors when no --index is given")
+    parser.add_argument("--dimension", type=int, default=768, help="Dimension of the synthetic vectors")
+    parser.add_argument("--queries", type=int, default=200, help="Vectors held out as queries")
+    parser.add_argument("--top_k", type=int, default=10)
+    parser.add_argument("--index_spec", default="Flat", help="Base spec the storage is applied to (Flat, IVF<n>,Flat, HNSW<m>)")
+    parser.add_argument("--storages", nargs="+", default=DEFAULT_STORAGES, choices=DEFAULT_STORAGES)
+    parser.add_argument("--rescore_factors", type=int, nargs="+", default=[0, 4], help="0 measures without rescoring")
+    parser.add_argument("--nprobe", type=int, default=None)
+    parser.add_argument("--ef_search", type=int, default=None)
+    parser.add_argument("--output", help="Write the JSON results to this file")
+    args = parser.parse_args()
+
+    vectors = load_vectors(args.index, args.vectors, args.dimension)
+    rng = np.random.default_rng(1)
+    held_out = rng.choice(len(vectors), size=min(args.queries, len(vectors) // 10), replace=False)
+    queries = vectors[held_out]
+    vectors = np.delete(vectors, held_out, axis=0)
+
+    # Ground truth from an exact float32 search
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    _, truth = exact.search(queries, args.top_k)
+
+    search_params = {}
+    if args.nprobe:
+        search_params["nprobe"] = args.nprobe
+    if args.ef_search:
+        search_params["efSearch"] = args.ef_search
+
+    directory = tempfile.mkdtemp(prefix="quantization_benchmark_")
+    results = []
+    try:
+        for storage in args.storages:
+            # Rescoring only changes quantized storage
+            for rescore_factor in (args.rescore_factors if storage != "float32" else [0]):
+                print(f"Benchmarking {storage} storage (rescore_factor={rescore_factor})...")
+                results.append(benchmark_storage(vectors, queries, truth, args.index_spec, storage, rescore_factor,
+                                                 args.top_k, directory, search_params or None))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    report = {
+        "corpus": {"vectors": len(vectors), "dimension": int(vectors.shape[1]), "queries": len(queries),
+                   "source": args.index or "synthetic"},
+        "index_spec": args.index_spec,
+        "top_k": args.top_k,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+    else:
+        print(json.dumps(report, indent=2))
+
+    baseline = next((r for r in results if r["storage"] == "float32"), None)
+    rows = []
+    for result in results:
+        recall = result[f"recall_at_{args.top_k}"]
+        rows.append({
+            "storage": result["storage"],
+            "spec": result["effective_spec"],
+            "rescore": result["rescore_factor"] or "off",
+            "bytes": f"{result['index_bytes_per_vector']:.0f}",
+            "disk": f"{result['rescore_disk_bytes_per_vector']:.0f}",
+            "recall": f"{recall:.4f}",
+            "cost": f"{(baseline[f'recall_at_{args.top_k}'] - recall):+.4f}" if baseline else "",
+            "p50": f"{result['latency_ms']['p50']:.2f}",
+            "p95": f"{result['latency_ms']['p95']:.2f}",
+        })
+    columns = [("storage", "storage"), ("spec", "spec"), ("rescore", "rescore"), ("bytes", "index B/vec"),
+               ("disk", "rescore B/vec"), ("recall", f"recall@{args.top_k}"), ("cost", "recall cost"),
+               ("p50", "p50 ms"), ("p95", "p95 ms")]
+    print(format_table(rows, columns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+import os
+import numpy as np
+from chunk_store import _replace_with, document_key, document_keys_of
+
+CHUNK_TYPES = ("text", "table", "figure")
+# Filterable fields and the type of their values
+FILTER_FIELDS = {"doc_id": str, "page": int, "chunk_type": str, "char_start": int, "char_end": int}
+RANGE_OPERATORS = ("gt", "gte", "lt", "lte")
+
+
+def chunk_metadata(doc_id=None, page=None, chunk_type="text", char_start=None, char_end=None):
+    """
+    Returns the metadata dict stored with a chunk. Unknown values are left out, since
+    not every backend can store nulls.
+
+    Args:
+        doc_id (str, optional): Document the chunk belongs to (the PDF file name).
+        page (int, optional): 1-based page number.
+        chunk_type (str): One of CHUNK_TYPES.
+        char_start (int, optional): Offset of the chunk in the document text.
+        char_end (int, optional): End offset (exclusive) of the chunk in the document text.
+    """
+    if chunk_type not in CHUNK_TYPES:
+        raise ValueError(f"Unsupported chunk type: {chunk_type}. Choose from {CHUNK_TYPES}.")
+    metadata = {"doc_id": doc_id, "page": page, "chunk_type": chunk_type, "char_start": char_start, "char_end": char_end}
+    return {key: value for key, value in metadata.items() if value is not None}
+
+
+def normalize_filter(filters):
+    """
+    Validates a filter expression and returns its conditions as (field, op, value) tuples.
+
+    A filter is a dict of field conditions that must all hold:
+        {"doc_id": "tsla.pdf", "chunk_type": ["table", "figure"], "page": {"gte": 3, "lte": 10}}
+    A scalar matches that value, a list matches any of its values and a dict of
+    gt/gte/lt/lte bounds matches a range (integer fields only). Conditions are
+    returned as ("in", [values]) or ("range", {operator: bound}).
+    """
+    if not filters:
+        return []
+    if not isinstance(filters, dict):
+        raise ValueError(f"A filter must be a dict of field conditions, got {type(filters).__name__}.")
+    conditions = []
+    for field, condition in filters.items():
+        if field not in FILTER_FIELDS:
+            raise ValueError(f"Unsupported filter field: {field}. Choose from {sorted(FILTER_FIELDS)}.")
+        kind = FILTER_FIELDS[field]
+        if isinstance(condition, dict):
+            if kind is not int:
+                raise ValueError(f"Range filters apply to integer fields only, not {field}.")
+            unknown = set(condition) - set(RANGE_OPERATORS)
+            if unknown or not condition:
+                raise ValueError(f"Unsupported range operators for {field}: {sorted(unknown)}. Use {RANGE_OPERATORS}.")
+            conditions.append((field, "range", {op: int(bound) for op, bound in condition.items()}))
+            continue
+        values = list(condition) if isinstance(condition, (list, tuple, set)) else [condition]
+        if not values:
+            raise ValueError(f"Empty value list for filter field {field}.")
+        if any(not isinstance(value, kind) or isinstance(value, bool) for value in values):
+            raise ValueError(f"Filter values of {field} must be of type {kind.__name__}.")
+        if field == "chunk_type" and set(values) - set(CHUNK_TYPES):
+            raise ValueError(f"Unsupported chunk type in filter: {sorted(set(values) - set(CHUNK_TYPES))}.")
+        conditions.append((field, "in", values))
+    return conditions
+
+
+def _range_mask(values, bounds):
+    mask = np.ones(len(values), dtype=bool)
+    for op, bound in bounds.items():
+        mask &= {"gt": values > bound, "gte": values >= bound, "lt": values < bound, "lte": values <= bound}[op]
+    return mask
+
+
+def metadata_store_path(base_path):
+    return os.path.splitext(base_path)[0] + ".chunkmeta.npz"
+
+
+class MetadataStore:
+    """
+    Columnar per-chunk metadata of a FAISS index, keyed by vector id.
+
+    Pages, chunk types and character offsets are kept as numpy columns (-1 when
+    unknown), so a filter is evaluated over the whole corpus with a few vectorized
+    comparisons. The document of a chunk is encoded in its id (see
+    chunk_store.chunk_ids) and is not stored again. Columns and ids take 29 bytes per
+    chunk and are rewritten as a whole on every save.
+    """
+
+    COLUMNS = {"page": np.int32, "chunk_type": np.int8, "char_start": np.int64, "char_end": np.int64}
+
+    def __init__(self):
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._columns = {name: np.zeros(0, dtype=dtype) for name, dtype in self.COLUMNS.items()}
+
+    def __len__(self):
+        return len(self._ids)
+
+    def append(self, ids, metadata):
+        """Adds the metadata dicts of the given vector ids."""
+        if len(ids) != len(metadata):
+            raise ValueError(f"Got {len(ids)} ids for {len(metadata)} metadata entries.")
+        self._ids = np.concatenate([self._ids, np.asarray(ids, dtype=np.int64)])
+        for name, dtype in self.COLUMNS.items():
+            if name == "chunk_type":
+                values = [CHUNK_TYPES.index(entry["chunk_type"]) if "chunk_type" in entry else -1 for entry in metadata]
+            else:
+                values = [entry.get(name, -1) for entry in metadata]
+            self._columns[name] = np.concatenate([self._columns[name], np.asarray(values, dtype=dtype)])
+
+    def remove(self, ids):
+        keep = ~np.isin(self._ids, np.asarray(ids, dtype=np.int64))
+        self._ids = self._ids[keep]
+        self._columns = {name: column[keep] for name, column in self._columns.items()}
+
+    def select(self, conditions, ids):
+        """
+        Returns the subset of `ids` (the live chunk ids) matching every condition of a
+        normalized filter. Chunks without metadata never match a metadata condition.
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        metadata_conditions = [c for c in conditions if c[0] != "doc_id"]
+        for field, op, value in conditions:
+            if field == "doc_id":
+                ids = ids[np.isin(document_keys_of(ids), [document_key(doc_id) for doc_id in value])]
+        if not metadata_conditions:
+            return ids
+
+        mask = np.ones(len(self._ids), dtype=bool)
+        for field, op, value in metadata_conditions:
+            column = self._columns[field]
+            if op == "range":
+                mask &= (column >= 0) & _range_mask(column, value)
+            else:
+                if field == "chunk_type":
+                    value = [CHUNK_TYPES.index(chunk_type) for chunk_type in value]
+                mask &= np.isin(column, value)
+        return ids[np.isin(ids, self._ids[mask])]
+
+    def save(self, base_path):
+        _replace_with(metadata_store_path(base_path), lambda f: np.savez(f, ids=self._ids, **self._columns))
+
+    @classmethod
+    def load(cls, base_path):
+        """Loads the saved metadata of an index; indexes saved without metadata get an empty store."""
+        store = cls()
+        path = metadata_store_path(base_path)
+        if os.path.exists(path):
+            with np.load(path, allow_pickle=False) as data:
+                store._ids = data["ids"]
+                store._columns = {name: data[name] for name in cls.COLUMNS}
+        return store
+
+    def memory_bytes(self):
+        return self._ids.nbytes + sum(column.nbytes for column in self._columns.values())
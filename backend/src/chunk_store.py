@@ -0,0 +1,387 @@
+import os
+import glob
+import json
+import pickle
+import hashlib
+import numpy as np
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+STORE_VERSION = 2
+COMPRESSIONS = (None, "zstd")
+
+# Chunk ids: 39-bit document hash in the high bits, 24-bit chunk sequence in the low bits.
+# Ids stay positive in a signed int64 (FAISS uses -1 for "no result"). Document key 0 is
+# reserved for chunks added without a document (and for indexes built before chunk ids).
+SEQUENCE_BITS = 24
+DOCUMENT_BITS = 39
+SEQUENCE_MASK = (1 << SEQUENCE_BITS) - 1
+# Rewrite the blob once removed records take up more than this share of it
+COMPACTION_RATIO = 0.5
+
+
+def document_key(doc_id):
+    """Returns the 39-bit key of a document name (never 0)."""
+    digest = hashlib.blake2b(str(doc_id).encode("utf-8"), digest_size=8).digest()
+    return (int.from_bytes(digest, "little") & ((1 << DOCUMENT_BITS) - 1)) or 1
+
+
+def chunk_ids(doc_key, start, count):
+    """Returns `count` consecutive chunk ids of a document starting at sequence `start`."""
+    if start + count > SEQUENCE_MASK + 1:
+        raise ValueError(f"A document can hold at most {SEQUENCE_MASK + 1} chunks.")
+    return (np.int64(doc_key) << SEQUENCE_BITS) | np.arange(start, start + count, dtype=np.int64)
+
+
+def document_keys_of(ids):
+    """Returns the document key of each chunk id."""
+    return np.asarray(ids, dtype=np.int64) >> SEQUENCE_BITS
+
+
+def store_paths(base_path):
+    """
+    Returns the files that identify the current version of the store for an index path.
+    The metadata file is replaced on every save, so it changes whenever the store does.
+    """
+    base = os.path.splitext(base_path)[0]
+    return {"meta": base + ".chunks.json"}
+
+
+def _replace_with(path, write):
+    """Writes a file through a temporary sibling and atomically swaps it into place."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class ChunkStore:
+    """
+    Array-backed store for chunk texts keyed by 64-bit vector ids.
+
+    All texts live in one contiguous UTF-8 blob; record i spans
+    blob[offsets[i]:offsets[i + 1]] and belongs to vector id ids[i]. A saved store is
+    opened with memory maps, so loading costs O(1) regardless of corpus size and a
+    search only touches the pages of the k records it returns. Records can be
+    compressed individually with zstd, which keeps random access to single records.
+
+    New records are buffered in memory and appended to the blob by `save`; removed
+    records become tombstones (id -1) until enough of the blob is dead to compact it.
+    Each save writes a new generation of the offsets and ids arrays and commits it by
+    atomically replacing the metadata file, so a crash mid-save leaves the previous
+    version intact and readers holding memory maps keep a consistent view.
+    """
+
+    def __init__(self, compression=None, level=3):
+        """
+        Args:
+            compression (str, optional): None or "zstd" (requires the zstandard package).
+            level (int): zstd compression level.
+        """
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unsupported chunk store compression: {compression}. Choose from {COMPRESSIONS}.")
+        if compression == "zstd" and zstandard is None:
+            raise ValueError("zstd chunk compression requires the zstandard package.")
+        self.compression = compression
+        self.level = level
+        self._blob = np.zeros(0, dtype=np.uint8)
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._meta = None  # metadata of the saved version this store was opened from
+        self._base_path = None
+        self._pending_ids = []
+        self._pending_records = []
+        self._removed = set()  # saved ids removed since the last save
+        self._sorter = None  # argsort of ids when they are not simply 0..n-1
+
+    # Reading
+
+    @classmethod
+    def open(cls, base_path):
+        """Memory-maps a saved store. Raises FileNotFoundError when it does not exist."""
+        meta_path = store_paths(base_path)["meta"]
+        with open(meta_path) as f:
+            meta = json.load(f)
+        base = os.path.splitext(base_path)[0]
+        if "generation" not in meta:
+            # Version 1 stores use fixed file names
+            meta.update(blob=os.path.basename(base) + ".chunks.bin",
+                        offsets=os.path.basename(base) + ".chunks.offsets.npy",
+                        ids=os.path.basename(base) + ".chunks.ids.npy",
+                        generation=0, dead_bytes=0)
+            meta["blob_size"] = os.path.getsize(base + ".chunks.bin") if meta["count"] else 0
+
+        directory = os.path.dirname(meta_path)
+        store = cls(compression=meta.get("compression"), level=meta.get("level", 3))
+        store._meta = meta
+        store._base_path = os.path.abspath(base_path)
+        if meta["count"]:
+            if meta["blob_size"]:
+                # Bytes past blob_size belong to an uncommitted append and are ignored
+                store._blob = np.memmap(os.path.join(directory, meta["blob"]), dtype=np.uint8, mode="r",
+                                        shape=(meta["blob_size"],))
+            store._offsets = np.load(os.path.join(directory, meta["offsets"]), mmap_mode="r")
+            store._ids = np.load(os.path.join(directory, meta["ids"]), mmap_mode="r")
+        return store
+
+    @classmethod
+    def exists(cls, base_path):
+        return os.path.exists(store_paths(base_path)["meta"])
+
+    def __len__(self):
+        dead = int(np.count_nonzero(np.asarray(self._ids) < 0)) if len(self._ids) else 0
+        return len(self._ids) - dead - len(self._removed) + len(self._pending_ids)
+
+    def _rows(self, ids):
+        """Maps vector ids to rows of the saved arrays (-1 when absent or removed)."""
+        ids = np.asarray(ids, dtype=np.int64)
+        count = len(self._ids)
+        if count == 0:
+            return np.full(len(ids), -1, dtype=np.int64)
+        if self._sorter is None:
+            # Sequential ids (the common case) map to rows directly
+            if np.array_equal(self._ids, np.arange(count)):
+                self._sorter = False
+            else:
+                self._sorter = np.argsort(self._ids, kind="stable")
+        if self._sorter is False:
+            rows = ids.copy()
+            rows[(ids < 0) | (ids >= count)] = -1
+        else:
+            positions = np.searchsorted(self._ids, ids, sorter=self._sorter)
+            positions = np.minimum(positions, count - 1)
+            rows = self._sorter[positions]
+            rows[(self._ids[rows] != ids) | (ids < 0)] = -1
+        if self._removed:
+            rows[np.isin(ids, list(self._removed))] = -1
+        return rows
+
+    def _decoder(self):
+        """Returns a record decoder. zstd contexts are not thread-safe, so each call gets its own."""
+        if self.compression == "zstd":
+            decompress = zstandard.ZstdDecompressor().decompress
+            return lambda record: decompress(record).decode("utf-8")
+        return lambda record: record.decode("utf-8")
+
+    def _record(self, row):
+        return bytes(self._blob[self._offsets[row]:self._offsets[row + 1]])
+
+    def get_many(self, ids):
+        """Returns the texts of the given vector ids (None for unknown ids), reading only those records."""
+        results = [None] * len(ids)
+        rows = self._rows(ids)
+        decode = self._decoder()
+        pending = None
+        for i, row in enumerate(rows):
+            if row >= 0:
+                results[i] = decode(self._record(row))
+            elif self._pending_ids:
+                if pending is None:
+                    pending = {vector_id: k for k, vector_id in enumerate(self._pending_ids)}
+                k = pending.get(int(ids[i]))
+                if k is not None:
+                    results[i] = decode(self._pending_records[k])
+        return results
+
+    def get(self, vector_id, default=None):
+        text = self.get_many([vector_id])[0]
+        return default if text is None else text
+
+    def __contains__(self, vector_id):
+        return self.get(vector_id) is not None
+
+    def ids(self):
+        """Returns every live vector id in insertion order."""
+        saved = np.asarray(self._ids)
+        saved = saved[saved >= 0]
+        if self._removed:
+            saved = saved[~np.isin(saved, list(self._removed))]
+        return np.concatenate([saved, np.asarray(self._pending_ids, dtype=np.int64)])
+
+    def iter_texts(self, batch_size=1024):
+        """Yields (ids, texts) batches in insertion order without materializing the whole corpus."""
+        decode = self._decoder()
+        count = len(self._ids)
+        for start in range(0, count, batch_size):
+            stop = min(start + batch_size, count)
+            batch_ids = np.asarray(self._ids[start:stop])
+            live = batch_ids >= 0
+            if self._removed:
+                live &= ~np.isin(batch_ids, list(self._removed))
+            rows = start + np.flatnonzero(live)
+            if len(rows):
+                yield batch_ids[live], [decode(self._record(row)) for row in rows]
+        for start in range(0, len(self._pending_ids), batch_size):
+            yield (np.asarray(self._pending_ids[start:start + batch_size], dtype=np.int64),
+                   [decode(record) for record in self._pending_records[start:start + batch_size]])
+
+    # Writing
+
+    def append(self, ids, texts):
+        """Buffers records for the given vector ids. They are written to disk by `save`."""
+        if len(ids) != len(texts):
+            raise ValueError(f"Got {len(ids)} ids for {len(texts)} texts.")
+        records = [text.encode("utf-8") for text in texts]
+        if self.compression == "zstd":
+            compress = zstandard.ZstdCompressor(level=self.level).compress
+            records = [compress(record) for record in records]
+        self._pending_ids.extend(int(vector_id) for vector_id in ids)
+        self._pending_records.extend(records)
+
+    def remove(self, ids):
+        """Removes records by vector id. Returns the number of records removed."""
+        ids = set(int(vector_id) for vector_id in ids)
+        removed = 0
+        if self._pending_ids:
+            keep = [k for k, vector_id in enumerate(self._pending_ids) if vector_id not in ids]
+            removed += len(self._pending_ids) - len(keep)
+            self._pending_ids = [self._pending_ids[k] for k in keep]
+            self._pending_records = [self._pending_records[k] for k in keep]
+        rows = self._rows(sorted(ids))
+        saved = set(int(self._ids[row]) for row in rows if row >= 0)
+        self._removed |= saved
+        return removed + len(saved)
+
+    def save(self, base_path):
+        """
+        Writes the store next to `base_path`. Buffered records are appended to the
+        existing blob and removals are recorded as tombstones, so the cost of a save
+        is proportional to the changes plus the (8-byte per chunk) offset and id arrays.
+        The blob is rewritten only when saving elsewhere or when it needs compaction.
+        """
+        base = os.path.splitext(base_path)[0]
+        directory = os.path.dirname(os.path.abspath(base_path))
+        prefix = os.path.basename(base)
+        meta = self._meta if self._base_path == os.path.abspath(base_path) else None
+        generation = (meta["generation"] + 1) if meta else 1
+
+        ids = np.array(self._ids, dtype=np.int64)
+        if self._removed:
+            ids[np.isin(ids, list(self._removed))] = -1
+        offsets = np.asarray(self._offsets, dtype=np.int64)
+        dead = ids < 0
+        dead_bytes = int(np.sum(np.diff(offsets)[dead])) if dead.any() else 0
+        compact = meta is None or dead_bytes > COMPACTION_RATIO * max(int(offsets[-1]), 1)
+
+        if compact:
+            # Write the live records (and the buffered ones) into a fresh blob
+            blob_name = f"{prefix}.chunks.{generation}.bin"
+            live = np.flatnonzero(~dead)
+            lengths = np.diff(offsets)[live]
+            new_offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+
+            def write_blob(f):
+                for row in live:
+                    f.write(self._record(row))
+                for record in self._pending_records:
+                    f.write(record)
+
+            _replace_with(os.path.join(directory, blob_name), write_blob)
+            ids, offsets, dead_bytes = ids[live], new_offsets, 0
+        else:
+            # Append after the committed end of the current blob; a crash leaves only ignored bytes
+            blob_name = meta["blob"]
+            with open(os.path.join(directory, blob_name), "r+b" if os.path.exists(os.path.join(directory, blob_name)) else "wb") as f:
+                f.truncate(meta["blob_size"])
+                f.seek(meta["blob_size"])
+                for record in self._pending_records:
+                    f.write(record)
+                f.flush()
+                os.fsync(f.fileno())
+
+        lengths = np.fromiter((len(record) for record in self._pending_records), dtype=np.int64,
+                              count=len(self._pending_records))
+        offsets = np.concatenate([offsets, offsets[-1] + np.cumsum(lengths)])
+        ids = np.concatenate([ids, np.asarray(self._pending_ids, dtype=np.int64)])
+
+        offsets_name = f"{prefix}.chunks.{generation}.offsets.npy"
+        ids_name = f"{prefix}.chunks.{generation}.ids.npy"
+        _replace_with(os.path.join(directory, offsets_name), lambda f: np.save(f, offsets))
+        _replace_with(os.path.join(directory, ids_name), lambda f: np.save(f, ids))
+        new_meta = {
+            "version": STORE_VERSION,
+            "generation": generation,
+            "count": int(len(ids)),
+            "blob": blob_name,
+            "blob_size": int(offsets[-1]),
+            "offsets": offsets_name,
+            "ids": ids_name,
+            "dead_bytes": dead_bytes,
+            "compression": self.compression,
+            "level": self.level,
+        }
+        # Replacing the metadata file commits the new generation
+        _replace_with(store_paths(base_path)["meta"], lambda f: f.write(json.dumps(new_meta).encode("utf-8")))
+        self._remove_stale_files(directory, prefix, new_meta)
+
+        # Continue from the freshly written files
+        saved = ChunkStore.open(base_path)
+        self._blob, self._offsets, self._ids = saved._blob, saved._offsets, saved._ids
+        self._meta, self._base_path = saved._meta, saved._base_path
+        self._pending_ids, self._pending_records = [], []
+        self._removed = set()
+        self._sorter = None
+
+    @staticmethod
+    def _remove_stale_files(directory, prefix, meta):
+        """Deletes files of older generations. Processes that still map them keep their pages."""
+        current = {meta["blob"], meta["offsets"], meta["ids"], prefix + ".chunks.json"}
+        for path in glob.glob(os.path.join(glob.escape(directory), glob.escape(prefix) + ".chunks.*")):
+            if os.path.basename(path) not in current and not path.endswith(".tmp"):
+                os.remove(path)
+
+    def memory_bytes(self):
+        return sum(len(record) for record in self._pending_records)
+
+    @classmethod
+    def from_id_map(cls, id_map, compression=None, level=3):
+        """Builds a store from a legacy {vector_id: text} dict."""
+        store = cls(compression=compression, level=level)
+        ids = sorted(id_map)
+        store.append(ids, [id_map[vector_id] for vector_id in ids])
+        return store
+
+
+def load_chunk_store(base_path, compression=None, level=3):
+    """
+    Opens the chunk store of an index, migrating a legacy pickled id_map (.pkl) on first
+    load. The .pkl file is left in place so older versions can still read the index.
+    """
+    if ChunkStore.exists(base_path):
+        return ChunkStore.open(base_path)
+
+    pickle_path = os.path.splitext(base_path)[0] + ".pkl"
+    if not os.path.exists(pickle_path):
+        raise FileNotFoundError(f"No chunk store or id map found for {base_path}")
+    with open(pickle_path, "rb") as f:
+        id_map = pickle.load(f)
+    store = ChunkStore.from_id_map(id_map, compression=compression, level=level)
+    store.save(base_path)
+    print(f"Migrated {len(store)} chunks from {pickle_path} to a memory-mapped chunk store.")
+    return store
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Migrate pickled FAISS id maps to memory-mapped chunk stores.")
+    parser.add_argument("paths", nargs="+", help="Index files or directories containing *.index files")
+    parser.add_argument("--compression", choices=["zstd"], default=None)
+    parser.add_argument("--level", type=int, default=3)
+    args = parser.parse_args()
+
+    for path in args.paths:
+        index_paths = glob.glob(os.path.join(path, "*.index")) if os.path.isdir(path) else [path]
+        for index_path in index_paths:
+            if ChunkStore.exists(index_path):
+                print(f"{index_path}: already migrated")
+                continue
+            load_chunk_store(index_path, compression=args.compression, level=args.level)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,6 @@
 import os
+import copy
+import yaml
 
 # Base directory for the project
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -10,3 +12,22 @@ os.makedirs(CHARTS_DIR, exist_ok=True)
 # Any other configuration constants
 DATA_DIR = os.path.join(BASE_DIR, "data")
 PDF_DIR = os.path.join(BASE_DIR, "pdfs")
+
+# Backend configuration file (vector databases, embedding models, caches)
+CONFIG_PATH = os.path.join(BASE_DIR, "config.yaml")
+
+_config_cache = {"mtime": None, "config": None}
+
+
+def load_config():
+    """
+    Load the backend configuration from config.yaml.
+    The parsed file is cached and re-read only when its mtime changes, since
+    it is consulted on every request.
+    """
+    mtime = os.stat(CONFIG_PATH).st_mtime_ns
+    if _config_cache["mtime"] != mtime:
+        with open(CONFIG_PATH, "r") as f:
+            _config_cache["config"] = yaml.safe_load(f)
+        _config_cache["mtime"] = mtime
+    return copy.deepcopy(_config_cache["config"])
@@ -0,0 +1,184 @@
+import os
+import re
+import json
+import hashlib
+import threading
+import numpy as np
+from config import BASE_DIR, load_config
+
+DEFAULT_CACHE_DIR = os.path.join(BASE_DIR, "..", "embedding_cache")
+DEFAULT_MAX_ENTRIES = 200000
+DIGEST_SIZE = 32  # sha256
+
+
+def text_digest(text):
+    """Returns the sha256 digest of a chunk's UTF-8 text."""
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    """
+    Persistent content-addressed cache of chunk embeddings for one (provider, model).
+
+    Vectors are stored as float32 rows in a memory-mapped file next to a compact
+    key index holding the sha256 digest of each row's text. A last-access tick per
+    row drives LRU eviction once the cache reaches `max_entries`. The cache is safe
+    to share between threads; a directory should only be written by one process.
+
+    Files in `directory`:
+        vectors.f32  (max_entries, dimension) float32 rows
+        keys.bin     (max_entries, 32) sha256 digests
+        ticks.bin    (max_entries,) uint64 last-access ticks
+        meta.json    dimension, capacity, count and current tick
+    """
+
+    def __init__(self, directory, dimension, max_entries=DEFAULT_MAX_ENTRIES):
+        self.directory = directory
+        self.dimension = dimension
+        self.capacity = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+        meta_path = os.path.join(directory, "meta.json")
+        meta = {}
+        if os.path.exists(meta_path):
+            with open(meta_path, "r") as f:
+                meta = json.load(f)
+            if meta.get("dimension") != dimension or meta.get("capacity") != max_entries:
+                print(f"Embedding cache at {directory} has a different layout. Rebuilding it.")
+                meta = {}
+
+        mode = "r+" if meta else "w+"
+        self.count = meta.get("count", 0)
+        self.tick = meta.get("tick", 0)
+        self.vectors = np.memmap(os.path.join(directory, "vectors.f32"), dtype="float32", mode=mode, shape=(max_entries, dimension))
+        self.keys = np.memmap(os.path.join(directory, "keys.bin"), dtype="uint8", mode=mode, shape=(max_entries, DIGEST_SIZE))
+        self.ticks = np.memmap(os.path.join(directory, "ticks.bin"), dtype="uint64", mode=mode, shape=(max_entries,))
+        self.slots = {self.keys[i].tobytes(): i for i in range(self.count)}
+
+    def encode(self, texts, encode_fn):
+        """
+        Returns embeddings for `texts` in order, encoding only cache misses.
+
+        Args:
+            texts (list): Chunk texts to embed.
+            encode_fn (callable): Encodes a list of texts into an (n, dimension) array in one batch.
+        Returns:
+            np.ndarray: (len(texts), dimension) float32 embeddings.
+        """
+        digests = [text_digest(text) for text in texts]
+        embeddings = np.empty((len(texts), self.dimension), dtype="float32")
+
+        missing = {}  # digest -> positions in texts (dedupes identical chunks)
+        with self._lock:
+            self.tick += 1
+            hit_positions, hit_slots = [], []
+            for i, digest in enumerate(digests):
+                slot = self.slots.get(digest)
+                if slot is None:
+                    missing.setdefault(digest, []).append(i)
+                else:
+                    hit_positions.append(i)
+                    hit_slots.append(slot)
+            if hit_slots:
+                embeddings[hit_positions] = self.vectors[hit_slots]
+                self.ticks[hit_slots] = self.tick
+            self.hits += len(hit_positions)
+            self.misses += len(texts) - len(hit_positions)
+
+        if missing:
+            miss_digests = list(missing)
+            miss_texts = [texts[missing[digest][0]] for digest in miss_digests]
+            new_vectors = np.asarray(encode_fn(miss_texts), dtype="float32").reshape(len(miss_texts), -1)
+            for digest, vector in zip(miss_digests, new_vectors):
+                embeddings[missing[digest]] = vector
+            self.store(miss_digests, new_vectors)
+
+        return embeddings
+
+    def store(self, digests, vectors):
+        """Stores vectors under their text digests, evicting least recently used rows if full."""
+        with self._lock:
+            new = [(digest, vector) for digest, vector in zip(digests, vectors) if digest not in self.slots]
+            if not new:
+                return
+            new = new[-self.capacity:]
+            slots = self._allocate(len(new))
+            for slot, (digest, _) in zip(slots, new):
+                self.keys[slot] = np.frombuffer(digest, dtype="uint8")
+                self.slots[digest] = slot
+            self.vectors[slots] = np.stack([vector for _, vector in new])
+            self.ticks[slots] = self.tick
+            self.flush()
+
+    def _allocate(self, n):
+        """Returns `n` free row slots, evicting the least recently used rows. Caller holds the lock."""
+        used = self.count
+        free = min(n, self.capacity - used)
+        slots = list(range(used, used + free))
+        self.count += free
+
+        needed = n - free
+        if needed:
+            victims = np.argpartition(self.ticks[:used], needed - 1)[:needed]
+            for slot in victims:
+                del self.slots[self.keys[slot].tobytes()]
+            self.evictions += needed
+            slots.extend(int(slot) for slot in victims)
+        return slots
+
+    def flush(self):
+        """Flushes the memory-mapped files and writes the metadata file."""
+        self.vectors.flush()
+        self.keys.flush()
+        self.ticks.flush()
+        with open(os.path.join(self.directory, "meta.json"), "w") as f:
+            json.dump({"dimension": self.dimension, "capacity": self.capacity, "count": self.count, "tick": self.tick}, f)
+
+    def stats(self):
+        """Returns cache statistics including the hit rate since the process started."""
+        lookups = self.hits + self.misses
+        return {
+            "directory": self.directory,
+            "entries": self.count,
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_embedding_cache(provider, model_name, dimension):
+    """
+    Returns the shared embedding cache for a provider/model, or None when the
+    cache is disabled in config.yaml.
+    """
+    settings = load_config().get("embedding_cache", {})
+    if not settings.get("enabled", False):
+        return None
+
+    key = (provider, model_name)
+    with _caches_lock:
+        if key not in _caches:
+            root = settings.get("dir") or DEFAULT_CACHE_DIR
+            name = re.sub(r"[^A-Za-z0-9_.-]", "_", f"{provider}__{model_name}")
+            _caches[key] = EmbeddingCache(
+                os.path.join(root, name),
+                dimension,
+                max_entries=settings.get("max_entries", DEFAULT_MAX_ENTRIES),
+            )
+        return _caches[key]
+
+
+def embedding_cache_stats():
+    """Returns statistics for every embedding cache opened by this process."""
+    with _caches_lock:
+        return [cache.stats() for cache in _caches.values()]
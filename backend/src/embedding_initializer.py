@@ -1,68 +1,91 @@
-from sentence_transformers import SentenceTransformer
-import openai
+from onnx_backend import get_model_backend, load_sentence_transformer
 from embedding_config import get_embedding_config
-from transformers import AutoModel, AutoTokenizer
-import tensorflow_hub as hub
+from embedding_providers import HFMeanPoolEncoder, OpenAIBatchEncoder, TFHubEncoder, DEFAULT_BATCH_SIZE
+from word_vectors import WordVectorEncoder
+from config import load_config
 import gensim.downloader as api
 import os
 from dotenv import load_dotenv
 load_dotenv()
 
-def initialize_embedding_model(provider, model_name, api_key=None):
-    """Initializes the embedding model based on the provider and model name."""
+# Gensim downloader names for models listed under a different name in embedding_config
+GENSIM_MODEL_NAMES = {
+    "glove.6B.300d": "glove-wiki-gigaword-300",
+}
+
+def initialize_embedding_model(provider, model_name, api_key=None, device=None):
+    """
+    Initializes the embedding model based on the provider and model name.
+    Non-callable models expose `encode(texts, batch_size=None)` for batched encoding.
+    """
     config = get_embedding_config(provider, model_name)
     dimension = config["dimension"]
     print(f"Provider: {provider}, Model: {model_name}, Dimension: {dimension}")
 
+    settings = load_config().get("embedding_models", {})
+    batch_size = settings.get("batch_size", DEFAULT_BATCH_SIZE)
     is_callable = False  # Default to non-callable
 
     if provider == "sentence_transformers":
-        # Sentence Transformers
-        model = SentenceTransformer(model_name)
+        # Sentence Transformers (PyTorch, or ONNX Runtime when configured for this model)
+        model = load_sentence_transformer(model_name, device=device, backend=get_model_backend(model_name))
         is_callable = False
 
     elif provider == "openai":
-        api_key=os.getenv("OPENAI_API_KEY")
+        api_key = api_key or os.getenv("OPENAI_API_KEY")
         # OpenAI Embeddings
         if not api_key:
             raise ValueError("OpenAI API key is required for OpenAI models.")
-        openai_client = openai.OpenAI(api_key=api_key)
-        model = lambda text: openai_client.embeddings.create(input=text, model=model_name).data[0].embedding
-        is_callable = True
+        openai_settings = settings.get("openai", {})
+        model = OpenAIBatchEncoder(
+            model_name,
+            api_key=api_key,
+            dimension=dimension,
+            base_url=openai_settings.get("base_url") or os.getenv("OPENAI_BASE_URL"),
+            batch_size=openai_settings.get("batch_size", 2048),
+            max_tokens_per_request=openai_settings.get("max_tokens_per_request", 250000),
+            max_concurrency=openai_settings.get("max_concurrency", 4),
+        )
+        is_callable = False
 
     elif provider == "hugging_face":
         # Hugging Face Transformers
-        tokenizer = AutoTokenizer.from_pretrained(model_name)
-        hf_model = AutoModel.from_pretrained(model_name)
-        model = lambda text: hf_model(**tokenizer(text, return_tensors="pt"))[0].mean(dim=1).detach().numpy()
-        is_callable = True
+        model = HFMeanPoolEncoder(model_name, device=device, batch_size=batch_size)
+        is_callable = False
 
     elif provider == "google_use":
         # Google Universal Sentence Encoder
-        model = hub.load("https://tfhub.dev/google/universal-sentence-encoder/4")
-        is_callable = True
+        model = TFHubEncoder("https://tfhub.dev/google/universal-sentence-encoder/4", dimension=dimension, batch_size=batch_size)
+        is_callable = False
 
     elif provider == "elmo":
-        # ELMo model
-        model = hub.load("https://tfhub.dev/google/elmo/3")
-        is_callable = True
-
-    elif provider == "fasttext":
-        # FastText model with Gensim
-        model = api.load(model_name)
-        is_callable = True
+        # ELMo model (mean-pooled "default" output of the TF1 hub signature)
+        model = TFHubEncoder(
+            "https://tfhub.dev/google/elmo/3",
+            dimension=dimension,
+            batch_size=batch_size,
+            signature="default",
+            output_key="default",
+        )
+        is_callable = False
 
-    elif provider == "glove":
-        # GloVe model with Gensim
-        model = api.load(model_name)
-        is_callable = True
+    elif provider in ["fasttext", "glove"]:
+        # FastText / GloVe word vectors with Gensim, pooled into chunk embeddings
+        word_settings = settings.get("word_vectors", {})
+        keyed_vectors = api.load(GENSIM_MODEL_NAMES.get(model_name, model_name))
+        model = WordVectorEncoder(
+            keyed_vectors,
+            pooling=word_settings.get("pooling", "mean"),
+            lowercase=provider == "glove",  # GloVe vocabularies are lowercase, fastText is cased
+            subword_fallback=provider == "fasttext",
+            batch_size=word_settings.get("batch_size", 256),
+        )
+        is_callable = False
     
     elif provider in ["bert", "albert", "xlnet", "gpt2", "t5"]:
         # Hugging Face BERT, ALBERT, XLNet, GPT-2, T5 models
-        tokenizer = AutoTokenizer.from_pretrained(model_name)
-        hf_model = AutoModel.from_pretrained(model_name)
-        model = lambda text: hf_model(**tokenizer(text, return_tensors="pt"))[0].mean(dim=1).detach().numpy()
-        is_callable = True
+        model = HFMeanPoolEncoder(model_name, device=device, batch_size=batch_size)
+        is_callable = False
 
     else:
         raise ValueError(f"Unsupported provider: {provider}")
@@ -0,0 +1,113 @@
+import os
+import time
+import multiprocessing
+import numpy as np
+from config import load_config
+from embedding_providers import encode_texts
+
+DEFAULT_SHARD_SIZE = 256
+
+# Per-process state of a pool worker
+_worker_model = None
+
+
+def _init_worker(provider, model_name, api_key, threads):
+    """Loads one model copy in a pool worker and pins it to its thread budget."""
+    global _worker_model
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    try:
+        import torch
+        torch.set_num_threads(threads)
+        torch.set_num_interop_threads(1)
+    except (ImportError, RuntimeError):
+        pass
+
+    from embedding_initializer import initialize_embedding_model
+    model, _, is_callable = initialize_embedding_model(provider, model_name, api_key, device="cpu")
+    _worker_model = (model, is_callable)
+
+
+def _encode_shard(shard):
+    """Encodes one shard of texts in a pool worker. Returns (embeddings, seconds)."""
+    model, is_callable = _worker_model
+    start = time.perf_counter()
+    embeddings = encode_texts(model, is_callable, shard)
+    return embeddings, time.perf_counter() - start
+
+
+class EmbeddingPool:
+    """
+    Pool of worker processes that each hold one copy of an embedding model.
+
+    Texts are split into shards that are encoded across the workers and returned in
+    input order. Each worker is limited to `threads_per_worker` intra-op threads, so
+    `workers * threads_per_worker` should roughly match the available cores.
+    """
+
+    def __init__(self, provider, model_name, workers, threads_per_worker=1, api_key=None, shard_size=DEFAULT_SHARD_SIZE):
+        self.workers = workers
+        self.threads_per_worker = threads_per_worker
+        self.shard_size = shard_size
+        self.chunks = 0
+        self.wall_seconds = 0.0
+        self.worker_seconds = 0.0
+        # spawn gives every worker a clean interpreter instead of a forked copy of the parent's thread pools
+        context = multiprocessing.get_context("spawn")
+        print(f"Starting embedding pool: {workers} workers x {threads_per_worker} threads")
+        self._pool = context.Pool(
+            processes=workers,
+            initializer=_init_worker,
+            initargs=(provider, model_name, api_key, threads_per_worker),
+        )
+
+    def iter_encode(self, texts):
+        """Yields (start, embeddings) for consecutive shards of `texts`, in order, as they finish."""
+        shards = [texts[i:i + self.shard_size] for i in range(0, len(texts), self.shard_size)]
+        start_time = time.perf_counter()
+        start = 0
+        for embeddings, seconds in self._pool.imap(_encode_shard, shards):
+            self.worker_seconds += seconds
+            self.chunks += len(embeddings)
+            yield start, embeddings
+            start += len(embeddings)
+        self.wall_seconds += time.perf_counter() - start_time
+
+    def encode(self, texts):
+        """Encodes texts across the pool and returns a (len(texts), dimension) float32 array."""
+        parts = [embeddings for _, embeddings in self.iter_encode(texts)]
+        if not parts:
+            return np.zeros((0, 0), dtype="float32")
+        return np.vstack(parts)
+
+    def report(self):
+        """Returns a throughput report for the texts encoded so far."""
+        return {
+            "workers": self.workers,
+            "threads_per_worker": self.threads_per_worker,
+            "chunks": self.chunks,
+            "seconds": self.wall_seconds,
+            "chunks_per_second": self.chunks / self.wall_seconds if self.wall_seconds else 0.0,
+            "worker_utilization": self.worker_seconds / (self.wall_seconds * self.workers) if self.wall_seconds else 0.0,
+        }
+
+    def close(self):
+        self._pool.close()
+        self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self._pool.terminate()
+        self.close()
+
+
+def get_pool_settings(workers=None, threads_per_worker=None):
+    """Resolves worker counts from explicit arguments, falling back to config.yaml."""
+    settings = load_config().get("embedding_pool", {})
+    workers = workers if workers is not None else settings.get("workers", 0)
+    threads_per_worker = threads_per_worker or settings.get("threads_per_worker", 1)
+    return workers, threads_per_worker, settings.get("shard_size", DEFAULT_SHARD_SIZE)
@@ -0,0 +1,218 @@
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_BATCH_SIZE = 32
+
+
+def encode_texts(model, iscallable, texts, batch_size=None):
+    """
+    Encodes a list of texts with a model returned by `initialize_embedding_model`.
+    Returns a (len(texts), dimension) float32 array.
+    """
+    if iscallable:
+        # If the model is only callable one text at a time
+        embeddings = [model(text) for text in texts]
+    else:
+        # If the model uses a batched encoder method (SentenceTransformers, OpenAI, Hugging Face)
+        embeddings = model.encode(texts, batch_size=batch_size) if batch_size else model.encode(texts)
+
+    # Ensure embeddings are in the correct numpy format
+    return np.array(embeddings, dtype='float32')
+
+
+def iter_batches(items, batch_size):
+    """Yields consecutive slices of `items` with at most `batch_size` elements."""
+    for start in range(0, len(items), batch_size):
+        yield items[start:start + batch_size]
+
+
+class HFMeanPoolEncoder:
+    """
+    Batched sentence embeddings from a Hugging Face transformer using masked mean pooling.
+
+    Texts are sorted by length before batching so each padded batch holds similarly
+    sized inputs, and padding positions are excluded from the mean via the attention
+    mask. Results are returned in the original order.
+    """
+
+    def __init__(self, model_name, device=None, batch_size=DEFAULT_BATCH_SIZE, max_length=512):
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+
+        self.torch = torch
+        self.device = device or "cpu"
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        if self.tokenizer.pad_token is None:
+            # GPT-2 style tokenizers ship without a padding token
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+
+        model = AutoModel.from_pretrained(model_name)
+        if getattr(model.config, "is_encoder_decoder", False):
+            # Encoder-decoder models (T5) are pooled over their encoder states
+            model = model.get_encoder()
+        self.model = model.to(self.device).eval()
+        self.dimension = model.config.hidden_size
+
+    def encode(self, texts, batch_size=None):
+        """
+        Encodes a list of texts into a (len(texts), hidden_size) float32 array.
+        """
+        if isinstance(texts, str):
+            texts = [texts]
+        if not texts:
+            return np.zeros((0, self.dimension), dtype="float32")
+        batch_size = batch_size or self.batch_size
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        embeddings = [None] * len(texts)
+
+        with self.torch.no_grad():
+            for batch in iter_batches(order, batch_size):
+                inputs = self.tokenizer(
+                    [texts[i] for i in batch],
+                    padding=True,
+                    truncation=True,
+                    max_length=self.max_length,
+                    return_tensors="pt",
+                ).to(self.device)
+                hidden = self.model(**inputs)[0]
+                mask = inputs["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+                pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+                for i, vector in zip(batch, pooled.cpu().numpy()):
+                    embeddings[i] = vector
+
+        return np.array(embeddings, dtype="float32").reshape(len(texts), -1)
+
+    def __call__(self, text):
+        return self.encode([text])[0]
+
+    def memory_bytes(self):
+        return sum(p.numel() * p.element_size() for p in self.model.parameters())
+
+
+class OpenAIBatchEncoder:
+    """
+    Batched OpenAI embeddings.
+
+    Inputs are packed into multi-input requests of at most `batch_size` inputs and
+    `max_tokens_per_request` tokens, and up to `max_concurrency` requests run at once.
+    `base_url` points the client at any OpenAI-compatible endpoint, such as a local
+    stand-in server when running offline.
+    """
+
+    def __init__(
+        self,
+        model_name,
+        api_key,
+        dimension=None,
+        base_url=None,
+        batch_size=2048,
+        max_tokens_per_request=250000,
+        max_concurrency=4,
+        client=None,
+    ):
+        import openai
+
+        self.model_name = model_name
+        self.dimension = dimension
+        self.batch_size = batch_size
+        self.max_tokens_per_request = max_tokens_per_request
+        self.max_concurrency = max_concurrency
+        self.client = client or openai.OpenAI(api_key=api_key, base_url=base_url)
+        self._tokenizer = None
+        try:
+            import tiktoken
+            self._tokenizer = tiktoken.encoding_for_model(model_name)
+        except Exception:
+            pass
+
+    def count_tokens(self, text):
+        """Returns the token count of a text, estimated at 4 characters per token without tiktoken."""
+        if self._tokenizer is not None:
+            return len(self._tokenizer.encode(text, disallowed_special=()))
+        return len(text) // 4 + 1
+
+    def plan_requests(self, texts, batch_size=None):
+        """
+        Splits texts into requests respecting the input count and token limits.
+        Returns a list of (start, end) ranges into `texts`.
+        """
+        batch_size = batch_size or self.batch_size
+        requests, start, tokens = [], 0, 0
+        for i, text in enumerate(texts):
+            text_tokens = self.count_tokens(text)
+            if i > start and (i - start >= batch_size or tokens + text_tokens > self.max_tokens_per_request):
+                requests.append((start, i))
+                start, tokens = i, 0
+            tokens += text_tokens
+        if start < len(texts):
+            requests.append((start, len(texts)))
+        return requests
+
+    def _embed_request(self, texts):
+        response = self.client.embeddings.create(input=texts, model=self.model_name)
+        data = sorted(response.data, key=lambda item: item.index)
+        return [item.embedding for item in data]
+
+    def encode(self, texts, batch_size=None):
+        """
+        Encodes a list of texts into a (len(texts), dimension) float32 array.
+        """
+        if isinstance(texts, str):
+            texts = [texts]
+        if not texts:
+            return np.zeros((0, self.dimension or 0), dtype="float32")
+        # The API rejects empty strings, so they are sent as a single space
+        texts = [text if text else " " for text in texts]
+        ranges = self.plan_requests(texts, batch_size)
+
+        if len(ranges) == 1:
+            results = [self._embed_request(texts)]
+        else:
+            with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+                results = list(executor.map(lambda r: self._embed_request(texts[r[0]:r[1]]), ranges))
+
+        embeddings = [vector for result in results for vector in result]
+        return np.array(embeddings, dtype="float32").reshape(len(texts), -1)
+
+    def __call__(self, text):
+        return self.encode([text])[0]
+
+
+class TFHubEncoder:
+    """
+    Batched embeddings from a TensorFlow Hub text model (Universal Sentence Encoder, ELMo).
+    """
+
+    def __init__(self, url, dimension=None, batch_size=DEFAULT_BATCH_SIZE, signature=None, output_key=None):
+        import tensorflow_hub as hub
+
+        module = hub.load(url)
+        self.dimension = dimension
+        self.batch_size = batch_size
+        self.output_key = output_key
+        self.model = module.signatures[signature] if signature else module
+        self._module = module
+
+    def encode(self, texts, batch_size=None):
+        """
+        Encodes a list of texts into a (len(texts), dimension) float32 array.
+        """
+        import tensorflow as tf
+
+        if isinstance(texts, str):
+            texts = [texts]
+        batch_size = batch_size or self.batch_size
+        embeddings = []
+        for batch in iter_batches(texts, batch_size):
+            output = self.model(tf.constant(batch))
+            if self.output_key:
+                output = output[self.output_key]
+            embeddings.append(np.asarray(output, dtype="float32"))
+        if not embeddings:
+            return np.zeros((0, self.dimension or 0), dtype="float32")
+        return np.vstack(embeddings)
+
+    def __call__(self, text):
+        return self.encode([text])[0]
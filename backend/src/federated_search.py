@@ -0,0 +1,141 @@
+import os
+import glob
+import heapq
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import numpy as np
+from config import load_config
+from index_cache import file_signature
+from adapters.faiss_adapter import meta_path_for
+
+DEFAULT_MAX_WORKERS = 8
+
+# meta path -> (signature, summary); summaries are tiny, so they are never evicted
+_summaries = {}
+_summaries_lock = threading.Lock()
+
+
+def list_indexes(directory):
+    """Returns every FAISS index file in `directory`, skipping the chunk store and meta files."""
+    return sorted(path for path in glob.glob(os.path.join(directory, "*.index")) if os.path.isfile(path))
+
+
+def load_summary(db_path):
+    """
+    Returns (dimension, centroid, radius) from an index's .meta.json, or None when the
+    index was saved before summaries were recorded. Parsed summaries are kept in memory
+    until the meta file changes.
+    """
+    meta_path = meta_path_for(db_path)
+    signature = file_signature([meta_path])
+    with _summaries_lock:
+        cached = _summaries.get(meta_path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+    summary = None
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta.get("summary"):
+            centroid = np.asarray(meta["summary"]["centroid"], dtype='float32')
+            summary = (meta.get("dimension", len(centroid)), centroid, float(meta["summary"]["radius"]))
+
+    with _summaries_lock:
+        _summaries[meta_path] = (signature, summary)
+    return summary
+
+
+def distance_lower_bound(query_embedding, summary):
+    """
+    Smallest squared L2 distance any vector of a summarized index can have to the query:
+    every vector lies within `radius` of the centroid, so ||q - v|| >= ||q - c|| - radius.
+    """
+    _, centroid, radius = summary
+    gap = float(np.linalg.norm(query_embedding - centroid)) - radius
+    return max(gap, 0.0) ** 2
+
+
+def federated_search(query_embedding, db_paths, load_db, top_k=5, search_params=None,
+                     max_workers=DEFAULT_MAX_WORKERS, prune=True, filters=None):
+    """
+    Searches many FAISS indexes concurrently and merges their results into one top-k.
+
+    Indexes are visited in order of their distance lower bound. Whenever a worker is
+    free the next index is searched, unless the top-k is already full and the index's
+    lower bound is worse than the current k-th result, in which case it (and every
+    index after it) cannot contribute and is skipped. Indexes without a summary are
+    always searched.
+
+    Args:
+        query_embedding (np.ndarray): Query vector.
+        db_paths (list): Index files to search.
+        load_db (callable): Returns a FAISSVectorDB with the index at the given path loaded.
+        top_k (int): Number of merged results to return.
+        search_params (dict, optional): ANN query-time parameters passed to every index.
+        max_workers (int): Indexes searched concurrently.
+        prune (bool): Skip indexes that cannot improve the top-k.
+        filters (dict, optional): Metadata filter expression applied in every index.
+    Returns:
+        list: Up to top_k {"id", "text", "score", "source"} dicts, closest first.
+    """
+    query_embedding = np.asarray(query_embedding, dtype='float32').reshape(-1)
+    candidates = []
+    for path in db_paths:
+        summary = load_summary(path)
+        if summary is not None and summary[0] != len(query_embedding):
+            print(f"Skipping {path}: dimension {summary[0]} does not match the query ({len(query_embedding)})")
+            continue
+        bound = distance_lower_bound(query_embedding, summary) if summary is not None else 0.0
+        candidates.append((bound, path))
+    candidates.sort()
+
+    def search_one(path):
+        db = load_db(path)
+        return path, db.search_batch(query_embedding[None, :], top_k, search_params=search_params, filters=filters)[0]
+
+    # Max-heap on score (negated) holding the best top_k results seen so far
+    heap = []
+    sequence = 0
+    searched = failed = 0
+    remaining = iter(candidates)
+    exhausted = False
+    workers = max(1, min(max_workers, len(candidates)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        while True:
+            while not exhausted and len(pending) < workers:
+                bound, path = next(remaining, (None, None))
+                if path is None or (prune and len(heap) == top_k and bound > -heap[0][0]):
+                    exhausted = True
+                    break
+                pending.add(executor.submit(search_one, path))
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    path, results = future.result()
+                except Exception as e:
+                    failed += 1
+                    print(f"Federated search failed for an index: {e}")
+                    continue
+                searched += 1
+                for result in results:
+                    item = (-result["score"], sequence, {**result, "source": path})
+                    sequence += 1
+                    if len(heap) < top_k:
+                        heapq.heappush(heap, item)
+                    elif item[0] > heap[0][0]:
+                        heapq.heapreplace(heap, item)
+
+    print(f"Federated search: searched {searched} of {len(db_paths)} indexes "
+          f"({len(candidates) - searched - failed} pruned, {failed} failed)")
+    return [item for _, _, item in sorted(heap, key=lambda entry: (-entry[0], entry[1]))]
+
+
+def get_federated_settings():
+    """Returns (max_workers, prune) from config.yaml."""
+    settings = load_config()["vector_databases"].get("faiss", {})
+    return settings.get("federated_workers", DEFAULT_MAX_WORKERS), settings.get("federated_prune", True)
@@ -0,0 +1,154 @@
+import os
+import threading
+from collections import OrderedDict
+from config import load_config
+
+DEFAULT_INDEX_CACHE_MB = 2048
+
+
+def file_signature(paths):
+    """
+    Returns a signature of the given files used to detect changes on disk.
+    Missing files are recorded as None so their appearance also invalidates the entry.
+    """
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            signature.append((path, None, 0))
+    return tuple(signature)
+
+
+class IndexResidencyManager:
+    """
+    Keeps recently used vector indexes resident in memory keyed by their db_path.
+
+    Entries are validated against the mtime and size of their files on every lookup,
+    so an index re-written by ingestion is reloaded automatically. When the resident
+    indexes exceed the byte budget the least recently used ones are evicted.
+    Cached objects are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, max_bytes=None):
+        """
+        Args:
+            max_bytes (int, optional): Memory budget for resident indexes. None disables eviction.
+        """
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (signature, value, nbytes)
+        self._load_locks = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.evictions = 0
+
+    def get(self, key, paths, loader):
+        """
+        Returns the resident value for `key`, loading it with `loader()` when it is
+        missing or when any of `paths` changed on disk.
+
+        Args:
+            key: Cache key (usually the db_path plus any load options).
+            paths (list): Files backing the entry; their size is used as the memory estimate.
+            loader (callable): Loads and returns the value from disk.
+        """
+        signature = file_signature(paths)
+        with self._lock:
+            value = self._lookup(key, signature)
+            if value is not None:
+                return value
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        with load_lock:
+            with self._lock:
+                value = self._lookup(key, signature)
+                if value is not None:
+                    return value
+
+            signature = file_signature(paths)
+            value = loader()
+            # Files rewritten while loading may have been read half-old, half-new; hand the
+            # value to this caller but leave it uncached so the next lookup reloads it.
+            if file_signature(paths) != signature:
+                with self._lock:
+                    self.misses += 1
+                    self._entries.pop(key, None)
+                    self._load_locks.pop(key, None)
+                return value
+            nbytes = sum(size for _, _, size in signature)
+
+            with self._lock:
+                if key in self._entries:
+                    self.reloads += 1
+                self.misses += 1
+                self._entries[key] = (signature, value, nbytes)
+                self._entries.move_to_end(key)
+                self._load_locks.pop(key, None)
+                self._evict(keep=key)
+            return value
+
+    def _lookup(self, key, signature):
+        """Returns a fresh cached value and marks it as most recently used. Caller holds the lock."""
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != signature:
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def _evict(self, keep=None):
+        """Evicts least recently used indexes until the budget is met. Caller holds the lock."""
+        if self.max_bytes is None:
+            return
+        for key in list(self._entries):
+            if self.memory_bytes() <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            self._entries.pop(key)
+            self.evictions += 1
+            print(f"Evicted index from residency cache: {key}")
+
+    def memory_bytes(self):
+        """Returns the estimated memory held by resident indexes."""
+        return sum(entry[2] for entry in self._entries.values())
+
+    def invalidate(self, key=None):
+        """Drops one resident entry, or all of them when no key is given."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        """Returns residency statistics for monitoring endpoints."""
+        with self._lock:
+            return {
+                "indexes": [str(key) for key in self._entries],
+                "memory_bytes": self.memory_bytes(),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "reloads": self.reloads,
+                "evictions": self.evictions,
+            }
+
+
+_index_cache = None
+_index_cache_lock = threading.Lock()
+
+
+def get_index_cache():
+    """Returns the process-wide index residency manager, sized from config.yaml on first use."""
+    global _index_cache
+    if _index_cache is None:
+        with _index_cache_lock:
+            if _index_cache is None:
+                faiss_config = load_config()["vector_databases"].get("faiss", {})
+                max_mb = faiss_config.get("index_cache_mb", DEFAULT_INDEX_CACHE_MB)
+                _index_cache = IndexResidencyManager(max_bytes=int(max_mb * 1024 * 1024) if max_mb else None)
+    return _index_cache
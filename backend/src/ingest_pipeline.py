@@ -0,0 +1,245 @@
+import time
+import queue
+import threading
+from config import load_config
+from chunk_metadata import chunk_metadata
+from pdf_extractor import iter_pdf_pages, PageChunker, extract_tables, process_figure_with_clip
+
+DEFAULT_QUEUE_SIZE = 8
+DEFAULT_BATCH_SIZE = 256
+POLL_SECONDS = 0.1
+
+# Marks the end of a stage's output
+_DONE = object()
+
+
+class _Aborted(Exception):
+    """Raised inside a stage when another stage failed."""
+
+
+class StageStats:
+    """Items processed by a pipeline stage and the time it spent working (not waiting)."""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.busy_seconds = 0.0
+
+    def report(self):
+        return {
+            "items": self.items,
+            "busy_seconds": self.busy_seconds,
+            "items_per_second": self.items / self.busy_seconds if self.busy_seconds else 0.0,
+        }
+
+
+class IngestPipeline:
+    """
+    Streams a PDF into a vector database through extract, chunk, embed and insert stages.
+
+    The stages run concurrently and are connected by queues of at most `queue_size`
+    items, so extracting page N+1 overlaps embedding page N and only a few pages and
+    batches are in flight at any time, whatever the document length. Text chunks are
+    embedded and inserted in batches of `batch_size`. Extraction, chunking and
+    embedding run in worker threads; inserts run on the calling thread, since the
+    database clients are not shared across threads.
+    """
+
+    def __init__(self, db, doc_id, queue_size=DEFAULT_QUEUE_SIZE, batch_size=DEFAULT_BATCH_SIZE, encode_fn=None,
+                 max_length=512):
+        """
+        Args:
+            db (VectorDB): Database the chunks are added to.
+            doc_id (str): Document the chunks belong to.
+            queue_size (int): Items buffered between two stages.
+            batch_size (int): Text chunks embedded and inserted together.
+            encode_fn (callable, optional): Batch encoder to use instead of the in-process model.
+            max_length (int): Maximum chunk length in characters.
+        """
+        self.db = db
+        self.doc_id = doc_id
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.encode_fn = encode_fn
+        self.max_length = max_length
+        self.stages = {name: StageStats(name) for name in ("extract", "chunk", "embed", "insert")}
+        self._abort = threading.Event()
+        self._errors = []
+
+    def _put(self, q, item):
+        while not self._abort.is_set():
+            try:
+                q.put(item, timeout=POLL_SECONDS)
+                return
+            except queue.Full:
+                continue
+        raise _Aborted()
+
+    def _get(self, q):
+        while not self._abort.is_set():
+            try:
+                return q.get(timeout=POLL_SECONDS)
+            except queue.Empty:
+                continue
+        raise _Aborted()
+
+    def _run_stage(self, stage, output):
+        """Runs a stage in a worker thread, forwarding its end (or failure) downstream."""
+        try:
+            stage()
+            self._put(output, _DONE)
+        except _Aborted:
+            pass
+        except Exception as e:
+            self._errors.append(e)
+            self._abort.set()
+
+    def _extract(self, pdf_path, pages):
+        """Produces ("page", number, text, figures) items, then ("table", rows, page numbers)."""
+        stats = self.stages["extract"]
+        started = time.perf_counter()
+        for number, text, figures in iter_pdf_pages(pdf_path):
+            stats.busy_seconds += time.perf_counter() - started
+            stats.items += 1
+            self._put(pages, ("page", number, text, figures))
+            started = time.perf_counter()
+        # Camelot and pdfplumber parse the whole document in one call
+        tables, table_pages = extract_tables(pdf_path, with_pages=True)
+        stats.busy_seconds += time.perf_counter() - started
+        if tables:
+            self._put(pages, ("table", tables, table_pages))
+
+    def _chunk(self, pages, chunks):
+        """Turns pages into ("text", chunk, metadata) and ("figure", bytes, metadata) items."""
+        stats = self.stages["chunk"]
+        chunker = PageChunker(self.max_length)
+        while True:
+            item = self._get(pages)
+            if item is _DONE:
+                break
+            started = time.perf_counter()
+            if item[0] == "page":
+                _, number, text, figures = item
+                emitted = chunker.add_page(number, text)
+                others = [("figure", figure, chunk_metadata(self.doc_id, number, "figure")) for figure in figures]
+            else:
+                _, tables, table_pages = item
+                emitted = chunker.finish()  # Tables come after the last page
+                others = [("text", row, chunk_metadata(self.doc_id, page, "table")) for row, page in zip(tables, table_pages)]
+            stats.busy_seconds += time.perf_counter() - started
+            for chunk, (page, start, end) in emitted:
+                stats.items += 1
+                self._put(chunks, ("text", chunk, chunk_metadata(self.doc_id, page, "text", start, end)))
+            for other in others:
+                stats.items += 1
+                self._put(chunks, other)
+        started = time.perf_counter()
+        emitted = chunker.finish()
+        stats.busy_seconds += time.perf_counter() - started
+        for chunk, (page, start, end) in emitted:
+            stats.items += 1
+            self._put(chunks, ("text", chunk, chunk_metadata(self.doc_id, page, "text", start, end)))
+
+    def _embed(self, chunks, batches):
+        """
+        Embeds text chunks in batches of `batch_size` and figures with CLIP. Produces
+        ("text", texts, embeddings, metadata) and ("figure", caption, clip embedding, metadata).
+        """
+        stats = self.stages["embed"]
+        texts, metadata = [], []
+        figure_index = 0
+
+        def flush():
+            started = time.perf_counter()
+            embeddings = self.db._generate_chunk_embeddings(texts, encode_fn=self.encode_fn)
+            stats.busy_seconds += time.perf_counter() - started
+            stats.items += len(texts)
+            self._put(batches, ("text", list(texts), embeddings, list(metadata)))
+            texts.clear()
+            metadata.clear()
+
+        while True:
+            item = self._get(chunks)
+            if item is _DONE:
+                break
+            kind, content, entry = item
+            if kind == "figure":
+                started = time.perf_counter()
+                caption, clip_embedding = process_figure_with_clip(content, figure_index)
+                stats.busy_seconds += time.perf_counter() - started
+                figure_index += 1
+                if clip_embedding is not None:
+                    stats.items += 1
+                    self._put(batches, ("figure", caption, clip_embedding, entry))
+                    continue
+                content = caption  # Figures CLIP could not process are added as their caption only
+            texts.append(content)
+            metadata.append(entry)
+            if len(texts) >= self.batch_size:
+                flush()
+        if texts:
+            flush()
+
+    def run(self, pdf_path):
+        """
+        Ingests a PDF. Returns a report with the chunk count, total throughput and
+        per-stage items, busy seconds and items per busy second.
+        """
+        pages = queue.Queue(maxsize=self.queue_size)
+        chunks = queue.Queue(maxsize=self.queue_size * self.batch_size)
+        batches = queue.Queue(maxsize=self.queue_size)
+        threads = [
+            threading.Thread(target=self._run_stage, args=(lambda: self._extract(pdf_path, pages), pages), daemon=True),
+            threading.Thread(target=self._run_stage, args=(lambda: self._chunk(pages, chunks), chunks), daemon=True),
+            threading.Thread(target=self._run_stage, args=(lambda: self._embed(chunks, batches), batches), daemon=True),
+        ]
+        start_time = time.perf_counter()
+        for thread in threads:
+            thread.start()
+
+        stats = self.stages["insert"]
+        start_id = 0
+        try:
+            while True:
+                item = self._get(batches)
+                if item is _DONE:
+                    break
+                started = time.perf_counter()
+                if item[0] == "text":
+                    _, texts, embeddings, metadata = item
+                    self.db.add_embeddings(texts, embeddings=embeddings, start_id=start_id, doc_id=self.doc_id,
+                                           metadata=metadata)
+                    inserted = len(texts)
+                else:
+                    _, caption, clip_embedding, entry = item
+                    # Inserts the caption and its CLIP vectors, which share the caption's metadata
+                    self.db.add_embeddings([caption], clip_embeddings=clip_embedding, start_id=start_id,
+                                           doc_id=self.doc_id, metadata=[entry])
+                    inserted = 1 + len(clip_embedding)
+                stats.busy_seconds += time.perf_counter() - started
+                stats.items += inserted
+                start_id += inserted
+        except _Aborted:
+            pass
+        except Exception as e:
+            self._errors.append(e)
+            self._abort.set()
+        finally:
+            for thread in threads:
+                thread.join()
+        if self._errors:
+            raise self._errors[0]
+
+        elapsed = time.perf_counter() - start_time
+        inserted = stats.items
+        return {
+            "chunks": inserted,
+            "seconds": elapsed,
+            "chunks_per_second": inserted / elapsed if elapsed else 0.0,
+            "stages": {name: stage.report() for name, stage in self.stages.items()},
+        }
+
+
+def get_pipeline_settings():
+    """Returns the `ingest_pipeline` section of config.yaml."""
+    return load_config().get("ingest_pipeline", {})
@@ -1,14 +1,55 @@
+import time
+import json
 import argparse
-from VectorDB import VectorDB
+from VectorDB import VectorDB, initialize_vector_db
 from add_to_vector_db import add_pdf_to_vector_db
+from adapters import FAISSVectorDB
+from federated_search import federated_search, list_indexes, get_federated_settings
+from reranker import rerank_candidates, rerank_results
+from mmr import resolve_mmr
+from answer_cache import get_answer_cache, invalidate_answer_cache
+from config import load_config
 from llm_response.llm_utils import generate_response
 from llm_response.chart_parser import parse_response_and_generate_chart
 from llm_response.prompt import Prompt
 
-def query_vector_db(db_path, db_type,db_config, query, top_k=5, model="openai", provider='', embedding_provider='', embedding_model='', use_gpu=False):
+DEFAULT_SUMMARY_WINDOW_CHARS = 12000
+
+def search_vector_db_batch(db_path, db_type, db_config, queries, top_k=5, embedding_provider='', embedding_model='', use_gpu=False, search_params=None, filters=None):
+    """
+    Retrieves the closest chunks for many queries at once, without calling an LLM.
+    Returns one list per query of {"id", "text", "score"} dicts.
+    `filters` is a metadata filter expression applied to every query.
+    """
+    vector_db = VectorDB(
+        db_path=db_path,
+        db_type=db_type,
+        provider=embedding_provider,
+        model_name=embedding_model,
+        use_gpu=use_gpu,
+        index_name=db_path,
+        db_config=db_config
+    )
+    if hasattr(vector_db.db, "load_index"):
+        vector_db.load_index(db_path)
+
+    print(f"Batch search with {len(queries)} queries")
+    return vector_db.search_batch(queries, top_k=top_k, search_params=search_params, filters=filters)
+
+def query_vector_db(db_path, db_type,db_config, query, top_k=5, model="openai", provider='', embedding_provider='', embedding_model='', use_gpu=False, search_params=None, search_mode="dense", rerank=None, mmr_lambda=None, mmr_candidates=None, filters=None, use_answer_cache=None):
     """
     Performs a query on the vector database and generates a response using the specified LLM.
+    `search_params` sets ANN query-time parameters such as nprobe and efSearch.
+    `search_mode="hybrid"` fuses dense and BM25 keyword retrieval (FAISS).
+    `rerank` reorders retrieved candidates with a cross-encoder (None follows config.yaml).
+    `mmr_lambda` selects diverse chunks out of `mmr_candidates` dense matches with
+    maximal marginal relevance (None for both follows config.yaml).
+    `filters` restricts retrieval to chunks matching a metadata filter expression,
+    e.g. {"chunk_type": "table", "page": {"gte": 3, "lte": 10}}.
+    `use_answer_cache=True` opts in to the cached answer of a semantically equivalent
+    earlier query (None follows answer_cache.enabled in config.yaml, off by default).
     """
+    started = time.perf_counter()
     print(db_type)
     # Initialize the vector database
     vector_db = VectorDB(
@@ -21,28 +62,59 @@ def query_vector_db(db_path, db_type,db_config, query, top_k=5, model="openai",
         db_config=db_config
     )
 
+    # Answer from the cache before loading the index when an equivalent query was seen
+    cache, query_embedding, signature = None, None, None
+    if use_answer_cache is not False and query != "*":
+        query_embedding = vector_db._generate_query_embedding(query)
+        options = {
+            "db_type": db_type, "embedding_provider": embedding_provider, "embedding_model": embedding_model,
+            "top_k": top_k, "search_params": search_params, "search_mode": search_mode, "rerank": rerank,
+            "mmr_lambda": mmr_lambda, "mmr_candidates": mmr_candidates, "filters": filters,
+        }
+        cache = get_answer_cache(db_path, model, provider, len(query_embedding), options, enabled=use_answer_cache)
+        if cache is not None:
+            response, signature = cache.lookup(query_embedding)
+            if response is not None:
+                print(f"Answer cache hit for: '{query}'")
+                return response
+
     # Load the database index if supported
     if hasattr(vector_db.db, "load_index"):
         vector_db.load_index(db_path)
 
     print(f"Querying the vector database with: '{query}'")
     if query == "*":
-        # Retrieve all documents
-        results = vector_db.get_all()
-        print('Result shape', results)
-        # # Clean results for summarization
-        if isinstance(results[0], tuple) and len(results[0]) == 2:
-            # Remove scores if necessary
-            clean_results = [text for text, score in results]
-        else:
-            clean_results = [text for text in results]
-        accumulate_resuls = ''.join(clean_results)
-        return accumulate_resuls
+        # Summarize the whole store window by window instead of building it into one prompt
+        return summarize_chunks(vector_db.iter_chunks(), model, provider)
 
     # Perform the search using VectorDB
-    results = vector_db.search(query, top_k=top_k)
+    candidates = rerank_candidates(top_k, rerank)
+    mmr_lambda, mmr_candidates = resolve_mmr(mmr_lambda, mmr_candidates)
+    if mmr_lambda is not None:
+        if search_mode != "dense":
+            raise ValueError("MMR diversification applies to dense search only.")
+        # Diversified first, so the reranker orders a pool without near-duplicates
+        results = vector_db.search_mmr(query, top_k=candidates, candidates=max(mmr_candidates, candidates),
+                                       lambda_mult=mmr_lambda, search_params=search_params, filters=filters,
+                                       query_embedding=query_embedding)
+    else:
+        results = vector_db.search(query, top_k=candidates, search_params=search_params, mode=search_mode,
+                                   filters=filters, query_embedding=query_embedding)
+    if candidates > top_k:
+        results = rerank_results(query, results, top_k, started=started, use_gpu=use_gpu)
     print(f"Raw search results: {results}")
 
+    response = answer_from_results(query, results, model, provider)
+    if cache is not None:
+        cache.store(query, query_embedding, response, signature)
+    return response
+
+
+def answer_from_results(query, results, model, provider):
+    """
+    Generates the LLM response for a query from its retrieved (text, score) results.
+    Chart and graph requests return the generated chart instead.
+    """
     if not results:
         print("No results found in the vector database.")
         return "No relevant information found."
@@ -90,6 +162,100 @@ def query_vector_db(db_path, db_type,db_config, query, top_k=5, model="openai",
     return response
 
 
+def query_corpus(db_dir, query, db_paths=None, top_k=5, model="openai", provider='', embedding_provider='', embedding_model='', use_gpu=False, search_params=None, rerank=None, filters=None):
+    """
+    Queries many per-document FAISS indexes at once and answers from the merged top-k.
+    `db_paths` selects the indexes to search; by default every index in `db_dir` is searched.
+    `rerank` reorders the merged candidates with a cross-encoder (None follows config.yaml).
+    `filters` is a metadata filter expression applied in every index.
+    """
+    started = time.perf_counter()
+    db_paths = db_paths or list_indexes(db_dir)
+    if not db_paths:
+        return "No relevant information found."
+
+    # The query is embedded once; each index is opened through the shared index cache
+    vector_db = VectorDB(
+        db_path=None,
+        db_type="faiss",
+        provider=embedding_provider,
+        model_name=embedding_model,
+        use_gpu=use_gpu,
+        db_config={}
+    )
+    query_embedding = vector_db._generate_query_embedding(query)
+    settings = vector_db.db
+
+    def load_db(path):
+        db = FAISSVectorDB(
+            use_gpu=settings.use_gpu,
+            dimension=settings.dimension,
+            index_spec=settings.index_spec,
+            search_params=settings.search_params,
+            chunk_compression=settings.chunk_compression,
+            mmap=settings.mmap,
+            rescore_factor=settings.rescore_factor,
+        )
+        db.load_index(path)
+        return db
+
+    max_workers, prune = get_federated_settings()
+    print(f"Querying {len(db_paths)} indexes with: '{query}'")
+    candidates = rerank_candidates(top_k, rerank)
+    results = federated_search(query_embedding, db_paths, load_db, top_k=candidates, search_params=search_params,
+                               max_workers=max_workers, prune=prune, filters=filters)
+    results = [(result["text"], result["score"]) for result in results]
+    if candidates > top_k:
+        results = rerank_results(query, results, top_k, started=started, use_gpu=use_gpu)
+    print(f"Raw search results: {results}")
+    return answer_from_results(query, results, model, provider)
+
+
+def summarize_chunks(chunk_batches, model, provider, window_chars=None):
+    """
+    Summarizes streamed chunks without holding the whole corpus in memory.
+
+    Chunks are gathered into windows of at most `window_chars` characters and each
+    window is summarized with the LLM. Partial summaries are folded into a single one
+    whenever together they exceed the window, so memory and prompt size stay bounded.
+    Args:
+        chunk_batches (iterable): Batches of {"text"} dicts, as yielded by VectorDB.iter_chunks.
+        model (str): The LLM model to use.
+        provider (str): The provider of the LLM.
+        window_chars (int, optional): Characters per LLM call; defaults to summarization.window_chars in config.yaml.
+    Returns:
+        str: The summary, or an empty string when no chunk has text.
+    """
+    if window_chars is None:
+        window_chars = load_config().get("summarization", {}).get("window_chars", DEFAULT_SUMMARY_WINDOW_CHARS)
+
+    summaries, window, size, windows = [], [], 0, 0
+
+    def flush():
+        nonlocal summaries, window, size, windows
+        summaries.append(summarize_with_llm("\n".join(window), model, provider))
+        window, size, windows = [], 0, windows + 1
+        if len(summaries) > 1 and sum(len(summary) for summary in summaries) > window_chars:
+            summaries = [summarize_with_llm("\n\n".join(summaries), model, provider)]
+
+    for batch in chunk_batches:
+        for chunk in batch:
+            text = chunk["text"]
+            if not text:
+                continue
+            if window and size + len(text) > window_chars:
+                flush()
+            window.append(text[:window_chars])
+            size += len(window[-1])
+    if window:
+        flush()
+
+    print(f"Summarized {windows} windows of up to {window_chars} characters")
+    if len(summaries) > 1:
+        return summarize_with_llm("\n\n".join(summaries), model, provider)
+    return summaries[0] if summaries else ""
+
+
 def summarize_with_llm(chunks, model, provider):
     """
     Summarizes document chunks using the specified LLM provider.
@@ -111,16 +277,47 @@ def summarize_with_llm(chunks, model, provider):
         raise RuntimeError(f"Summarization failed: {e}")
 
 
+def delete_from_faiss_index(db_path, doc_id=None, chunk_ids=None):
+    """
+    Deletes a document, or individual chunks by id, from a FAISS index and saves it.
+    Returns the number of chunks removed.
+    """
+    # Configured like ingestion, so the rescoring vectors and sparse index are kept in sync
+    db = initialize_vector_db("faiss", {"use_gpu": False}, embedding_dimension=1)
+    db.load_index(db_path, use_cache=False)
+    removed = db.delete_document(doc_id) if doc_id else db.delete_chunks(chunk_ids or [])
+    db.save_index(db_path)
+    invalidate_answer_cache(db_path)
+    print(f"Removed {removed} chunks from {db_path}.")
+    return removed
+
+
 def main():
     parser = argparse.ArgumentParser(description="Add to or query the vector database.")
-    parser.add_argument("mode", choices=["add", "query"], help="Mode to run: 'add' or 'query'")
+    parser.add_argument("mode", choices=["add", "query", "corpus", "delete"], help="Mode to run: 'add', 'query', 'corpus' or 'delete'")
     parser.add_argument("--pdf", type=str, help="Path to the PDF file for 'add' mode")
     parser.add_argument("--db_path", type=str, default="vector_db.index", help="Path to the vector DB file")
+    parser.add_argument("--db_dir", type=str, default="vector_dbs", help="Directory of per-document FAISS indexes for 'corpus' mode")
+    parser.add_argument("--db_paths", type=str, nargs="+", help="Indexes to search in 'corpus' mode (default: every index in --db_dir)")
     parser.add_argument("--db_type", type=str, default="faiss", choices=["faiss", "milvus", "pinecone", "qdrant", "weaviate"], help="Type of vector database")
     parser.add_argument("--query", type=str, help="Search query for 'query' mode")
     parser.add_argument("--top_k", type=int, default=5, help="Number of top results to retrieve")
+    parser.add_argument("--nprobe", type=int, default=None, help="IVF lists scanned per query (FAISS/Milvus IVF indexes)")
+    parser.add_argument("--ef_search", type=int, default=None, help="HNSW candidate list size (FAISS/Milvus HNSW indexes)")
+    parser.add_argument("--search_mode", type=str, default="dense", choices=["dense", "hybrid"], help="'hybrid' adds BM25 keyword retrieval fused with RRF (FAISS)")
+    parser.add_argument("--rerank", action=argparse.BooleanOptionalAction, default=None, help="Rerank retrieved candidates with a cross-encoder (default from config.yaml)")
+    parser.add_argument("--filters", type=json.loads, default=None, help='Metadata filter as JSON, e.g. \'{"chunk_type": "table", "page": {"gte": 3}}\'')
+    parser.add_argument("--mmr_lambda", type=float, default=None, help="Diversify results with MMR: 1 = relevance only, 0 = diversity only (default from config.yaml)")
+    parser.add_argument("--mmr_candidates", type=int, default=None, help="Dense matches MMR selects from")
     parser.add_argument("--model", type=str, default="openai", help="Model to use for response generation: 'groq', 'ollama', or 'openai'")
     parser.add_argument("--use_gpu", action='store_true', help="Use GPU for Faiss indexing and querying")
+    parser.add_argument("--embedding_provider", type=str, default="sentence_transformers", help="Embedding provider (see embedding_config.py)")
+    parser.add_argument("--embedding_model", type=str, default="all-mpnet-base-v2", help="Embedding model name")
+    parser.add_argument("--embedding_workers", type=int, default=None, help="Worker processes for encoding chunks in 'add' mode (default from config.yaml)")
+    parser.add_argument("--doc", type=str, help="Document (PDF file name) to remove in 'delete' mode")
+    parser.add_argument("--chunk_ids", type=int, nargs="+", help="Chunk ids to remove in 'delete' mode")
+    parser.add_argument("--threads_per_worker", type=int, default=None, help="Threads per embedding worker in 'add' mode (default from config.yaml)")
+    parser.add_argument("--streaming", action=argparse.BooleanOptionalAction, default=None, help="Stream pages through the overlapped ingest pipeline in 'add' mode (default from config.yaml)")
 
     args = parser.parse_args()
 
@@ -134,11 +331,43 @@ def main():
             db_type=args.db_type,
             embedding_provider=args.embedding_provider,
             embedding_model=args.embedding_model,
-            use_gpu=args.use_gpu
+            use_gpu=args.use_gpu,
+            embedding_workers=args.embedding_workers,
+            threads_per_worker=args.threads_per_worker,
+            streaming=args.streaming
         )
-    elif args.mode == "query":
+    elif args.mode == "delete":
+        if not args.doc and not args.chunk_ids:
+            print("Error: --doc or --chunk_ids is required in 'delete' mode.")
+            return
+        if args.db_type != "faiss":
+            print("Error: 'delete' mode supports FAISS indexes only.")
+            return
+        delete_from_faiss_index(args.db_path, doc_id=args.doc, chunk_ids=args.chunk_ids)
+    elif args.mode in ("query", "corpus"):
         if not args.query:
-            print("Error: Query is required in 'query' mode.")
+            print(f"Error: Query is required in '{args.mode}' mode.")
+            return
+        search_params = {}
+        if args.nprobe:
+            search_params["nprobe"] = args.nprobe
+        if args.ef_search:
+            search_params["efSearch"] = args.ef_search
+        if args.mode == "corpus":
+            query_corpus(
+                args.db_dir,
+                args.query,
+                db_paths=args.db_paths,
+                top_k=args.top_k,
+                model=args.model,
+                provider=args.model,
+                embedding_provider=args.embedding_provider,
+                embedding_model=args.embedding_model,
+                use_gpu=args.use_gpu,
+                search_params=search_params or None,
+                rerank=args.rerank,
+                filters=args.filters
+            )
             return
         query_vector_db(
             args.db_path,
@@ -150,7 +379,13 @@ def main():
             provider=args.model,
             embedding_provider=args.embedding_provider,
             embedding_model=args.embedding_model,
-            use_gpu=args.use_gpu
+            use_gpu=args.use_gpu,
+            search_params=search_params or None,
+            search_mode=args.search_mode,
+            rerank=args.rerank,
+            mmr_lambda=args.mmr_lambda,
+            mmr_candidates=args.mmr_candidates,
+            filters=args.filters
         )
 
 if __name__ == "__main__":
@@ -0,0 +1,67 @@
+import numpy as np
+from config import load_config
+
+DEFAULT_LAMBDA = 0.5
+DEFAULT_CANDIDATES = 20
+
+
+def maximal_marginal_relevance(query_vector, candidate_vectors, top_k=5, lambda_mult=DEFAULT_LAMBDA):
+    """
+    Greedily selects candidates that are relevant to the query but not to each other.
+
+    Each step picks the candidate maximizing
+    lambda_mult * sim(query, c) - (1 - lambda_mult) * max sim(c, already selected),
+    with cosine similarities. The candidate similarity matrix is computed once with a
+    single matrix product, and each step updates the running max with one of its rows.
+
+    Args:
+        query_vector (array): Query embedding, shape (d,).
+        candidate_vectors (array): Candidate embeddings, shape (n, d).
+        top_k (int): Candidates to select.
+        lambda_mult (float): 1 ranks by relevance only, 0 by diversity only.
+    Returns:
+        list: Row indices of the selected candidates, in selection order.
+    """
+    if not 0 <= lambda_mult <= 1:
+        raise ValueError(f"lambda_mult must be between 0 and 1, got {lambda_mult}.")
+    candidates = np.asarray(candidate_vectors, dtype=np.float32)
+    count = min(top_k, len(candidates))
+    if count <= 0:
+        return []
+    candidates = candidates / np.maximum(np.linalg.norm(candidates, axis=1, keepdims=True), 1e-12)
+    query = np.asarray(query_vector, dtype=np.float32).ravel()
+    query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+    relevance = candidates @ query
+    similarity = candidates @ candidates.T
+    redundancy = np.full(len(candidates), -np.inf, dtype=np.float32)
+    available = np.ones(len(candidates), dtype=bool)
+    selected = []
+    for _ in range(count):
+        # Before anything is selected the redundancy term is ignored
+        penalty = np.where(np.isfinite(redundancy), redundancy, 0.0)
+        scores = np.where(available, lambda_mult * relevance - (1 - lambda_mult) * penalty, -np.inf)
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(redundancy, similarity[best], out=redundancy)
+    return selected
+
+
+def get_mmr_settings():
+    """Returns the `diversification` section of config.yaml."""
+    return load_config().get("diversification", {})
+
+
+def resolve_mmr(mmr_lambda=None, mmr_candidates=None):
+    """
+    Returns the (lambda, candidate pool size) a query should use, or (None, None) when
+    MMR is off. Per-request values override config.yaml; a request that sets
+    mmr_lambda turns MMR on even when it is disabled in the config.
+    """
+    settings = get_mmr_settings()
+    if mmr_lambda is None:
+        if not settings.get("enabled", False):
+            return None, None
+        mmr_lambda = settings.get("lambda", DEFAULT_LAMBDA)
+    return mmr_lambda, mmr_candidates or settings.get("candidates", DEFAULT_CANDIDATES)
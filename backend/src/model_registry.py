@@ -0,0 +1,191 @@
+import threading
+from collections import OrderedDict
+from config import load_config
+from embedding_initializer import initialize_embedding_model
+
+DEFAULT_MAX_MEMORY_MB = 4096
+DEFAULT_MODEL_MB = 512
+
+
+def resolve_device(use_gpu):
+    """Returns the device embedding models should be loaded on ("cuda" or "cpu")."""
+    if not use_gpu:
+        return "cpu"
+    try:
+        import torch
+        return "cuda" if torch.cuda.is_available() else "cpu"
+    except ImportError:
+        return "cpu"
+
+
+def estimate_model_bytes(model, default_bytes=0):
+    """
+    Best-effort estimate of the memory held by a loaded embedding model.
+    Uses the parameter tensors for torch models and the vector matrix for
+    gensim KeyedVectors, falling back to `default_bytes` otherwise.
+    """
+    if hasattr(model, "memory_bytes"):
+        return model.memory_bytes()
+
+    parameters = getattr(model, "parameters", None)
+    if callable(parameters):
+        try:
+            nbytes = sum(p.numel() * p.element_size() for p in parameters())
+            # ONNX Runtime backed models hold no torch parameters
+            if nbytes:
+                return nbytes
+        except Exception:
+            pass
+
+    vectors = getattr(model, "vectors", None)
+    if vectors is not None and hasattr(vectors, "nbytes"):
+        return vectors.nbytes
+
+    return default_bytes
+
+
+class EmbeddingModelRegistry:
+    """
+    Process-wide registry of loaded embedding models keyed by (provider, model_name, device).
+
+    Each model is loaded once and shared by every VectorDB instance in the process.
+    Loading is serialized per key so concurrent requests for the same model wait for
+    a single load instead of racing. When the estimated memory of the loaded models
+    exceeds the budget, the least recently used models are evicted.
+    """
+
+    def __init__(self, max_memory_bytes=None, default_model_bytes=None, loader=initialize_embedding_model):
+        """
+        Args:
+            max_memory_bytes (int, optional): Memory budget for loaded models. None disables eviction.
+            default_model_bytes (int, optional): Size assumed for models whose memory cannot be measured.
+            loader (callable): Function returning (model, dimension, is_callable) for a provider/model.
+        """
+        self.max_memory_bytes = max_memory_bytes
+        self.default_model_bytes = default_model_bytes or DEFAULT_MODEL_MB * 1024 * 1024
+        self._loader = loader
+        self._entries = OrderedDict()  # key -> (model, dimension, is_callable, nbytes)
+        self._load_locks = {}
+        self._eviction_listeners = []
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, provider, model_name, device="cpu", api_key=None):
+        """
+        Returns (model, dimension, is_callable) for the given provider and model,
+        loading it on first use.
+        """
+        key = (provider, model_name, device)
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is not None:
+                return entry
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        with load_lock:
+            # Another thread may have finished loading while we waited
+            with self._lock:
+                entry = self._lookup(key)
+                if entry is not None:
+                    return entry
+
+            print(f"Loading embedding model into registry: {key}")
+            model, dimension, is_callable = self._loader(provider, model_name, api_key, device=device)
+            nbytes = estimate_model_bytes(model, self.default_model_bytes)
+
+            with self._lock:
+                self.misses += 1
+                self._entries[key] = (model, dimension, is_callable, nbytes)
+                self._load_locks.pop(key, None)
+                self._evict(keep=key)
+            return model, dimension, is_callable
+
+    def _lookup(self, key):
+        """Returns a cached entry and marks it as most recently used. Caller holds the lock."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[:3]
+
+    def _evict(self, keep=None):
+        """Evicts least recently used models until the budget is met. Caller holds the lock."""
+        if self.max_memory_bytes is None:
+            return
+        for key in list(self._entries):
+            if self.memory_bytes() <= self.max_memory_bytes:
+                break
+            if key == keep:
+                continue
+            self._entries.pop(key)
+            self.evictions += 1
+            self._notify_evicted(key)
+            print(f"Evicted embedding model from registry: {key}")
+
+    def add_eviction_listener(self, listener):
+        """Registers `listener(key)` to be called whenever a model leaves the registry."""
+        with self._lock:
+            if listener not in self._eviction_listeners:
+                self._eviction_listeners.append(listener)
+
+    def _notify_evicted(self, key):
+        for listener in self._eviction_listeners:
+            listener(key)
+
+    def memory_bytes(self):
+        """Returns the estimated memory held by all loaded models."""
+        return sum(entry[3] for entry in self._entries.values())
+
+    def evict(self, provider, model_name, device="cpu"):
+        """Removes a model from the registry. Returns True if it was loaded."""
+        key = (provider, model_name, device)
+        with self._lock:
+            if self._entries.pop(key, None) is None:
+                return False
+            self._notify_evicted(key)
+            return True
+
+    def clear(self):
+        """Removes every loaded model from the registry."""
+        with self._lock:
+            for key in list(self._entries):
+                self._entries.pop(key)
+                self._notify_evicted(key)
+
+    def stats(self):
+        """Returns registry statistics for monitoring endpoints."""
+        with self._lock:
+            return {
+                "models": [
+                    {"provider": key[0], "model_name": key[1], "device": key[2], "memory_bytes": entry[3]}
+                    for key, entry in self._entries.items()
+                ],
+                "memory_bytes": self.memory_bytes(),
+                "max_memory_bytes": self.max_memory_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_model_registry():
+    """Returns the process-wide embedding model registry, creating it from config.yaml on first use."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                settings = load_config().get("embedding_models", {})
+                max_mb = settings.get("max_memory_mb", DEFAULT_MAX_MEMORY_MB)
+                default_mb = settings.get("default_model_mb", DEFAULT_MODEL_MB)
+                _registry = EmbeddingModelRegistry(
+                    max_memory_bytes=int(max_mb * 1024 * 1024) if max_mb else None,
+                    default_model_bytes=int(default_mb * 1024 * 1024),
+                )
+    return _registry
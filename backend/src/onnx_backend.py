@@ -0,0 +1,122 @@
+import os
+import re
+import json
+import argparse
+import numpy as np
+from sentence_transformers import SentenceTransformer
+from config import BASE_DIR, load_config
+from utils import load_chunks_from_file
+
+DEFAULT_ONNX_DIR = os.path.join(BASE_DIR, "..", "onnx_models")
+DEFAULT_QUANTIZATION = "avx512_vnni"
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+
+def get_model_backend(model_name):
+    """Returns the execution backend configured for a sentence_transformers model."""
+    settings = load_config().get("embedding_models", {})
+    backend = settings.get("backends", {}).get(model_name, "torch")
+    if backend not in BACKENDS:
+        raise ValueError(f"Unsupported backend '{backend}' for {model_name}. Choose from {BACKENDS}.")
+    return backend
+
+
+def _onnx_settings():
+    settings = load_config().get("embedding_models", {}).get("onnx", {})
+    return settings.get("cache_dir") or DEFAULT_ONNX_DIR, settings.get("quantization", DEFAULT_QUANTIZATION)
+
+
+def load_sentence_transformer(model_name, device=None, backend="torch"):
+    """
+    Loads a SentenceTransformer with the requested execution backend.
+
+    "onnx" exports the model to ONNX once and caches the artifact on disk. "onnx-int8"
+    additionally applies dynamic int8 quantization to the exported graph. Later loads
+    read the cached artifact instead of exporting again.
+    """
+    if backend == "torch":
+        return SentenceTransformer(model_name, device=device)
+
+    try:
+        from sentence_transformers import export_dynamic_quantized_onnx_model
+    except ImportError:
+        raise ValueError("The ONNX backend requires sentence-transformers>=3.2 and optimum[onnxruntime].")
+
+    cache_dir, quantization = _onnx_settings()
+    model_dir = os.path.join(cache_dir, re.sub(r"[^A-Za-z0-9_.-]", "_", model_name))
+    onnx_file = os.path.join(model_dir, "onnx", "model.onnx")
+
+    if not os.path.exists(onnx_file):
+        print(f"Exporting {model_name} to ONNX at {model_dir}...")
+        model = SentenceTransformer(model_name, device="cpu", backend="onnx")
+        model.save_pretrained(model_dir)
+
+    if backend == "onnx":
+        return SentenceTransformer(model_dir, device=device, backend="onnx")
+
+    file_name = f"onnx/model_qint8_{quantization}.onnx"
+    if not os.path.exists(os.path.join(model_dir, file_name)):
+        print(f"Quantizing {model_name} to int8 ({quantization})...")
+        model = SentenceTransformer(model_dir, device="cpu", backend="onnx")
+        export_dynamic_quantized_onnx_model(model, quantization, model_dir)
+
+    return SentenceTransformer(model_dir, device=device, backend="onnx", model_kwargs={"file_name": file_name})
+
+
+def compare_backend_accuracy(model_name, texts, backend, top_k=5):
+    """
+    Compares the embeddings of a backend against the fp32 PyTorch model.
+
+    Args:
+        model_name (str): sentence_transformers model name.
+        texts (list): Chunks to embed with both backends.
+        backend (str): Backend to compare ("onnx" or "onnx-int8").
+        top_k (int): Neighbourhood size for the retrieval agreement check.
+    Returns:
+        dict: Per-text cosine similarity statistics and the average overlap of each
+        text's top-k neighbours between the two backends.
+    """
+    reference = load_sentence_transformer(model_name, device="cpu", backend="torch")
+    candidate = load_sentence_transformer(model_name, device="cpu", backend=backend)
+    ref = reference.encode(texts, normalize_embeddings=True)
+    cand = candidate.encode(texts, normalize_embeddings=True)
+
+    cosine = np.sum(ref * cand, axis=1)
+
+    # Retrieval agreement: each chunk queries the others with both backends
+    k = min(top_k, len(texts) - 1)
+    overlap = []
+    if k > 0:
+        ref_scores = ref @ ref.T
+        cand_scores = cand @ cand.T
+        np.fill_diagonal(ref_scores, -np.inf)
+        np.fill_diagonal(cand_scores, -np.inf)
+        ref_top = np.argsort(-ref_scores, axis=1)[:, :k]
+        cand_top = np.argsort(-cand_scores, axis=1)[:, :k]
+        overlap = [len(set(a) & set(b)) / k for a, b in zip(ref_top, cand_top)]
+
+    return {
+        "model": model_name,
+        "backend": backend,
+        "texts": len(texts),
+        "cosine_mean": float(cosine.mean()),
+        "cosine_min": float(cosine.min()),
+        f"top{k}_overlap": float(np.mean(overlap)) if overlap else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare an ONNX backend against fp32 PyTorch embeddings.")
+    parser.add_argument("--model", default="all-mpnet-base-v2", help="sentence_transformers model name")
+    parser.add_argument("--backend", default="onnx-int8", choices=["onnx", "onnx-int8"])
+    parser.add_argument("--chunks", default=os.path.join(BASE_DIR, "..", "..", "parsed_chunks", "semantic_chunking_chunks.txt"),
+                        help="Chunk file written by pdf_extractor.save_chunks_to_file")
+    parser.add_argument("--top_k", type=int, default=5)
+    args = parser.parse_args()
+
+    texts = load_chunks_from_file(args.chunks)
+    print(json.dumps(compare_backend_accuracy(args.model, texts, args.backend, top_k=args.top_k), indent=2))
+
+
+if __name__ == "__main__":
+    main()
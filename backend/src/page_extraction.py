@@ -0,0 +1,126 @@
+import re
+import multiprocessing
+from collections import deque
+import fitz
+from config import load_config
+
+# Spawned workers unpickle tasks from this module, which only imports fitz, but they also
+# re-import the parent's __main__ (RAG_fastapi.py, main.py, ...). pdf_extractor therefore
+# loads its NLP and CLIP models lazily instead of at import time.
+
+# Page ranges handed out per worker; more, smaller ranges balance pages of uneven cost
+RANGES_PER_WORKER = 4
+# Ranges extracted ahead of the consumer per worker, so results never pile up in memory
+IN_FLIGHT_PER_WORKER = 2
+# Fewer pages per worker than this do not pay for starting the worker process
+MIN_PAGES_PER_WORKER = 16
+
+
+def clean_text(text):
+    """Clean text by removing extraneous symbols and whitespace."""
+    text = re.sub(r"\s+", " ", text).strip()
+    text = re.sub(r"\u2022", "-", text)  # Replace bullet points
+    return text
+
+
+def get_extraction_workers(workers=None, page_count=None):
+    """
+    Resolves the extraction worker count from an explicit argument, falling back to
+    config.yaml, and caps it so every worker gets at least MIN_PAGES_PER_WORKER pages.
+    """
+    if workers is None:
+        workers = load_config().get("pdf_extraction", {}).get("workers", 0)
+    if page_count is not None:
+        workers = min(workers, page_count // MIN_PAGES_PER_WORKER)
+    return workers
+
+
+def page_ranges(page_count, partitions):
+    """Splits pages [0, page_count) into at most `partitions` contiguous (start, stop) ranges."""
+    size = max(1, -(-page_count // max(partitions, 1)))
+    return [(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+
+
+def _iter_page_range(pdf_path, start, stop, text=True, figures=False):
+    with fitz.open(pdf_path) as document:
+        for number in range(start, stop):
+            page = document[number]
+            page_text = clean_text(page.get_text("text")) if text else ""
+            images = [document.extract_image(img[0])["image"] for img in page.get_images(full=True)] if figures else []
+            yield number + 1, page_text, images
+
+
+def extract_page_range(pdf_path, start, stop, text=True, figures=False):
+    """
+    Extracts pages [start, stop) of a PDF with its own fitz document.
+    Returns (1-based page number, cleaned text, figure bytes) tuples.
+    """
+    return list(_iter_page_range(pdf_path, start, stop, text=text, figures=figures))
+
+
+def iter_pages(pdf_path, workers=None, text=True, figures=False):
+    """
+    Yields (page number, cleaned text, figure bytes) for every page, in page order.
+
+    With `workers` > 1 (None follows config.yaml) page ranges are extracted by a pool of
+    worker processes that each open the PDF themselves. Only a few ranges per worker are
+    in flight at a time, so a slow consumer keeps memory bounded.
+    """
+    with fitz.open(pdf_path) as document:
+        page_count = document.page_count
+    workers = get_extraction_workers(workers, page_count)
+    if workers <= 1:
+        yield from _iter_page_range(pdf_path, 0, page_count, text=text, figures=figures)
+        return
+
+    ranges = page_ranges(page_count, workers * RANGES_PER_WORKER)
+    # spawn gives every worker a clean interpreter instead of a forked copy of the parent's threads
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(processes=min(workers, len(ranges))) as pool:
+        pending = deque()
+        for start, stop in ranges:
+            pending.append(pool.apply_async(extract_page_range, (pdf_path, start, stop, text, figures)))
+            if len(pending) >= workers * IN_FLIGHT_PER_WORKER:
+                yield from pending.popleft().get()
+        while pending:
+            yield from pending.popleft().get()
+
+
+def extract_pages(pdf_path, workers=None, text=True, figures=False):
+    """Returns the (page number, cleaned text, figure bytes) tuples of every page, in page order."""
+    return list(iter_pages(pdf_path, workers=workers, text=text, figures=figures))
+
+
+def extract_table_range(pdf_path, start, stop):
+    """Extracts the table rows of pages [start, stop) with pdfplumber. Returns (rows, page numbers)."""
+    import pdfplumber
+
+    table_texts, table_pages = [], []
+    with pdfplumber.open(pdf_path, pages=list(range(start + 1, stop + 1))) as pdf:
+        for page in pdf.pages:
+            for table in page.extract_tables():
+                for row in table:
+                    table_texts.append(", ".join(cell or "" for cell in row))
+                    table_pages.append(page.page_number)
+    return table_texts, table_pages
+
+
+def extract_tables_with_pdfplumber(pdf_path, workers=None):
+    """
+    Extracts table rows with pdfplumber, one text per row. Returns (rows, page numbers).
+    With `workers` > 1 page ranges are parsed in parallel and merged in page order.
+    """
+    with fitz.open(pdf_path) as document:
+        page_count = document.page_count
+    workers = get_extraction_workers(workers, page_count)
+    if workers <= 1:
+        return extract_table_range(pdf_path, 0, page_count)
+
+    ranges = page_ranges(page_count, workers * RANGES_PER_WORKER)
+    context = multiprocessing.get_context("spawn")
+    table_texts, table_pages = [], []
+    with context.Pool(processes=min(workers, len(ranges))) as pool:
+        for texts, pages in pool.starmap(extract_table_range, [(pdf_path, start, stop) for start, stop in ranges]):
+            table_texts.extend(texts)
+            table_pages.extend(pages)
+    return table_texts, table_pages
@@ -1,29 +1,55 @@
 import os
-import re
-import camelot
+import bisect
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import fitz
-import spacy
-from pdf2image import convert_from_path
 import pytesseract
-import pdfplumber
-from transformers import CLIPProcessor, CLIPModel
 from PIL import Image
 import io
+from page_extraction import clean_text, iter_pages, extract_tables_with_pdfplumber
+from config import load_config
+
+DEFAULT_OCR_DPI = 300
+DEFAULT_OCR_MIN_CHARS = 50
+DEFAULT_OCR_WORKERS = 4
+
+# NLP and CLIP models are loaded on first use. Extraction worker processes re-import the
+# parent's __main__ (and with it this module), so loading them at import time would load
+# them again in every worker.
+_nlp = None
+_clip = None
+_models_lock = threading.Lock()
+
+
+def get_nlp():
+    """Returns the spaCy pipeline, loading it on first use."""
+    global _nlp
+    if _nlp is None:
+        with _models_lock:
+            if _nlp is None:
+                import spacy
+                _nlp = spacy.load("en_core_web_sm")
+    return _nlp
+
+
+def get_clip():
+    """Returns the (CLIP model, CLIP processor) pair, loading them on first use."""
+    global _clip
+    if _clip is None:
+        with _models_lock:
+            if _clip is None:
+                from transformers import CLIPProcessor, CLIPModel
+                _clip = (
+                    CLIPModel.from_pretrained("openai/clip-vit-base-patch32"),
+                    CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32"),
+                )
+    return _clip
 
-# Initialize NLP and CLIP model
-nlp = spacy.load("en_core_web_sm")
-clip_model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32")
-clip_processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
-
-def clean_text(text):
-    """Clean text by removing extraneous symbols and whitespace."""
-    text = re.sub(r"\s+", " ", text).strip()
-    text = re.sub(r"\u2022", "-", text)  # Replace bullet points
-    return text
 
 def chunk_text(text, max_length=512):
     """Chunk text into manageable pieces for embeddings."""
-    doc = nlp(text)
+    doc = get_nlp()(text)
     chunks, chunk = [], []
     length = 0
 
@@ -41,7 +67,7 @@ def chunk_text(text, max_length=512):
 
 def chunk_by_topics(text, max_length=512):
     """Chunk text based on topics and semantic structure."""
-    doc = nlp(text)
+    doc = get_nlp()(text)
     chunks, current_chunk = [], []
     current_length = 0
 
@@ -81,7 +107,7 @@ def chunk_text_advanced(text, max_length=512, split_on=["\n\n", ". ", "? ", "! "
 
 def chunk_text_by_semantics(text, max_length=512):
     """Chunk text into meaningful semantic units, respecting topic and paragraph boundaries."""
-    doc = nlp(text)
+    doc = get_nlp()(text)
     chunks, current_chunk = [], []
     current_length = 0
 
@@ -100,11 +126,17 @@ def chunk_text_by_semantics(text, max_length=512):
         chunks.append(" ".join(current_chunk))
     return chunks
 
-def extract_tables(pdf_path):
-    """Extract tables using Camelot and fallback to PDFPlumber if needed."""
-    table_texts = []
+def extract_tables(pdf_path, with_pages=False, workers=None):
+    """
+    Extract tables using Camelot and fallback to PDFPlumber if needed.
+    Returns one text per table row; with `with_pages`, returns (rows, page numbers).
+    With `workers` > 1 (None follows config.yaml) the PDFPlumber fallback parses page
+    ranges in parallel processes.
+    """
+    table_texts, table_pages = [], []
 
     try:
+        import camelot
         tables = camelot.read_pdf(pdf_path, pages="all", flavor="lattice")
         if not tables:
             tables = camelot.read_pdf(pdf_path, pages="all", flavor="stream")
@@ -115,22 +147,22 @@ def extract_tables(pdf_path):
             for _, row in df.iterrows():
                 row_text = ", ".join([f"{col}: {val}" for col, val in row.items() if val])
                 table_texts.append(row_text)
+                table_pages.append(int(table.page))
 
     except Exception as e:
         print(f"Camelot failed: {e}. Falling back to PDFPlumber.")
+        table_texts, table_pages = [], []
         try:
-            with pdfplumber.open(pdf_path) as pdf:
-                for page in pdf.pages:
-                    for table in page.extract_tables():
-                        for row in table:
-                            table_texts.append(", ".join(row))
+            table_texts, table_pages = extract_tables_with_pdfplumber(pdf_path, workers=workers)
         except Exception as plumber_e:
             print(f"PDFPlumber also failed: {plumber_e}")
 
-    return table_texts
+    return (table_texts, table_pages) if with_pages else table_texts
 
 def extract_and_label_tables(pdf_path):
     """Extract tables and label them based on surrounding text context."""
+    import camelot
+
     document = fitz.open(pdf_path)
     tables_with_labels = []
 
@@ -154,30 +186,202 @@ def extract_and_label_tables(pdf_path):
     return tables_with_labels
 
 
-def extract_text_with_fitz(pdf_path):
-    """Extract text with fallback to OCR."""
+def extract_text_with_fitz(pdf_path, workers=None):
+    """
+    Extract text, OCRing pages without selectable text (see ocr_sparse_pages).
+    With `workers` > 1 (None follows config.yaml) page ranges are extracted in parallel processes.
+    """
     try:
-        document = fitz.open(pdf_path)
-        text = ""
-        for page in document:
-            text += page.get_text("text")
-        document.close()
+        pages = ocr_sparse_pages(pdf_path, iter_pages(pdf_path, workers=workers))
+        return clean_text(" ".join(text for _, text, _ in pages if text))
 
-        if not text.strip():  # Fallback if no selectable text
-            print("Fallback to OCR as no selectable text found.")
-            text = ocr_pdf(pdf_path)
+    except Exception as e:
+        print(f"Error with PyMuPDF: {e}. Falling back to OCR.")
+        return ocr_pdf(pdf_path)
 
-        return clean_text(text)
+def extract_pages_with_fitz(pdf_path, workers=None):
+    """
+    Extract the cleaned text of each page, OCRing pages without selectable text.
+    With `workers` > 1 (None follows config.yaml) page ranges are extracted in parallel processes.
+    """
+    try:
+        return [text for _, text, _ in ocr_sparse_pages(pdf_path, iter_pages(pdf_path, workers=workers))]
 
     except Exception as e:
         print(f"Error with PyMuPDF: {e}. Falling back to OCR.")
-        return ocr_pdf(pdf_path)
+        return ocr_pages(pdf_path)
+
+def iter_pdf_pages(pdf_path, workers=None):
+    """
+    Yields (page number, cleaned text, figure bytes) one page at a time, so only a few
+    pages are held in memory. Page numbers are 1-based. Pages with little or no
+    selectable text are OCRed (see ocr_sparse_pages).
+    With `workers` > 1 (None follows config.yaml) pages are extracted ahead in parallel processes.
+    """
+    yield from ocr_sparse_pages(pdf_path, iter_pages(pdf_path, workers=workers, figures=True))
+
+def get_ocr_settings():
+    """Returns the `ocr` section of config.yaml."""
+    return load_config().get("ocr", {})
+
+def render_page(page, dpi=DEFAULT_OCR_DPI):
+    """Renders a fitz page to a grayscale PIL image for OCR."""
+    pixmap = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+    return Image.frombytes("L", (pixmap.width, pixmap.height), pixmap.samples)
+
+def ocr_sparse_pages(pdf_path, pages, min_chars=None, dpi=None, workers=None, lang="eng"):
+    """
+    Passes (page number, text, figures) tuples through in page order, OCRing the pages
+    with fewer than `min_chars` characters of selectable text. The OCR text replaces
+    the extracted text when it is longer.
+
+    Scanned pages are rendered one at a time from an in-process fitz document at `dpi`,
+    and tesseract runs on a pool of `workers` threads with at most 2 * workers pages in
+    flight, so memory stays flat whatever the page count. Unset arguments follow the
+    `ocr` section of config.yaml.
+    """
+    settings = get_ocr_settings()
+    min_chars = settings.get("min_chars", DEFAULT_OCR_MIN_CHARS) if min_chars is None else min_chars
+    dpi = dpi or settings.get("dpi", DEFAULT_OCR_DPI)
+    workers = max(workers or settings.get("workers", DEFAULT_OCR_WORKERS), 1)
+    if workers > 1:
+        # Concurrent tesseract processes should not each start a thread per core
+        os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+    def resolve(number, text, figures, future):
+        if future is not None:
+            ocr_text = clean_text(future.result())
+            text = ocr_text if len(ocr_text) > len(text) else text
+        return number, text, figures
+
+    document = None
+    ocr_count = page_count = 0
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            for number, text, figures in pages:
+                page_count += 1
+                future = None
+                if len(text) < min_chars:
+                    document = document or fitz.open(pdf_path)
+                    future = pool.submit(pytesseract.image_to_string, render_page(document[number - 1], dpi), lang=lang)
+                    ocr_count += 1
+                pending.append((number, text, figures, future))
+                while len(pending) > 2 * workers:
+                    yield resolve(*pending.popleft())
+            while pending:
+                yield resolve(*pending.popleft())
+    finally:
+        if document is not None:
+            document.close()
+    if ocr_count:
+        print(f"OCRed {ocr_count} of {page_count} pages.")
+
+def ocr_pages(pdf_path):
+    """Perform OCR on every page of a PDF, returning the cleaned text of each page."""
+    with fitz.open(pdf_path) as document:
+        page_count = document.page_count
+    pages = ((number, "", []) for number in range(1, page_count + 1))
+    return [text for _, text, _ in ocr_sparse_pages(pdf_path, pages, min_chars=1)]
+
+def chunk_pages(pages, max_length=512):
+    """
+    Chunks the text of a document with chunk_text_by_semantics and locates every chunk.
+    Pages are joined with single spaces into the document text the offsets refer to.
+    Returns (chunks, spans) where spans[i] is (page, char_start, char_end) with a 1-based
+    page number; a chunk that cannot be found verbatim gets (None, None, None).
+    """
+    page_starts, page_numbers, parts = [], [], []
+    position = 0
+    for number, page in enumerate(pages, start=1):
+        if page:
+            page_starts.append(position)
+            page_numbers.append(number)
+            parts.append(page)
+            position += len(page) + 1
+    text = " ".join(parts)
+
+    chunks = chunk_text_by_semantics(text, max_length=max_length)
+    spans, cursor = [], 0
+    for chunk in chunks:
+        start = text.find(chunk, cursor) if chunk else -1
+        if start < 0:
+            spans.append((None, None, None))
+            continue
+        cursor = start + len(chunk)
+        # A chunk that crosses a page break is attributed to the page it starts on
+        spans.append((page_numbers[bisect.bisect_right(page_starts, start) - 1], start, cursor))
+    return chunks, spans
+
+class PageChunker:
+    """
+    Incremental version of chunk_pages for documents streamed page by page.
+
+    Each added page is appended to a small carry-over buffer that is chunked with
+    chunk_text_by_semantics. Every chunk but the last is final; the last one may
+    continue on the next page and stays in the buffer. Offsets refer to the same
+    document text as chunk_pages (non-empty pages joined with single spaces).
+    """
+
+    def __init__(self, max_length=512):
+        self.max_length = max_length
+        self.buffer = ""       # Document text not emitted yet
+        self.buffer_start = 0  # Offset of the buffer in the document text
+        self.length = 0        # Length of the document text so far
+        self.page_starts, self.page_numbers = [], []
+
+    def add_page(self, number, text):
+        """Adds the cleaned text of a page. Returns the finished (chunk, span) pairs."""
+        if not text:
+            return []
+        separator = " " if self.length else ""
+        page_start = self.length + len(separator)
+        if self.buffer:
+            self.buffer += separator + text
+        else:
+            self.buffer, self.buffer_start = text, page_start
+        self.length = page_start + len(text)
+        self.page_starts.append(page_start)
+        self.page_numbers.append(number)
+        return self._emit(final=False)
+
+    def finish(self):
+        """Returns the (chunk, span) pairs left in the buffer once every page was added."""
+        return self._emit(final=True) if self.buffer else []
+
+    def _emit(self, final):
+        chunks = [chunk for chunk in chunk_text_by_semantics(self.buffer, max_length=self.max_length) if chunk]
+        if not final and chunks:
+            done, carry = chunks[:-1], chunks[-1]
+        else:
+            done, carry = chunks, None
+
+        emitted, cursor = [], 0
+        for chunk in done:
+            start = self.buffer.find(chunk, cursor)
+            if start < 0:
+                emitted.append((chunk, (None, None, None)))
+                continue
+            cursor = start + len(chunk)
+            start += self.buffer_start
+            # A chunk that crosses a page break is attributed to the page it starts on
+            page = self.page_numbers[bisect.bisect_right(self.page_starts, start) - 1]
+            emitted.append((chunk, (page, start, start + len(chunk))))
+
+        if carry is None:
+            self.buffer_start, self.buffer = self.length, ""
+        else:
+            start = self.buffer.find(carry, cursor)
+            start = start if start >= 0 else cursor
+            self.buffer_start, self.buffer = self.buffer_start + start, self.buffer[start:]
+        # Forget the pages that end before the buffer
+        first = max(bisect.bisect_right(self.page_starts, self.buffer_start) - 1, 0)
+        del self.page_starts[:first], self.page_numbers[:first]
+        return emitted
 
 def ocr_pdf(pdf_path):
     """Perform OCR on non-text PDFs."""
-    images = convert_from_path(pdf_path)
-    ocr_texts = [pytesseract.image_to_string(image, lang="eng") for image in images]
-    return "\n".join(ocr_texts)
+    return "\n".join(ocr_pages(pdf_path))
 
 def remove_headers_footers(text, threshold=3):
     """Remove repeating headers and footers based on frequency."""
@@ -207,23 +411,22 @@ def preprocess_text(text):
     text = remove_headers_footers(text)
     return clean_text(text)
 
-def extract_figures(pdf_path):
-    """Extract images/figures from PDF."""
-    document = fitz.open(pdf_path)
-    figures = []
-    for page in document:
-        images = page.get_images(full=True)
-        for img_index, img in enumerate(images):
-            xref = img[0]
-            base_image = document.extract_image(xref)
-            image_bytes = base_image["image"]
-            figures.append(image_bytes)
-    document.close()
-    return figures
+def extract_figures(pdf_path, with_pages=False, workers=None):
+    """
+    Extract images/figures from PDF.
+    Returns the image bytes; with `with_pages`, returns (images, page numbers).
+    With `workers` > 1 (None follows config.yaml) page ranges are extracted in parallel processes.
+    """
+    figures, figure_pages = [], []
+    for number, _, images in iter_pages(pdf_path, workers=workers, text=False, figures=True):
+        figures.extend(images)
+        figure_pages.extend([number] * len(images))
+    return (figures, figure_pages) if with_pages else figures
 
 def process_figure_with_clip(figure_bytes, figure_index):
     """Generate captions and embeddings for a figure using CLIP."""
     try:
+        clip_model, clip_processor = get_clip()
         image = Image.open(io.BytesIO(figure_bytes)).convert("RGB")
         inputs = clip_processor(images=image, return_tensors="pt")
         embeddings = clip_model.get_image_features(**inputs).detach().numpy()
@@ -326,6 +529,7 @@ def hybrid_chunking(text, max_length=512, advanced_split_on=["\n\n", ". ", "? ",
         List[str]: List of hybrid chunks.
     """
     # Determine document characteristics
+    nlp = get_nlp()
     num_sentences = len(list(nlp(text).sents))
     avg_sentence_length = sum(len(sent.text) for sent in nlp(text).sents) / num_sentences
 
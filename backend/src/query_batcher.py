@@ -0,0 +1,184 @@
+import time
+import queue
+import threading
+from concurrent.futures import Future
+from config import load_config
+from model_registry import get_model_registry
+
+DEFAULT_MAX_WAIT_MS = 5
+DEFAULT_MAX_BATCH_SIZE = 32
+
+
+class EmbeddingMicroBatcher:
+    """
+    Collects query texts from concurrent requests and encodes them together.
+
+    A background thread waits for the first queued text, then keeps collecting until
+    `max_batch_size` texts are queued or `max_wait_ms` has passed, encodes the batch
+    with a single call and hands each vector back to its waiting caller.
+    """
+
+    def __init__(self, encode_fn, max_wait_ms=DEFAULT_MAX_WAIT_MS, max_batch_size=DEFAULT_MAX_BATCH_SIZE, name="embedding-batcher"):
+        """
+        Args:
+            encode_fn (callable): Encodes a list of texts into an (n, dimension) array.
+            max_wait_ms (float): How long to wait for more texts after the first one arrives.
+            max_batch_size (int): Maximum number of texts encoded in one call.
+        """
+        self.encode_fn = encode_fn
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self._queue = queue.Queue()
+        self._closed = False
+        # Orders submits against close(), so no text can be queued behind the shutdown marker
+        self._submit_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+        self.batch_size_histogram = {}
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, text):
+        """Queues a text for encoding and returns a Future resolving to its vector."""
+        future = Future()
+        with self._submit_lock:
+            if self._closed:
+                raise RuntimeError("Embedding micro-batcher is closed.")
+            self._queue.put((text, future))
+        return future
+
+    def encode(self, text, timeout=None):
+        """Encodes a single text through the batcher and returns its vector."""
+        return self.submit(text).result(timeout=timeout)
+
+    def _collect(self):
+        """Blocks for the first queued item, then gathers more until the batch is full or the window closes."""
+        item = self._queue.get()
+        if item is None:
+            return None
+        batch = [item]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                # Put the shutdown marker back so the loop exits after this batch
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                self._drain()
+                return
+            self._encode_batch(batch)
+
+    def _encode_batch(self, batch):
+        """Encodes a batch of (text, future) items and resolves every future."""
+        texts = [text for text, _ in batch]
+        try:
+            vectors = self.encode_fn(texts)
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+        self._record(len(batch))
+
+    def _drain(self):
+        """Encodes anything still queued at shutdown, so no caller waits on a future that never resolves."""
+        leftover = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                leftover.append(item)
+        if leftover:
+            self._encode_batch(leftover)
+
+    def _record(self, size):
+        with self._stats_lock:
+            self.batches += 1
+            self.items += size
+            self.largest_batch = max(self.largest_batch, size)
+            bucket = 1 << (size - 1).bit_length()  # round up to a power of two
+            self.batch_size_histogram[bucket] = self.batch_size_histogram.get(bucket, 0) + 1
+
+    def close(self):
+        """Stops the background thread after already queued texts are encoded."""
+        with self._submit_lock:
+            if not self._closed:
+                self._closed = True
+                self._queue.put(None)
+
+    def stats(self):
+        """Returns queue depth and batch size metrics."""
+        with self._stats_lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "batches": self.batches,
+                "items": self.items,
+                "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+                "largest_batch": self.largest_batch,
+                "batch_size_histogram": dict(sorted(self.batch_size_histogram.items())),
+                "max_wait_ms": self.max_wait * 1000.0,
+                "max_batch_size": self.max_batch_size,
+            }
+
+
+_batchers = {}
+_batchers_lock = threading.Lock()
+
+
+def get_query_batcher(key, encode_fn):
+    """
+    Returns the shared micro-batcher for an embedding model key, or None when
+    query batching is disabled in config.yaml.
+
+    Args:
+        key (tuple): Embedding model registry key (provider, model_name, device).
+        encode_fn (callable): Batch encode function used when the batcher is created.
+    """
+    settings = load_config().get("query_batching", {})
+    if not settings.get("enabled", False):
+        return None
+
+    # Stop the batcher (and release its model reference) when the model is evicted.
+    # Registered outside _batchers_lock because eviction calls back in under the registry lock.
+    get_model_registry().add_eviction_listener(close_query_batcher)
+
+    with _batchers_lock:
+        if key not in _batchers:
+            _batchers[key] = EmbeddingMicroBatcher(
+                encode_fn,
+                max_wait_ms=settings.get("max_wait_ms", DEFAULT_MAX_WAIT_MS),
+                max_batch_size=settings.get("max_batch_size", DEFAULT_MAX_BATCH_SIZE),
+                name=f"embedding-batcher-{key[1]}",
+            )
+        return _batchers[key]
+
+
+def close_query_batcher(key):
+    """Stops and removes the batcher for a model key (called when the model is evicted)."""
+    with _batchers_lock:
+        batcher = _batchers.pop(key, None)
+    if batcher is not None:
+        batcher.close()
+
+
+def query_batcher_stats():
+    """Returns metrics for every active query batcher."""
+    with _batchers_lock:
+        return {f"{key[0]}/{key[1]}/{key[2]}": batcher.stats() for key, batcher in _batchers.items()}
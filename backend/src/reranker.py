@@ -0,0 +1,209 @@
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from config import load_config
+from model_registry import resolve_device
+
+DEFAULT_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+DEFAULT_CANDIDATES = 20
+DEFAULT_CACHE_SIZE = 10000
+DEFAULT_MAX_LENGTH = 512
+# Weight of the newest measurement in the per-pair latency estimate
+LATENCY_SMOOTHING = 0.2
+
+
+def pair_key(query, text):
+    """Returns a compact digest identifying a (query, chunk) pair."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(query.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(text.encode("utf-8"))
+    return digest.digest()
+
+
+class CrossEncoderReranker:
+    """
+    Reorders retrieved chunks by a cross-encoder's relevance score for the query.
+
+    All uncached (query, chunk) pairs of a request are scored in one padded batch.
+    Pair scores are kept in an LRU cache, so repeated questions and overlapping
+    candidate sets skip the model. A running estimate of the per-pair latency is used
+    to skip reranking when the model call would run past the request's deadline.
+    """
+
+    def __init__(self, model_name=DEFAULT_MODEL, device="cpu", max_length=DEFAULT_MAX_LENGTH,
+                 cache_size=DEFAULT_CACHE_SIZE, loader=None):
+        """
+        Args:
+            model_name (str): Hugging Face cross-encoder model.
+            device (str): Device to load the model on.
+            max_length (int): Token limit of each (query, chunk) pair.
+            cache_size (int): Pair scores kept in the LRU cache.
+            loader (callable, optional): Returns the model; defaults to sentence_transformers.CrossEncoder.
+        """
+        self.model_name = model_name
+        self.device = device
+        self.max_length = max_length
+        self.cache_size = cache_size
+        self._loader = loader
+        self._model = None
+        self._cache = OrderedDict()  # pair key -> score
+        self._lock = threading.Lock()
+        self._model_lock = threading.Lock()
+        self._seconds_per_pair = None
+        self.hits = 0
+        self.misses = 0
+        self.reranked = 0
+        self.skipped = 0
+
+    def _get_model(self):
+        with self._model_lock:
+            if self._model is None:
+                print(f"Loading reranker model {self.model_name} on {self.device}...")
+                if self._loader is not None:
+                    self._model = self._loader(self.model_name, self.device, self.max_length)
+                else:
+                    from sentence_transformers import CrossEncoder
+                    self._model = CrossEncoder(self.model_name, device=self.device, max_length=self.max_length)
+            return self._model
+
+    def estimate_seconds(self, pairs):
+        """Estimated model time for scoring `pairs` uncached pairs (0 before the first call)."""
+        return (self._seconds_per_pair or 0.0) * pairs
+
+    def score(self, query, texts):
+        """Returns the cross-encoder score of each (query, text) pair, using the cache where possible."""
+        keys = [pair_key(query, text) for text in texts]
+        scores = [None] * len(texts)
+        with self._lock:
+            for i, key in enumerate(keys):
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    scores[i] = self._cache[key]
+        missing = [i for i, score in enumerate(scores) if score is None]
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        if not missing:
+            return scores
+
+        model = self._get_model()
+        start = time.perf_counter()
+        # One padded batch for the whole candidate set
+        predicted = model.predict([(query, texts[i]) for i in missing], batch_size=len(missing),
+                                  show_progress_bar=False)
+        seconds_per_pair = (time.perf_counter() - start) / len(missing)
+        with self._lock:
+            if self._seconds_per_pair is None:
+                self._seconds_per_pair = seconds_per_pair
+            else:
+                self._seconds_per_pair += LATENCY_SMOOTHING * (seconds_per_pair - self._seconds_per_pair)
+            for i, value in zip(missing, predicted):
+                scores[i] = float(value)
+                self._cache[keys[i]] = scores[i]
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return scores
+
+    def rerank(self, query, results, top_k, deadline=None):
+        """
+        Reorders (text, score) results by cross-encoder score and keeps the top_k.
+
+        Args:
+            query (str): The user query.
+            results (list): (text, retrieval score) tuples, best first.
+            top_k (int): Results to keep.
+            deadline (float, optional): time.perf_counter() value by which reranking must finish.
+                When the estimated model time would overrun it, the retrieval order is kept.
+        Returns:
+            list: (text, score) tuples; scores are cross-encoder scores when reranked.
+        """
+        if not results:
+            return results
+        texts = [text for text, _ in results]
+        if deadline is not None:
+            with self._lock:
+                uncached = sum(1 for text in texts if pair_key(query, text) not in self._cache)
+            if uncached and time.perf_counter() + self.estimate_seconds(uncached) > deadline:
+                self.skipped += 1
+                print(f"Skipping reranking: {uncached} pairs would exceed the latency budget")
+                return results[:top_k]
+        scores = self.score(query, texts)
+        self.reranked += 1
+        order = sorted(range(len(texts)), key=lambda i: scores[i], reverse=True)[:top_k]
+        return [(texts[i], scores[i]) for i in order]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "model": self.model_name,
+            "cache_entries": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "reranked": self.reranked,
+            "skipped": self.skipped,
+            "ms_per_pair": (self._seconds_per_pair or 0.0) * 1000,
+        }
+
+
+_reranker = None
+_reranker_lock = threading.Lock()
+
+
+def get_reranking_settings():
+    """Returns the `reranking` section of config.yaml."""
+    return load_config().get("reranking", {})
+
+
+def get_reranker(device="cpu"):
+    """Returns the process-wide reranker configured in config.yaml (created on first use)."""
+    global _reranker
+    with _reranker_lock:
+        if _reranker is None:
+            settings = get_reranking_settings()
+            _reranker = CrossEncoderReranker(
+                model_name=settings.get("model", DEFAULT_MODEL),
+                device=device,
+                max_length=settings.get("max_length", DEFAULT_MAX_LENGTH),
+                cache_size=settings.get("cache_size", DEFAULT_CACHE_SIZE),
+            )
+        return _reranker
+
+
+def reranker_stats():
+    """Returns reranker metrics, or None when no reranker has been created."""
+    with _reranker_lock:
+        return _reranker.stats() if _reranker is not None else None
+
+
+def rerank_candidates(top_k, rerank=None):
+    """
+    Returns how many candidates to retrieve for a query: the configured `candidates`
+    when reranking is on (`rerank=None` follows config.yaml), top_k otherwise.
+    """
+    settings = get_reranking_settings()
+    enabled = settings.get("enabled", False) if rerank is None else rerank
+    return max(top_k, settings.get("candidates", DEFAULT_CANDIDATES)) if enabled else top_k
+
+
+def rerank_results(query, results, top_k, started=None, use_gpu=False):
+    """
+    Reranks retrieved (text, score) results with the configured cross-encoder.
+
+    Args:
+        query (str): The user query.
+        results (list): Retrieved candidates, best first.
+        top_k (int): Results to keep.
+        started (float, optional): time.perf_counter() at the start of the request; the
+            configured budget_ms is measured from it. No deadline when omitted.
+        use_gpu (bool): Load the cross-encoder on the GPU when one is available.
+    Returns:
+        list: The top_k results, reranked unless the budget ran out.
+    """
+    if not results or not (isinstance(results[0], tuple) and len(results[0]) == 2):
+        # Backends that return raw hits keep their order
+        return results[:top_k]
+    budget_ms = get_reranking_settings().get("budget_ms")
+    deadline = started + budget_ms / 1000 if started is not None and budget_ms else None
+    return get_reranker(resolve_device(use_gpu)).rerank(query, results, top_k, deadline=deadline)
@@ -0,0 +1,185 @@
+import os
+import re
+import numpy as np
+from chunk_store import _replace_with
+from index_cache import get_index_cache
+
+# Words, tickers and figures such as "10-k", "25,182" or "3.5" stay single tokens
+TOKEN_PATTERN = re.compile(r"\w+(?:[.,'\-]\w+)*")
+DEFAULT_K1 = 1.2
+DEFAULT_B = 0.75
+DEFAULT_RRF_K = 60
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def sparse_index_path(base_path):
+    return os.path.splitext(base_path)[0] + ".sparse.npz"
+
+
+class SparseIndex:
+    """
+    BM25 inverted index over the chunks of one vector index.
+
+    Postings are stored in CSR form: the postings of term t are rows[indptr[t]:indptr[t + 1]]
+    (int32 chunk rows) with their term frequencies in tfs (uint16). Chunk row r belongs to
+    the vector id ids[r], so results can be fused with dense search results directly.
+    A query is scored by gathering the postings of its terms and summing their BM25
+    contributions per row with a single bincount.
+    """
+
+    def __init__(self, vocabulary, indptr, rows, tfs, doc_lengths, ids, k1=DEFAULT_K1, b=DEFAULT_B):
+        self.vocabulary = vocabulary
+        self.term_ids = {term: i for i, term in enumerate(vocabulary)}
+        self.indptr = indptr
+        self.rows = rows
+        self.tfs = tfs
+        self.doc_lengths = doc_lengths
+        self.ids = ids
+        self.k1 = k1
+        self.b = b
+        self.avg_length = float(doc_lengths.mean()) if len(doc_lengths) else 0.0
+        document_frequency = np.diff(indptr).astype(np.float32)
+        count = len(ids)
+        self.idf = np.log1p((count - document_frequency + 0.5) / (document_frequency + 0.5)).astype(np.float32)
+        # Per-row BM25 length normalization, k1 * (1 - b + b * dl / avgdl)
+        self.norms = (k1 * (1 - b + b * doc_lengths / max(self.avg_length, 1e-9))).astype(np.float32)
+
+    @classmethod
+    def build(cls, batches, k1=DEFAULT_K1, b=DEFAULT_B):
+        """
+        Builds the index from (ids, texts) batches, e.g. ChunkStore.iter_texts().
+        """
+        term_ids = {}
+        token_terms, token_rows, doc_lengths, ids = [], [], [], []
+        row = 0
+        for batch_ids, texts in batches:
+            for vector_id, text in zip(batch_ids, texts):
+                terms = [term_ids.setdefault(token, len(term_ids)) for token in tokenize(text)]
+                token_terms.append(np.asarray(terms, dtype=np.int64))
+                token_rows.append(np.full(len(terms), row, dtype=np.int64))
+                doc_lengths.append(len(terms))
+                ids.append(int(vector_id))
+                row += 1
+
+        vocabulary = np.array(sorted(term_ids, key=term_ids.get), dtype=str)
+        terms = np.concatenate(token_terms) if token_terms else np.zeros(0, dtype=np.int64)
+        rows = np.concatenate(token_rows) if token_rows else np.zeros(0, dtype=np.int64)
+        # Sorting (term, row) pairs yields the postings of every term in row order
+        keys, tfs = np.unique(terms * max(row, 1) + rows, return_counts=True)
+        posting_terms, posting_rows = np.divmod(keys, max(row, 1))
+        indptr = np.concatenate([[0], np.cumsum(np.bincount(posting_terms, minlength=len(vocabulary)))])
+        return cls(vocabulary, indptr.astype(np.int64), posting_rows.astype(np.int32),
+                   np.minimum(tfs, np.iinfo(np.uint16).max).astype(np.uint16),
+                   np.asarray(doc_lengths, dtype=np.float32), np.asarray(ids, dtype=np.int64), k1=k1, b=b)
+
+    def merge(self, added=None, removed_ids=None):
+        """
+        Returns a new index with the chunks of `removed_ids` dropped and the chunks of the
+        `added` index appended after them. Postings are merged as arrays, so only the added
+        chunks were ever tokenized; removed ids only apply to this index's chunks.
+        """
+        keep = np.ones(len(self.ids), dtype=bool)
+        if removed_ids is not None and len(removed_ids):
+            keep = ~np.isin(self.ids, removed_ids)
+        # New row numbers of the kept chunks (-1 for removed ones)
+        new_rows = np.where(keep, np.cumsum(keep) - 1, -1)
+        terms = np.repeat(np.arange(len(self.vocabulary), dtype=np.int64), np.diff(self.indptr))
+        rows = new_rows[self.rows]
+        kept_postings = rows >= 0
+        terms, rows, tfs = terms[kept_postings], rows[kept_postings], self.tfs[kept_postings]
+        vocabulary, doc_lengths, ids = self.vocabulary, self.doc_lengths[keep], self.ids[keep]
+
+        if added is not None and len(added.ids):
+            new_terms = [term for term in added.vocabulary if term not in self.term_ids]
+            term_map = np.array([self.term_ids.get(term, -1) for term in added.vocabulary], dtype=np.int64)
+            term_map[term_map < 0] = np.arange(len(self.vocabulary), len(self.vocabulary) + len(new_terms))
+            vocabulary = np.concatenate([self.vocabulary, np.array(new_terms, dtype=str)])
+            added_terms = np.repeat(term_map, np.diff(added.indptr))
+            terms = np.concatenate([terms, added_terms])
+            rows = np.concatenate([rows, added.rows.astype(np.int64) + len(ids)])
+            tfs = np.concatenate([tfs, added.tfs])
+            doc_lengths = np.concatenate([doc_lengths, added.doc_lengths])
+            ids = np.concatenate([ids, added.ids])
+
+        # A stable sort by term keeps every term's postings in row order
+        order = np.argsort(terms, kind="stable")
+        indptr = np.concatenate([[0], np.cumsum(np.bincount(terms, minlength=len(vocabulary)))])
+        return SparseIndex(vocabulary, indptr.astype(np.int64), rows[order].astype(np.int32), tfs[order],
+                           doc_lengths, ids, k1=self.k1, b=self.b)
+
+    def search(self, query, top_k=5, allowed_ids=None):
+        """
+        Returns (ids, scores) of the top_k chunks by BM25 score, best first.
+        `allowed_ids` restricts the results to those chunk ids.
+        """
+        terms = {self.term_ids[token] for token in tokenize(query) if token in self.term_ids}
+        if not terms or not len(self.ids):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        slices = [slice(self.indptr[t], self.indptr[t + 1]) for t in terms]
+        rows = np.concatenate([self.rows[s] for s in slices])
+        tfs = np.concatenate([self.tfs[s] for s in slices]).astype(np.float32)
+        idf = np.concatenate([np.full(s.stop - s.start, self.idf[t], dtype=np.float32) for t, s in zip(terms, slices)])
+        contributions = idf * tfs * (self.k1 + 1) / (tfs + self.norms[rows])
+        scores = np.bincount(rows, weights=contributions, minlength=len(self.ids))
+        if allowed_ids is not None:
+            scores[~np.isin(self.ids, allowed_ids)] = 0
+
+        matched = np.flatnonzero(scores)
+        if len(matched) > top_k:
+            matched = matched[np.argpartition(-scores[matched], top_k - 1)[:top_k]]
+        order = matched[np.argsort(-scores[matched], kind="stable")]
+        return self.ids[order], scores[order].astype(np.float32)
+
+    def save(self, base_path):
+        path = sparse_index_path(base_path)
+        _replace_with(path, lambda f: np.savez(
+            f, vocabulary=self.vocabulary, indptr=self.indptr, rows=self.rows, tfs=self.tfs,
+            doc_lengths=self.doc_lengths, ids=self.ids, params=np.array([self.k1, self.b], dtype=np.float64),
+        ))
+
+    @classmethod
+    def load(cls, base_path):
+        with np.load(sparse_index_path(base_path), allow_pickle=False) as data:
+            k1, b = data["params"]
+            return cls(data["vocabulary"], data["indptr"], data["rows"], data["tfs"], data["doc_lengths"],
+                       data["ids"], k1=float(k1), b=float(b))
+
+    @classmethod
+    def exists(cls, base_path):
+        return os.path.exists(sparse_index_path(base_path))
+
+    def memory_bytes(self):
+        return sum(array.nbytes for array in (self.indptr, self.rows, self.tfs, self.doc_lengths, self.ids,
+                                              self.idf, self.norms, self.vocabulary))
+
+
+def load_sparse_index(base_path, paths, build):
+    """
+    Returns the sparse index of a vector index through the shared index cache.
+    `paths` are the files whose change invalidates it; indexes saved without a sparse
+    index are built in memory with `build()`.
+    """
+    def loader():
+        if SparseIndex.exists(base_path):
+            return SparseIndex.load(base_path)
+        print(f"No sparse index saved for {base_path}; building it in memory.")
+        return build()
+
+    return get_index_cache().get(("sparse", base_path), [sparse_index_path(base_path)] + list(paths), loader)
+
+
+def reciprocal_rank_fusion(rankings, top_k=5, k=DEFAULT_RRF_K):
+    """
+    Fuses ranked id lists with reciprocal rank fusion: score(id) = sum of 1 / (k + rank).
+    Returns (ids, scores) of the top_k fused ids, best first.
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, vector_id in enumerate(ranking, start=1):
+            vector_id = int(vector_id)
+            scores[vector_id] = scores.get(vector_id, 0.0) + 1.0 / (k + rank)
+    fused = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+    return [vector_id for vector_id, _ in fused], [score for _, score in fused]
@@ -20,3 +20,21 @@ def pad_embedding(embedding, target_dim):
 def extract_name_from_path(db_path):
     """Extract the collection or index name from the database path."""
     return os.path.splitext(os.path.basename(db_path))[0]
+
+def load_chunks_from_file(file_path):
+    """
+    Load text chunks from a file written by `pdf_extractor.save_chunks_to_file`
+    ("Chunk N:" headers separated by blank lines).
+    """
+    chunks, current = [], []
+    with open(file_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("Chunk ") and line.rstrip().endswith(":"):
+                if current:
+                    chunks.append("\n".join(current).strip())
+                current = []
+            else:
+                current.append(line.rstrip("\n"))
+    if current:
+        chunks.append("\n".join(current).strip())
+    return [chunk for chunk in chunks if chunk]
@@ -0,0 +1,195 @@
+import os
+import glob
+import json
+import numpy as np
+from chunk_store import _replace_with, COMPACTION_RATIO
+
+STORE_VERSION = 1
+
+
+def vector_store_paths(base_path):
+    """Returns the files that identify the current version of the vector store of an index path."""
+    base = os.path.splitext(base_path)[0]
+    return {"meta": base + ".vectors.json"}
+
+
+class VectorStore:
+    """
+    Full-precision float32 copies of the vectors of a quantized index, keyed by vector id.
+
+    Rows live in one raw float32 file that is opened as a read-only memory map, so
+    rescoring a handful of candidates per query reads only their pages from disk and
+    the vectors never count against resident memory. Like the ChunkStore, new rows are
+    buffered and appended on save, removed rows become tombstones (id -1) until the
+    file is compacted, and each save is committed by atomically replacing the
+    metadata file.
+    """
+
+    def __init__(self, dimension):
+        self.dimension = dimension
+        self._vectors = np.zeros((0, dimension), dtype=np.float32)
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._meta = None
+        self._base_path = None
+        self._pending_ids = []
+        self._pending_vectors = []
+        self._removed = set()
+        self._sorter = None
+
+    @classmethod
+    def open(cls, base_path):
+        """Memory-maps a saved store. Raises FileNotFoundError when it does not exist."""
+        meta_path = vector_store_paths(base_path)["meta"]
+        with open(meta_path) as f:
+            meta = json.load(f)
+        directory = os.path.dirname(meta_path)
+        store = cls(meta["dimension"])
+        store._meta = meta
+        store._base_path = os.path.abspath(base_path)
+        if meta["count"]:
+            # Rows past count belong to an uncommitted append and are ignored
+            store._vectors = np.memmap(os.path.join(directory, meta["vectors"]), dtype=np.float32, mode="r",
+                                       shape=(meta["count"], meta["dimension"]))
+            store._ids = np.load(os.path.join(directory, meta["ids"]), mmap_mode="r")
+        return store
+
+    @classmethod
+    def exists(cls, base_path):
+        return os.path.exists(vector_store_paths(base_path)["meta"])
+
+    @classmethod
+    def from_arrays(cls, ids, vectors):
+        store = cls(vectors.shape[1])
+        store.append(ids, vectors)
+        return store
+
+    def __len__(self):
+        dead = int(np.count_nonzero(np.asarray(self._ids) < 0)) if len(self._ids) else 0
+        return len(self._ids) - dead - len(self._removed) + len(self._pending_ids)
+
+    def _rows(self, ids):
+        """Maps vector ids to rows of the saved arrays (-1 when absent or removed)."""
+        ids = np.asarray(ids, dtype=np.int64)
+        count = len(self._ids)
+        if count == 0:
+            return np.full(len(ids), -1, dtype=np.int64)
+        if self._sorter is None:
+            self._sorter = np.argsort(self._ids, kind="stable")
+        positions = np.minimum(np.searchsorted(self._ids, ids, sorter=self._sorter), count - 1)
+        rows = self._sorter[positions]
+        rows[(self._ids[rows] != ids) | (ids < 0)] = -1
+        if self._removed:
+            rows[np.isin(ids, list(self._removed))] = -1
+        return rows
+
+    def get_many(self, ids):
+        """
+        Returns (vectors, found) for the given ids. Rows of unknown ids are zero and
+        marked False in `found`. Only the requested rows are read from the memory map.
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        vectors = np.zeros((len(ids), self.dimension), dtype=np.float32)
+        rows = self._rows(ids)
+        found = rows >= 0
+        if found.any():
+            vectors[found] = self._vectors[rows[found]]
+        if self._pending_ids:
+            pending = {vector_id: k for k, vector_id in enumerate(self._pending_ids)}
+            for i in np.flatnonzero(~found):
+                k = pending.get(int(ids[i]))
+                if k is not None:
+                    vectors[i] = self._pending_vectors[k]
+                    found[i] = True
+        return vectors, found
+
+    def append(self, ids, vectors):
+        """Buffers vectors for the given ids. They are written to disk by `save`."""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dimension)
+        if len(ids) != len(vectors):
+            raise ValueError(f"Got {len(ids)} ids for {len(vectors)} vectors.")
+        self._pending_ids.extend(int(vector_id) for vector_id in ids)
+        self._pending_vectors.extend(vectors)
+
+    def remove(self, ids):
+        """Removes vectors by id."""
+        ids = set(int(vector_id) for vector_id in ids)
+        if self._pending_ids:
+            keep = [k for k, vector_id in enumerate(self._pending_ids) if vector_id not in ids]
+            self._pending_ids = [self._pending_ids[k] for k in keep]
+            self._pending_vectors = [self._pending_vectors[k] for k in keep]
+        rows = self._rows(sorted(ids))
+        self._removed |= set(int(self._ids[row]) for row in rows if row >= 0)
+
+    def save(self, base_path):
+        """
+        Writes the store next to `base_path`, appending buffered rows to the current
+        vector file. The file is rewritten only when saving elsewhere or when more than
+        half of its rows have been removed.
+        """
+        base = os.path.splitext(base_path)[0]
+        directory = os.path.dirname(os.path.abspath(base_path))
+        prefix = os.path.basename(base)
+        meta = self._meta if self._base_path == os.path.abspath(base_path) else None
+        generation = (meta["generation"] + 1) if meta else 1
+
+        ids = np.array(self._ids, dtype=np.int64)
+        if self._removed:
+            ids[np.isin(ids, list(self._removed))] = -1
+        dead = ids < 0
+        pending = np.asarray(self._pending_vectors, dtype=np.float32).reshape(-1, self.dimension)
+
+        if meta is None or dead.sum() > COMPACTION_RATIO * max(len(ids), 1):
+            vectors_name = f"{prefix}.vectors.{generation}.bin"
+            live = np.flatnonzero(~dead)
+
+            def write_vectors(f):
+                for start in range(0, len(live), 4096):
+                    f.write(np.ascontiguousarray(self._vectors[live[start:start + 4096]]).tobytes())
+                f.write(pending.tobytes())
+
+            _replace_with(os.path.join(directory, vectors_name), write_vectors)
+            ids = ids[live]
+        else:
+            vectors_name = meta["vectors"]
+            path = os.path.join(directory, vectors_name)
+            with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+                committed = meta["count"] * self.dimension * 4
+                f.truncate(committed)
+                f.seek(committed)
+                f.write(pending.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+        ids = np.concatenate([ids, np.asarray(self._pending_ids, dtype=np.int64)])
+        ids_name = f"{prefix}.vectors.{generation}.ids.npy"
+        _replace_with(os.path.join(directory, ids_name), lambda f: np.save(f, ids))
+        new_meta = {
+            "version": STORE_VERSION,
+            "generation": generation,
+            "count": int(len(ids)),
+            "dimension": self.dimension,
+            "vectors": vectors_name,
+            "ids": ids_name,
+        }
+        _replace_with(vector_store_paths(base_path)["meta"], lambda f: f.write(json.dumps(new_meta).encode("utf-8")))
+        current = {vectors_name, ids_name, prefix + ".vectors.json"}
+        for path in glob.glob(os.path.join(glob.escape(directory), glob.escape(prefix) + ".vectors.*")):
+            if os.path.basename(path) not in current and not path.endswith(".tmp"):
+                os.remove(path)
+
+        saved = VectorStore.open(base_path)
+        self._vectors, self._ids = saved._vectors, saved._ids
+        self._meta, self._base_path = saved._meta, saved._base_path
+        self._pending_ids, self._pending_vectors = [], []
+        self._removed = set()
+        self._sorter = None
+
+    @staticmethod
+    def delete(base_path):
+        """Removes a saved store, e.g. once its index no longer needs rescoring."""
+        base = os.path.splitext(base_path)[0]
+        for path in glob.glob(glob.escape(base) + ".vectors.*"):
+            os.remove(path)
+
+    def memory_bytes(self):
+        return len(self._pending_vectors) * self.dimension * 4
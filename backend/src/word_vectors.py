@@ -0,0 +1,143 @@
+import re
+import threading
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"\w+(?:[-']\w+)*|[^\w\s]")
+DEFAULT_SIF_A = 1e-3
+DEFAULT_BATCH_SIZE = 256
+
+
+class WordVectorEncoder:
+    """
+    Sentence embeddings from static word vectors (GloVe, fastText) loaded as Gensim KeyedVectors.
+
+    Each chunk is tokenized with a compiled regex and its tokens are mapped to rows of the
+    vector matrix through the precomputed vocab index. A whole batch of chunks is then pooled
+    with a single NumPy gather and a segmented sum, either as a plain mean or with SIF weights
+    a / (a + p(w)). For fastText models with subword n-grams, out-of-vocabulary words fall back
+    to their n-gram vectors.
+    """
+
+    def __init__(self, keyed_vectors, pooling="mean", lowercase=True, subword_fallback=False,
+                 sif_a=DEFAULT_SIF_A, batch_size=DEFAULT_BATCH_SIZE):
+        """
+        Args:
+            keyed_vectors: Gensim KeyedVectors (or FastTextKeyedVectors).
+            pooling (str): "mean" or "sif".
+            lowercase (bool): Lowercase tokens before lookup (GloVe vocabularies are lowercase).
+            subword_fallback (bool): Build vectors for OOV words from fastText character n-grams.
+            sif_a (float): SIF smoothing parameter.
+            batch_size (int): Chunks pooled per gather.
+        """
+        if pooling not in ("mean", "sif"):
+            raise ValueError(f"Unsupported pooling: {pooling}")
+        self.keyed_vectors = keyed_vectors
+        self.vectors = np.ascontiguousarray(keyed_vectors.vectors, dtype="float32")
+        self.vocab = keyed_vectors.key_to_index
+        self.dimension = self.vectors.shape[1]
+        self.pooling = pooling
+        self.lowercase = lowercase
+        self.batch_size = batch_size
+        self.subword_fallback = subword_fallback and getattr(keyed_vectors, "vectors_ngrams", None) is not None
+        self.weights = self._sif_weights(sif_a) if pooling == "sif" else None
+        self._oov_index = {}  # word -> position in _oov_vectors
+        self._oov_vectors = []
+        self._oov_lock = threading.Lock()
+
+    def _sif_weights(self, a):
+        """
+        Precomputes a / (a + p(w)) for every vocab row. Uses stored word counts when the model
+        has them; otherwise estimates p(w) from the frequency-sorted rank with Zipf's law.
+        """
+        size = len(self.vectors)
+        counts = None
+        try:
+            counts = np.array([self.keyed_vectors.get_vecattr(i, "count") for i in range(size)], dtype="float64")
+        except (KeyError, AttributeError):
+            pass
+        if counts is None or not counts.any() or len(np.unique(counts)) == 1:
+            counts = 1.0 / np.arange(1, size + 1, dtype="float64")
+        probabilities = counts / counts.sum()
+        return (a / (a + probabilities)).astype("float32")
+
+    def tokenize(self, text):
+        if self.lowercase:
+            text = text.lower()
+        return TOKEN_PATTERN.findall(text)
+
+    def _token_ids(self, tokens):
+        """Maps tokens to vocab rows; OOV tokens become -1 unless a subword vector can be built."""
+        get = self.vocab.get
+        ids = [get(token, -1) for token in tokens]
+        if self.subword_fallback:
+            for i, row in enumerate(ids):
+                if row == -1:
+                    ids[i] = self._oov_row(tokens[i])
+        return ids
+
+    def _oov_row(self, word):
+        """Returns a sentinel id (< -1) identifying the memoized subword vector of an OOV word."""
+        with self._oov_lock:
+            if word not in self._oov_index:
+                try:
+                    vector = self.keyed_vectors.get_vector(word)
+                except KeyError:
+                    return -1
+                self._oov_index[word] = len(self._oov_vectors)
+                self._oov_vectors.append(np.asarray(vector, dtype="float32"))
+            return -2 - self._oov_index[word]
+
+    def _pool(self, texts):
+        token_ids = [self._token_ids(self.tokenize(text)) for text in texts]
+        lengths = np.fromiter((len(ids) for ids in token_ids), dtype=np.int64, count=len(texts))
+        flat = np.fromiter((i for ids in token_ids for i in ids), dtype=np.int64, count=int(lengths.sum()))
+        segments = np.repeat(np.arange(len(texts)), lengths)
+
+        # Drop OOV tokens that have no vector at all
+        keep = flat != -1
+        flat, segments = flat[keep], segments[keep]
+        output = np.zeros((len(texts), self.dimension), dtype="float32")
+        if not len(flat):
+            return output
+
+        # Single gather over the batch; subword rows are patched in afterwards
+        rows = self.vectors[np.maximum(flat, 0)]
+        subword = flat < -1
+        if subword.any():
+            rows[subword] = np.stack([self._oov_vectors[k] for k in -2 - flat[subword]])
+
+        if self.weights is not None:
+            weights = np.where(flat >= 0, self.weights[np.maximum(flat, 0)], self.weights.min())
+            rows *= weights[:, None]
+        else:
+            weights = np.ones(len(flat), dtype="float32")
+
+        counts = np.bincount(segments, minlength=len(texts))
+        nonempty = np.flatnonzero(counts)
+        starts = np.concatenate(([0], np.cumsum(counts[nonempty])[:-1]))
+        output[nonempty] = np.add.reduceat(rows, starts, axis=0)
+        totals = np.bincount(segments, weights=weights, minlength=len(texts))
+        output[nonempty] /= totals[nonempty, None]
+        return output
+
+    def encode(self, texts, batch_size=None):
+        """
+        Encodes a list of texts into a (len(texts), dimension) float32 array.
+        Chunks with no known tokens map to zero vectors.
+        """
+        if isinstance(texts, str):
+            texts = [texts]
+        batch_size = batch_size or self.batch_size
+        if not texts:
+            return np.zeros((0, self.dimension), dtype="float32")
+        return np.vstack([self._pool(texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)])
+
+    def __call__(self, text):
+        return self.encode([text])[0]
+
+    def memory_bytes(self):
+        nbytes = self.vectors.nbytes
+        ngrams = getattr(self.keyed_vectors, "vectors_ngrams", None)
+        if ngrams is not None:
+            nbytes += ngrams.nbytes
+        return nbytes
@@ -9,6 +9,13 @@ if [ "$SERVER" == "flask" ]; then
     echo "Running Flask backend (RAG.py)..."
     exec /opt/conda/envs/rag_env/bin/python backend/src/RAG.py
 elif [ "$SERVER" == "fastapi" ]; then
+    WORKERS=${RAG_WORKERS:-1}
+    if [ "$WORKERS" -gt 1 ]; then
+        # --preload imports the app (and preloads indexes) once before forking the workers
+        echo "Running FastAPI backend (RAG_fastapi.py) with $WORKERS gunicorn workers..."
+        exec /opt/conda/envs/rag_env/bin/gunicorn RAG_fastapi:app --chdir backend/src --preload \
+            -w "$WORKERS" -k uvicorn.workers.UvicornWorker -b 0.0.0.0:5000
+    fi
     echo "Running FastAPI backend (RAG_fastapi.py)..."
     exec /opt/conda/envs/rag_env/bin/python backend/src/RAG_fastapi.py
 else
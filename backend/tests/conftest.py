@@ -0,0 +1,52 @@
+import os
+import sys
+import importlib.util
+import types
+
+import numpy as np
+import pytest
+
+# Backend modules import each other as top-level modules, the same way the apps run from src/
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC_DIR)
+
+
+@pytest.fixture(scope="session")
+def faiss_adapter():
+    """
+    The adapters.faiss_adapter module. The adapters package imports every backend client
+    (pymilvus, pinecone, ...), so when those are missing the module is loaded on its own.
+    """
+    pytest.importorskip("faiss")
+    try:
+        from adapters import faiss_adapter
+        return faiss_adapter
+    except ImportError:
+        pass
+    package = types.ModuleType("adapters")
+    package.__path__ = [os.path.join(SRC_DIR, "adapters")]
+    sys.modules["adapters"] = package
+    spec = importlib.util.spec_from_file_location("adapters.faiss_adapter",
+                                                  os.path.join(SRC_DIR, "adapters", "faiss_adapter.py"))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["adapters.faiss_adapter"] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(0)
+
+
+@pytest.fixture
+def config(monkeypatch):
+    """
+    Replaces config.yaml for the modules under test. Tests fill the returned dict with
+    the sections they need; modules read it through their `load_config` import.
+    """
+    settings = {"vector_databases": {}}
+    for module in ("answer_cache", "mmr", "query_batcher", "index_cache"):
+        if module in sys.modules:
+            monkeypatch.setattr(sys.modules[module], "load_config", lambda: settings)
+    return settings
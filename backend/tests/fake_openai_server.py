@@ -0,0 +1,81 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeOpenAIServer:
+    """
+    Local stand-in for the OpenAI `/v1/embeddings` endpoint.
+
+    Each input of the form "text-<n>" is embedded as [n, len(text)], so callers can
+    check which vector belongs to which input. Requests that arrive first are held
+    the longest, so concurrent batches complete out of order, and each response
+    lists its items in reverse index order like a server free to reorder them.
+    The server records the inputs of every request and the peak number of
+    requests in flight.
+    """
+
+    def __init__(self, delay=0.2):
+        self.delay = delay
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/v1"
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if self.path != "/v1/embeddings":
+                    self.send_error(404)
+                    return
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                inputs = body["input"]
+                with server._lock:
+                    arrival = len(server.requests)
+                    server.requests.append(inputs)
+                    server.in_flight += 1
+                    server.max_in_flight = max(server.max_in_flight, server.in_flight)
+                try:
+                    time.sleep(server.delay / (arrival + 1))
+                finally:
+                    with server._lock:
+                        server.in_flight -= 1
+
+                data = [
+                    {"object": "embedding", "index": i, "embedding": [float(text.split("-")[-1]), float(len(text))]}
+                    for i, text in enumerate(inputs)
+                ]
+                payload = json.dumps({
+                    "object": "list",
+                    "data": data[::-1],
+                    "model": body["model"],
+                    "usage": {"prompt_tokens": 0, "total_tokens": 0},
+                }).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
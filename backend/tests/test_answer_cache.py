@@ -0,0 +1,103 @@
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+
+pytest.importorskip("faiss")
+
+import answer_cache
+from answer_cache import SemanticAnswerCache, get_answer_cache, invalidate_answer_cache, answer_cache_stats
+
+QUERY = np.array([1.0, 0.0, 0.0, 0.0], dtype=np.float32)
+PARAPHRASE = np.array([0.99, 0.1, 0.0, 0.0], dtype=np.float32)  # cosine ~0.995
+OTHER = np.array([0.0, 1.0, 0.0, 0.0], dtype=np.float32)
+
+
+@pytest.fixture
+def index_file(tmp_path):
+    path = tmp_path / "doc.index"
+    path.write_bytes(b"v1")
+    return path
+
+
+@pytest.fixture
+def scopes(monkeypatch):
+    monkeypatch.setattr(answer_cache, "_caches", OrderedDict())
+    monkeypatch.setattr(answer_cache, "_scope_evictions", 0)
+
+
+def test_similar_queries_hit_and_others_miss(index_file):
+    cache = SemanticAnswerCache(4, [str(index_file)], threshold=0.95)
+    _, signature = cache.lookup(QUERY)
+    cache.store("What was revenue?", QUERY, "25.2B", signature)
+
+    assert cache.lookup(PARAPHRASE)[0] == "25.2B"
+    assert cache.lookup(OTHER)[0] is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+
+def test_answers_expire_after_the_ttl(index_file, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(answer_cache.time, "time", lambda: now[0])
+    cache = SemanticAnswerCache(4, [str(index_file)], ttl_seconds=60)
+    cache.store("q", QUERY, "answer", cache.lookup(QUERY)[1])
+
+    now[0] += 59
+    assert cache.lookup(QUERY)[0] == "answer"
+    now[0] += 2
+    assert cache.lookup(QUERY)[0] is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_rewritten_index_clears_the_cache_and_drops_stale_answers(index_file):
+    cache = SemanticAnswerCache(4, [str(index_file)])
+    cache.store("q", QUERY, "old", cache.lookup(QUERY)[1])
+    _, signature = cache.lookup(OTHER)
+
+    index_file.write_bytes(b"version 2")
+    # An answer computed before the rewrite is not stored
+    cache.store("q2", OTHER, "stale", signature)
+
+    assert cache.lookup(QUERY)[0] is None
+    assert cache.lookup(OTHER)[0] is None
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_least_recently_used_entries_are_evicted(index_file):
+    cache = SemanticAnswerCache(4, [str(index_file)], max_entries=2)
+    for vector, answer in ((QUERY, "first"), (OTHER, "second")):
+        cache.store(answer, vector, answer, cache.lookup(vector)[1])
+    cache.lookup(QUERY)  # "first" becomes the most recently used
+    third = np.array([0.0, 0.0, 1.0, 0.0], dtype=np.float32)
+    cache.store("third", third, "third", cache.lookup(third)[1])
+
+    assert cache.lookup(QUERY)[0] == "first"
+    assert cache.lookup(OTHER)[0] is None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_scopes_follow_config_and_are_bounded(config, scopes, index_file):
+    config["answer_cache"] = {"enabled": False, "max_scopes": 2}
+    db_path = str(index_file)
+    assert get_answer_cache(db_path, "m", "p", 4) is None
+
+    config["answer_cache"]["enabled"] = True
+    cache = get_answer_cache(db_path, "m", "p", 4, options={"top_k": 5})
+    assert get_answer_cache(db_path, "m", "p", 4, options={"top_k": 5}) is cache
+    assert get_answer_cache(db_path, "m", "p", 4, options={"top_k": 10}) is not cache
+    get_answer_cache(db_path, "other-model", "p", 4)
+
+    stats = answer_cache_stats()
+    assert len(stats["scopes"]) == 2 and stats["scope_evictions"] == 1
+    assert get_answer_cache(db_path, "m", "p", 4, options={"top_k": 5}) is not cache
+
+
+def test_invalidation_clears_every_scope_of_an_index(config, scopes, index_file):
+    config["answer_cache"] = {"enabled": True}
+    caches = [get_answer_cache(str(index_file), model, "p", 4) for model in ("m1", "m2")]
+    for cache in caches:
+        cache.store("q", QUERY, "answer", cache.lookup(QUERY)[1])
+
+    invalidate_answer_cache(str(index_file))
+
+    assert [cache.lookup(QUERY)[0] for cache in caches] == [None, None]
@@ -0,0 +1,83 @@
+import json
+import os
+
+import numpy as np
+
+from chunk_store import ChunkStore, chunk_ids, document_key, document_keys_of, SEQUENCE_BITS
+
+
+def read_meta(base_path):
+    with open(os.path.splitext(base_path)[0] + ".chunks.json") as f:
+        return json.load(f)
+
+
+def test_chunk_ids_carry_their_document_key():
+    key = document_key("report.pdf")
+    ids = chunk_ids(key, 5, 3)
+
+    assert key != 0 and key == document_key("report.pdf")
+    assert (ids & ((1 << SEQUENCE_BITS) - 1)).tolist() == [5, 6, 7]
+    assert document_keys_of(ids).tolist() == [key] * 3
+    assert (ids > 0).all()
+
+
+def test_saves_append_generations_and_tombstone_removals(tmp_path):
+    base_path = str(tmp_path / "doc.index")
+    store = ChunkStore()
+    store.append([10, 11, 12, 13], ["alpha", "beta", "gamma", "delta"])
+    store.save(base_path)
+    first = read_meta(base_path)
+
+    store.append([14], ["epsilon"])
+    assert store.remove([11]) == 1
+    store.save(base_path)
+    second = read_meta(base_path)
+
+    # The blob is appended to, while the offsets and ids arrays get a new generation
+    assert second["generation"] == first["generation"] + 1
+    assert second["blob"] == first["blob"]
+    assert second["dead_bytes"] == len("beta")
+    assert not os.path.exists(tmp_path / first["ids"])
+
+    reopened = ChunkStore.open(base_path)
+    assert reopened.ids().tolist() == [10, 12, 13, 14]
+    assert reopened.get_many([11, 14, 99]) == [None, "epsilon", None]
+    assert [text for _, texts in reopened.iter_texts(batch_size=2) for text in texts] == \
+        ["alpha", "gamma", "delta", "epsilon"]
+    assert len(reopened) == 4
+
+
+def test_blob_is_compacted_once_mostly_removed(tmp_path):
+    base_path = str(tmp_path / "doc.index")
+    store = ChunkStore()
+    store.append([1, 2, 3, 4], ["a" * 10, "b" * 10, "c" * 10, "d" * 10])
+    store.save(base_path)
+    first = read_meta(base_path)
+
+    store.remove([1, 2, 3])
+    store.save(base_path)
+    compacted = read_meta(base_path)
+
+    assert compacted["blob"] != first["blob"]
+    assert compacted["dead_bytes"] == 0
+    assert compacted["count"] == 1
+    assert not os.path.exists(tmp_path / first["blob"])
+    assert ChunkStore.open(base_path).get_many([4, 1]) == ["d" * 10, None]
+
+
+def test_removed_ids_can_be_added_again(tmp_path):
+    base_path = str(tmp_path / "doc.index")
+    ids = chunk_ids(document_key("report.pdf"), 0, 3)
+    store = ChunkStore()
+    store.append(ids, ["old 0", "old 1", "old 2"])
+    store.save(base_path)
+
+    # Re-ingesting a document removes its chunks and appends new ones under the same ids
+    store.remove(ids)
+    store.append(ids[:2], ["new 0", "new 1"])
+    assert store.get_many(ids) == ["new 0", "new 1", None]
+    store.save(base_path)
+
+    reopened = ChunkStore.open(base_path)
+    assert reopened.get_many(ids) == ["new 0", "new 1", None]
+    assert np.array_equal(reopened.ids(), ids[:2])
@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+
+from chunk_metadata import chunk_metadata
+from chunk_store import document_key, document_keys_of, SEQUENCE_MASK
+
+DIMENSION = 8
+
+
+def add_document(db, doc_id, vectors, pages=None):
+    pages = pages or [1] * len(vectors)
+    texts = [f"{doc_id} chunk {i}" for i in range(len(vectors))]
+    return db.add_embeddings(vectors, texts, doc_id=doc_id,
+                             metadata=[chunk_metadata(doc_id, page, "text") for page in pages])
+
+
+@pytest.fixture
+def db(faiss_adapter):
+    return faiss_adapter.FAISSVectorDB(use_gpu=False, dimension=DIMENSION)
+
+
+def test_documents_are_deleted_and_re_added_under_the_same_ids(db, rng, tmp_path):
+    path = str(tmp_path / "corpus.index")
+    first = add_document(db, "a.pdf", rng.random((3, DIMENSION), dtype=np.float32))
+    second = add_document(db, "b.pdf", rng.random((2, DIMENSION), dtype=np.float32))
+    db.save_index(path)
+
+    assert document_keys_of(first).tolist() == [document_key("a.pdf")] * 3
+    assert (second & SEQUENCE_MASK).tolist() == [0, 1]
+
+    assert db.delete_document("a.pdf") == 3
+    again = add_document(db, "a.pdf", rng.random((2, DIMENSION), dtype=np.float32))
+    assert again.tolist() == first[:2].tolist()
+    db.save_index(path)
+
+    db.load_index(path, use_cache=False)
+    assert db.index.ntotal == 4
+    assert db.chunks.get_many(first) == ["a.pdf chunk 0", "a.pdf chunk 1", None]
+    assert db.delete_document("missing.pdf") == 0
+
+
+def test_search_returns_the_closest_chunks(db, rng):
+    vectors = rng.random((5, DIMENSION), dtype=np.float32)
+    ids = add_document(db, "a.pdf", vectors)
+
+    results = db.search_batch(vectors[[3, 1]], top_k=2, include_vectors=True)
+
+    assert [hit["id"] for hit in (results[0][0], results[1][0])] == [ids[3], ids[1]]
+    assert results[0][0]["text"] == "a.pdf chunk 3"
+    assert results[0][0]["score"] == pytest.approx(0.0, abs=1e-5)
+    assert np.allclose(results[1][0]["vector"], vectors[1])
+    assert db.search(vectors[2], top_k=1)[0][0] == "a.pdf chunk 2"
+
+
+def test_filtered_search_only_visits_matching_chunks(db, rng):
+    vectors = rng.random((6, DIMENSION), dtype=np.float32)
+    add_document(db, "a.pdf", vectors[:4], pages=[1, 2, 3, 4])
+    add_document(db, "b.pdf", vectors[4:], pages=[1, 2])
+
+    by_document = db.search_batch(vectors[:1], top_k=6, filters={"doc_id": "b.pdf"})[0]
+    by_page = db.search_batch(vectors[:1], top_k=6, filters={"doc_id": "a.pdf", "page": {"gte": 3}})[0]
+
+    assert sorted(hit["text"] for hit in by_document) == ["b.pdf chunk 0", "b.pdf chunk 1"]
+    assert sorted(hit["text"] for hit in by_page) == ["a.pdf chunk 2", "a.pdf chunk 3"]
+    assert db.search_batch(vectors[:1], top_k=3, filters={"chunk_type": "table"}) == [[]]
+
+
+def test_hnsw_deletes_rebuild_the_index(faiss_adapter, rng, tmp_path):
+    db = faiss_adapter.FAISSVectorDB(use_gpu=False, dimension=DIMENSION, index_spec="HNSW8")
+    vectors = rng.random((20, DIMENSION), dtype=np.float32)
+    add_document(db, "a.pdf", vectors[:10])
+    add_document(db, "b.pdf", vectors[10:])
+    db.save_index(str(tmp_path / "hnsw.index"))
+
+    assert db.delete_document("a.pdf") == 10
+    assert db.index.ntotal == 10
+    assert db.search(vectors[12], top_k=1)[0][0] == "b.pdf chunk 2"
+
+
+def test_summary_bounds_every_vector_after_appends_and_deletes(faiss_adapter, db, rng, tmp_path):
+    from federated_search import distance_lower_bound
+
+    path = str(tmp_path / "corpus.index")
+    add_document(db, "a.pdf", rng.normal(0, 1, (50, DIMENSION)).astype(np.float32))
+    db.save_index(path)
+    # Appended vectors far from the first batch move the centroid
+    add_document(db, "b.pdf", rng.normal(5, 1, (30, DIMENSION)).astype(np.float32))
+    db.delete_document("a.pdf")
+    db.save_index(path)
+
+    db.load_index(path, use_cache=False)
+    summary = db.vector_summary()
+    vectors, _ = faiss_adapter.vectors_and_ids(db.index)
+    centroid = np.asarray(summary["centroid"])
+    assert np.linalg.norm(vectors - centroid, axis=1).max() <= summary["radius"] + 1e-4
+
+    bound = (DIMENSION, centroid.astype(np.float32), summary["radius"])
+    for query in rng.normal(2, 3, (10, DIMENSION)).astype(np.float32):
+        nearest = ((vectors - query) ** 2).sum(axis=1).min()
+        assert distance_lower_bound(query, bound) <= nearest + 1e-3
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from mmr import maximal_marginal_relevance, resolve_mmr
+
+QUERY = np.array([1.0, 0.0, 0.0])
+# Two near-duplicates of the best match and a less relevant but different chunk
+CANDIDATES = np.array([
+    [0.9, 0.1, 0.0],
+    [0.9, 0.11, 0.0],
+    [0.6, 0.0, 0.8],
+])
+
+
+def test_relevance_only_keeps_the_similarity_order():
+    assert maximal_marginal_relevance(QUERY, CANDIDATES, top_k=3, lambda_mult=1.0) == [0, 1, 2]
+
+
+def test_near_duplicates_give_way_to_diverse_candidates():
+    assert maximal_marginal_relevance(QUERY, CANDIDATES, top_k=2, lambda_mult=0.5) == [0, 2]
+
+
+def test_edge_cases():
+    assert maximal_marginal_relevance(QUERY, CANDIDATES, top_k=10) == [0, 2, 1]
+    assert maximal_marginal_relevance(QUERY, np.zeros((0, 3)), top_k=3) == []
+    with pytest.raises(ValueError):
+        maximal_marginal_relevance(QUERY, CANDIDATES, lambda_mult=1.5)
+
+
+def test_requests_override_config(config):
+    config["diversification"] = {"enabled": False, "candidates": 30}
+    assert resolve_mmr() == (None, None)
+    assert resolve_mmr(mmr_lambda=0.7) == (0.7, 30)
+
+    config["diversification"] = {"enabled": True, "lambda": 0.3}
+    assert resolve_mmr(mmr_candidates=8) == (0.3, 8)
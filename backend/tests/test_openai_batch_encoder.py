@@ -0,0 +1,49 @@
+import pytest
+
+pytest.importorskip("openai")
+
+from embedding_providers import OpenAIBatchEncoder
+from fake_openai_server import FakeOpenAIServer
+
+
+def make_encoder(server, **kwargs):
+    encoder = OpenAIBatchEncoder(
+        "text-embedding-3-small",
+        api_key="test-key",
+        dimension=2,
+        base_url=server.base_url,
+        **kwargs,
+    )
+    # Use the 4-characters-per-token estimate so the token budget is deterministic
+    encoder._tokenizer = None
+    return encoder
+
+
+def test_requests_respect_batch_size_and_token_budget():
+    # "text-<n>" with n < 10 is 6 characters, estimated at 2 tokens
+    texts = [f"text-{i}" for i in range(10)]
+    with FakeOpenAIServer(delay=0) as server:
+        encoder = make_encoder(server, batch_size=4, max_tokens_per_request=6, max_concurrency=1)
+        encoder.encode(texts)
+
+    assert [len(inputs) for inputs in server.requests] == [3, 3, 3, 1]
+    assert [text for inputs in server.requests for text in inputs] == texts
+
+    with FakeOpenAIServer(delay=0) as server:
+        encoder = make_encoder(server, batch_size=4, max_tokens_per_request=1000, max_concurrency=1)
+        encoder.encode(texts)
+
+    assert [len(inputs) for inputs in server.requests] == [4, 4, 2]
+
+
+def test_concurrency_is_bounded_and_order_is_restored():
+    texts = [f"text-{i}" for i in range(40)]
+    with FakeOpenAIServer(delay=0.3) as server:
+        encoder = make_encoder(server, batch_size=5, max_concurrency=3)
+        embeddings = encoder.encode(texts)
+
+    assert len(server.requests) == 8
+    assert server.max_in_flight == 3
+    assert embeddings.shape == (40, 2)
+    assert embeddings[:, 0].tolist() == list(range(40))
+    assert embeddings[:, 1].tolist() == [len(text) for text in texts]
@@ -0,0 +1,68 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+# query_batcher reaches the embedding model registry, which imports every embedding backend
+pytest.importorskip("model_registry")
+
+from query_batcher import EmbeddingMicroBatcher
+
+
+class RecordingEncoder:
+    """Encodes a text as [len(text)] and records the size of every batch."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.batches = []
+
+    def __call__(self, texts):
+        self.batches.append(len(texts))
+        time.sleep(self.delay)
+        return np.array([[len(text)] for text in texts], dtype=np.float32)
+
+
+def test_concurrent_queries_are_encoded_together():
+    encoder = RecordingEncoder()
+    batcher = EmbeddingMicroBatcher(encoder, max_wait_ms=200, max_batch_size=8)
+    results = {}
+    barrier = threading.Barrier(8)
+
+    def query(i):
+        barrier.wait()
+        results[i] = batcher.encode("x" * i, timeout=5)
+
+    threads = [threading.Thread(target=query, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    batcher.close()
+
+    assert {i: float(vector[0]) for i, vector in results.items()} == {i: float(i) for i in range(8)}
+    assert sum(encoder.batches) == 8 and len(encoder.batches) < 8
+    assert batcher.stats()["largest_batch"] == max(encoder.batches)
+
+
+def test_close_encodes_queued_texts_and_rejects_new_ones():
+    encoder = RecordingEncoder(delay=0.1)
+    batcher = EmbeddingMicroBatcher(encoder, max_wait_ms=0, max_batch_size=1)
+    futures = [batcher.submit(f"text {i}") for i in range(5)]
+    batcher.close()
+
+    assert [float(future.result(timeout=5)[0]) for future in futures] == [6.0] * 5
+    with pytest.raises(RuntimeError):
+        batcher.submit("late")
+
+
+def test_encoder_errors_reach_every_caller_of_the_batch():
+    def failing(texts):
+        raise ValueError("model unavailable")
+
+    batcher = EmbeddingMicroBatcher(failing, max_wait_ms=50)
+    futures = [batcher.submit(text) for text in ("a", "b")]
+    for future in futures:
+        with pytest.raises(ValueError):
+            future.result(timeout=5)
+    batcher.close()
@@ -0,0 +1,63 @@
+import numpy as np
+
+from sparse_index import SparseIndex, reciprocal_rank_fusion
+
+TEXTS = {
+    1: "Tesla revenue grew in the third quarter",
+    2: "Automotive gross margin declined",
+    3: "Energy storage deployments reached a record",
+    4: "Revenue from energy generation and storage",
+    5: "Free cash flow was 2.7 billion",
+}
+
+
+def build(ids):
+    return SparseIndex.build([(np.array(ids), [TEXTS[i] for i in ids])])
+
+
+def assert_same_index(merged, rebuilt):
+    assert merged.ids.tolist() == rebuilt.ids.tolist()
+    assert np.allclose(merged.doc_lengths, rebuilt.doc_lengths)
+    for term in rebuilt.vocabulary:
+        t, u = merged.term_ids[term], rebuilt.term_ids[term]
+        postings = slice(merged.indptr[t], merged.indptr[t + 1]), slice(rebuilt.indptr[u], rebuilt.indptr[u + 1])
+        assert merged.rows[postings[0]].tolist() == rebuilt.rows[postings[1]].tolist()
+        assert merged.tfs[postings[0]].tolist() == rebuilt.tfs[postings[1]].tolist()
+        assert np.isclose(merged.idf[t], rebuilt.idf[u])
+
+
+def test_merge_matches_a_full_rebuild():
+    merged = build([1, 2, 3]).merge(added=build([4, 5]), removed_ids=np.array([2]))
+    rebuilt = build([1, 3, 4, 5])
+
+    assert_same_index(merged, rebuilt)
+    for query in ("revenue", "energy storage", "2.7 billion", "margin"):
+        merged_ids, merged_scores = merged.search(query, top_k=3)
+        rebuilt_ids, rebuilt_scores = rebuilt.search(query, top_k=3)
+        assert merged_ids.tolist() == rebuilt_ids.tolist()
+        assert np.allclose(merged_scores, rebuilt_scores)
+
+
+def test_merge_drops_terms_only_of_removed_chunks_from_results():
+    merged = build([1, 2]).merge(removed_ids=np.array([2]))
+
+    ids, _ = merged.search("margin")
+    assert ids.tolist() == []
+    assert merged.search("revenue")[0].tolist() == [1]
+
+
+def test_search_ranks_and_filters_by_bm25(tmp_path):
+    index = build([1, 2, 3, 4, 5])
+    index.save(str(tmp_path / "doc.index"))
+    index = SparseIndex.load(str(tmp_path / "doc.index"))
+
+    ids, scores = index.search("energy storage revenue", top_k=2)
+    assert ids.tolist() == [4, 3]
+    assert scores[0] > scores[1] > 0
+    assert index.search("energy storage revenue", allowed_ids=np.array([1, 3]))[0].tolist() == [3, 1]
+
+
+def test_reciprocal_rank_fusion_favours_ids_ranked_by_both():
+    ids, scores = reciprocal_rank_fusion([[1, 2, 3], [3, 4, 1]], top_k=2)
+    assert ids == [1, 3]
+    assert scores[0] == scores[1]